@@ -1,3 +1,3 @@
-from ansible_base.activitystream.signals import no_activity_stream
+from ansible_base.activitystream.signals import buffered_activity_stream, no_activity_stream
 
-__all__ = ['no_activity_stream']
+__all__ = ['buffered_activity_stream', 'no_activity_stream']
@@ -1,15 +1,24 @@
 from functools import partial
 
 from django.apps import AppConfig
-from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.db.models.signals import m2m_changed, post_init, post_save, pre_delete, pre_save
 
-from ansible_base.activitystream.signals import activitystream_create, activitystream_delete, activitystream_m2m_changed, activitystream_update
+from ansible_base.activitystream.signals import (
+    activitystream_create,
+    activitystream_delete,
+    activitystream_m2m_changed,
+    activitystream_snapshot,
+    activitystream_snapshot_saved,
+    activitystream_update,
+)
 
 
 def connect_activitystream_signals(cls):
     post_save.connect(activitystream_create, sender=cls, dispatch_uid=f'dab_activitystream_{cls.__name__}_create')
     pre_save.connect(activitystream_update, sender=cls, dispatch_uid=f'dab_activitystream_{cls.__name__}_update')
     pre_delete.connect(activitystream_delete, sender=cls, dispatch_uid=f'dab_activitystream_{cls.__name__}_delete')
+    post_init.connect(activitystream_snapshot, sender=cls, dispatch_uid=f'dab_activitystream_{cls.__name__}_snapshot')
+    post_save.connect(activitystream_snapshot_saved, sender=cls, dispatch_uid=f'dab_activitystream_{cls.__name__}_snapshot_saved')
 
     # Connect to m2m_changed signal for all m2m fields
     for field in cls._meta.many_to_many:
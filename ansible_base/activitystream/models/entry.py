@@ -94,6 +94,13 @@ class AuditableModel(models.Model):
     # Adding field names to this list will limit the activity stream changes dictionaries to only include these fields
     activity_stream_limit_field_names = []
 
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # The reloaded values are the ones to diff against on the next save
+        from ansible_base.activitystream.signals import snapshot_fields
+
+        snapshot_fields(self, fields=None if fields is None else [self._meta.get_field(name).attname for name in fields])
+
     @property
     def activity_stream_entries(self):
         """
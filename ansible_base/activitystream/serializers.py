@@ -1,7 +1,12 @@
 import logging
+from collections import defaultdict
 from copy import deepcopy
 from typing import Optional
 
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
 from ansible_base.activitystream.models import Entry
@@ -11,9 +16,70 @@ from ansible_base.lib.serializers.common import ImmutableCommonModelSerializer
 logger = logging.getLogger('ansible_base.activitystream.serializers')
 
 
+def prefetch_generic_objects(entries: list, field_name: str) -> None:
+    """
+    Loads the objects of the generic foreign key field_name of the entries, with one query per content type,
+    and caches them on the entries like prefetch_related_objects would.
+    Objects of deleted models, or which no longer exist, are cached as None.
+    """
+    field = Entry._meta.get_field(field_name)
+    ct_attname = Entry._meta.get_field(field.ct_field).attname
+
+    object_ids_by_type = defaultdict(set)
+    for entry in entries:
+        content_type_id = getattr(entry, ct_attname)
+        object_id = getattr(entry, field.fk_field)
+        if content_type_id is not None and object_id is not None:
+            object_ids_by_type[content_type_id].add(object_id)
+
+    objects = {}
+    for content_type_id, object_ids in object_ids_by_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:  # The model was deleted
+            continue
+        pks = set()
+        for object_id in object_ids:
+            try:
+                pks.add(model._meta.pk.to_python(object_id))
+            except ValidationError:
+                pass
+        for obj in model._base_manager.filter(pk__in=pks):
+            objects[(content_type_id, obj.pk)] = obj
+
+    for entry in entries:
+        obj = None
+        content_type_id = getattr(entry, ct_attname)
+        model = ContentType.objects.get_for_id(content_type_id).model_class() if content_type_id is not None else None
+        if model is not None:
+            try:
+                obj = objects.get((content_type_id, model._meta.pk.to_python(getattr(entry, field.fk_field))))
+            except ValidationError:
+                pass
+        field.set_cached_value(entry, obj)
+
+
+class EntryBatchSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of entries with a fixed number of queries. The users who made the changes are loaded
+    with one query, and the content objects with one query per content type.
+    """
+
+    def to_representation(self, data):
+        entries = list(data.all() if isinstance(data, models.Manager) else data)
+        prefetch_related_objects(entries, 'created_by')
+        for entry in entries:
+            entry.content_type = ContentType.objects.get_for_id(entry.content_type_id)
+            if entry.related_content_type_id is not None:
+                entry.related_content_type = ContentType.objects.get_for_id(entry.related_content_type_id)
+        prefetch_generic_objects(entries, 'content_object')
+        prefetch_generic_objects(entries, 'related_content_object')
+        return [self.child.to_representation(entry) for entry in entries]
+
+
 class EntrySerializer(ImmutableCommonModelSerializer):
     class Meta:
         model = Entry
+        list_serializer_class = EntryBatchSerializer
         fields = ImmutableCommonModelSerializer.Meta.fields + [
             'operation',
             'changes',
@@ -72,8 +138,6 @@ class EntrySerializer(ImmutableCommonModelSerializer):
 
     def _get_summary_fields(self, obj) -> dict[str, dict]:
         summary_fields = super()._get_summary_fields(obj)
-        if self.is_list_view:
-            return summary_fields
 
         try:
             if obj.content_object is not None and hasattr(obj.content_object, 'summary_fields'):
@@ -87,7 +151,7 @@ class EntrySerializer(ImmutableCommonModelSerializer):
         except AttributeError:  # Likely the model was deleted
             pass
 
-        if obj.changes is None:
+        if self.is_list_view or obj.changes is None:
             return summary_fields
 
         changed_fk_fields = obj.changed_fk_fields
@@ -102,9 +166,6 @@ class EntrySerializer(ImmutableCommonModelSerializer):
     def _get_related(self, obj) -> dict[str, str]:
         fields = super()._get_related(obj)
 
-        if self.is_list_view:
-            return fields
-
         # content_object
         try:
             if obj.content_object is not None:
@@ -119,6 +180,9 @@ class EntrySerializer(ImmutableCommonModelSerializer):
         except AttributeError:  # Likely the model was deleted
             pass
 
+        if self.is_list_view:
+            return fields
+
         for field_name, (related_model, pk) in obj.changed_fk_fields.items():
             if related_object := related_model.objects.filter(pk=pk).first():
                 # If the related object inherits CreatableModel, we can check and make sure it's
@@ -1,6 +1,10 @@
+import copy
 import logging
 import threading
 from contextlib import contextmanager
+from functools import lru_cache, partial
+
+from django.db import router, transaction
 
 logger = logging.getLogger('ansible_base.activitystream.signals')
 
@@ -26,12 +30,118 @@ def no_activity_stream():
         activitystream_enabled.enabled = previous_value
 
 
+class ActivityStreamBuffer(threading.local):
+    def __init__(self):
+        self.depth = 0  # nesting of buffered_activity_stream blocks
+        self.committed = []  # entries of the committed changes, not written yet
+
+
+activitystream_buffer = ActivityStreamBuffer()
+
+
+@contextmanager
+def buffered_activity_stream(using=None):
+    """
+    An atomic block whose activity stream entries are written with a single bulk_create once it commits.
+
+    Entries of changes that are rolled back, including those of nested atomic blocks, are thrown away.
+    """
+    from ansible_base.activitystream.models import Entry
+
+    using = using or router.db_for_write(Entry)
+    with transaction.atomic(using=using):
+        activitystream_buffer.depth += 1
+        try:
+            yield
+        finally:
+            activitystream_buffer.depth -= 1
+        if not activitystream_buffer.depth:
+            # Registered last, so it runs after the entries of the block are collected
+            transaction.on_commit(_write_committed_entries, using=using)
+
+
+def _collect_committed_entries(entries):
+    activitystream_buffer.committed.extend(entries)
+
+
+def _write_committed_entries():
+    from ansible_base.activitystream.models import Entry
+
+    entries, activitystream_buffer.committed = activitystream_buffer.committed, []
+    Entry.objects.bulk_create(entries)
+
+
+def _save_entries(entries):
+    "Saves new entries now, or once the transaction of buffered_activity_stream commits"
+    from ansible_base.activitystream.models import Entry
+
+    if not activitystream_buffer.depth:
+        Entry.objects.bulk_create(entries)
+        return
+
+    for entry in entries:
+        # The content object may be deleted by then, keep only its content type and id
+        for field in entry._meta.private_fields:
+            if field.is_cached(entry):
+                field.delete_cached_value(entry)
+    # Callbacks of rolled back savepoints are discarded
+    transaction.on_commit(partial(_collect_committed_entries, entries), using=router.db_for_write(Entry))
+
+
+@lru_cache(maxsize=None)
+def get_snapshot_attnames(model) -> tuple:
+    "The attnames of the concrete fields of an audited model, which are diffed on update"
+    return tuple(field.attname for field in model._meta.concrete_fields)
+
+
+def snapshot_fields(instance, fields=None):
+    """
+    Records the field values of an instance as loaded or last saved, which activitystream_update diffs against.
+    With fields, only the values of those attnames are recorded again.
+    """
+    values = instance.__dict__
+    snapshot = instance.__dict__.setdefault('_activitystream_snapshot', {})
+    for attname in get_snapshot_attnames(instance._meta.concrete_model) if fields is None else fields:
+        if attname in values:
+            value = values[attname]
+            # Mutable values, like those of JSON fields, could be changed in place
+            snapshot[attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+
+def get_snapshot_instance(instance):
+    """
+    A copy of the instance with the values of its snapshot, or None if they are not known,
+    like for an instance that was not loaded from the database or has deferred fields.
+    """
+    if instance._state.adding:
+        # Constructed rather than loaded, even if it has a pk
+        return None
+    snapshot = instance.__dict__.get('_activitystream_snapshot')
+    if snapshot is None or any(attname not in snapshot for attname in get_snapshot_attnames(instance._meta.concrete_model)):
+        return None
+    old = copy.copy(instance)
+    old.__dict__.update(snapshot)
+    # Related objects are read from the snapshot of their foreign key, not from the new values
+    old._state.fields_cache = {}
+    return old
+
+
+# post_init
+def activitystream_snapshot(sender, instance, **kwargs):
+    snapshot_fields(instance)
+
+
+# post_save
+def activitystream_snapshot_saved(sender, instance, **kwargs):
+    snapshot_fields(instance)
+
+
 def _store_activitystream_entry(old, new, operation):
     if not activitystream_enabled:
         return
 
     from ansible_base.activitystream.models import Entry
-    from ansible_base.lib.utils.models import diff
+    from ansible_base.lib.utils.models import current_user_or_system_user, diff
 
     if operation not in ('create', 'update', 'delete'):
         raise ValueError("Invalid operation: {}".format(operation))
@@ -51,11 +161,17 @@ def _store_activitystream_entry(old, new, operation):
     else:
         content_object = new
 
-    return Entry.objects.create(
-        content_object=content_object,
-        operation=operation,
-        changes=delta.dict(),
-    )
+    if not activitystream_buffer.depth:
+        return Entry.objects.create(
+            content_object=content_object,
+            operation=operation,
+            changes=delta.dict(),
+        )
+
+    # bulk_create does not set created_by like save() does
+    entry = Entry(content_object=content_object, operation=operation, changes=delta.dict(), created_by=current_user_or_system_user())
+    _save_entries([entry])
+    return entry
 
 
 def _store_activitystream_m2m(given_instance, model, operation, pk_set, reverse, field_name):
@@ -82,7 +198,7 @@ def _store_activitystream_m2m(given_instance, model, operation, pk_set, reverse,
         )
         entries.append(entry)
 
-    Entry.objects.bulk_create(entries)
+    _save_entries(entries)
 
 
 # post_save
@@ -119,11 +235,17 @@ def activitystream_update(sender, instance, raw, using, update_fields, **kwargs)
         # Creation events are handled by the activitystream_create receiver
         return
 
-    try:
-        old = sender.objects.get(pk=instance.pk)
-    except sender.DoesNotExist:
+    if not activitystream_enabled:
         return
 
+    # The values as loaded are recorded by activitystream_snapshot, the row is only read again when they are not known
+    old = get_snapshot_instance(instance)
+    if old is None:
+        try:
+            old = sender.objects.get(pk=instance.pk)
+        except sender.DoesNotExist:
+            return
+
     _store_activitystream_entry(old, instance, 'update')
 
 
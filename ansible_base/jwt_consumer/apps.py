@@ -1,7 +1,16 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
+from django.db.models.signals import post_delete, post_save
 
 
 class JwtConsumerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ansible_base.jwt_consumer'
     label = 'dab_jwt_consumer'
+
+    def ready(self):
+        if apps.is_installed('ansible_base.rbac'):
+            from ansible_base.jwt_consumer.common.cache import forget_rbac_claims_of_assignment
+            from ansible_base.rbac.models import RoleUserAssignment
+
+            post_save.connect(forget_rbac_claims_of_assignment, sender=RoleUserAssignment, dispatch_uid='dab_jwt_consumer_forget_rbac_claims_save')
+            post_delete.connect(forget_rbac_claims_of_assignment, sender=RoleUserAssignment, dispatch_uid='dab_jwt_consumer_forget_rbac_claims_delete')
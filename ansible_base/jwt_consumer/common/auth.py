@@ -1,19 +1,27 @@
+import hashlib
+import json
 import logging
-from typing import Optional, Tuple
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 
 import jwt
+from asgiref.sync import sync_to_async
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
 from django.db.models import Model
 from django.db.utils import IntegrityError
+from django.utils import timezone
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
-from ansible_base.jwt_consumer.common.cache import JWTCache
-from ansible_base.jwt_consumer.common.cert import JWTCert, JWTCertException
+from ansible_base.jwt_consumer.common.cache import JWTCache, validated_token_cache
+from ansible_base.jwt_consumer.common.cert import JWTCertException, JWTPublicKey, jwt_key_holder
+from ansible_base.lib.abstract_models.common import ModifiableModel
 from ansible_base.lib.utils.auth import get_user_by_ansible_id
+from ansible_base.lib.utils.settings import get_setting
 from ansible_base.lib.utils.translations import translatableConditionally as _
 from ansible_base.resource_registry.models import Resource, ResourceType
 from ansible_base.resource_registry.signals.handlers import no_reverse_sync
@@ -30,6 +38,12 @@ default_mapped_user_fields = [
     "is_superuser",
 ]
 
+# Types of the objects in the token which can be created as stubs, in the order they must be created
+stub_resource_types = {
+    'organization': 'shared.organization',
+    'team': 'shared.team',
+}
+
 _permission_registry = None
 
 
@@ -59,102 +73,215 @@ class JWTCommonAuth:
         self.token = None
 
         logger.debug("Starting JWT Authentication")
-        if request is None:
+        token_from_header = self.get_token_from_request(request)
+        if not token_from_header:
+            return
+
+        self.token = self.decode_token(token_from_header)
+        if self.token is None:
             return
 
+        self.load_user()
+
+    def load_user(self):
+        "Sets self.user to the user of the decoded token, creating it if needed"
+        # Let's see if we have the same user info in the cache already
+        is_cached, user_defaults = self.cache.check_user_in_cache(self.token)
+
+        if is_cached:
+            try:
+                self.user = get_user_by_ansible_id(self.token['sub'])
+            except ObjectDoesNotExist:
+                # ooofff... I'm sorry, you user was in the cache but deleted from the database?
+                # but now you have to pay the price to continue logging in
+                pass
+
+        if not self.user:
+            self.create_user_from_token(user_defaults)
+
+        setattr(self.user, "resource_api_actions", self.token.get("resource_api_actions", None))
+
+        logger.info(f"User {self.user.username} authenticated from JWT auth")
+
+    async def adecode_jwt_token(self, request):
+        """
+        Sets self.token from the given request like parse_jwt_token, without loading the user
+
+        When the decryption key is loaded and the token was validated before, the token is handled in the event loop.
+        Otherwise it is validated in a worker thread which is not thread sensitive, so a slow key fetch does not hold
+        the thread shared with the ORM.
+        """
+
+        self.user = None
+        self.token = None
+
+        logger.debug("Starting async JWT Authentication")
+        token_from_header = self.get_token_from_request(request)
+        if not token_from_header:
+            return
+
+        keys = jwt_key_holder.get_loaded_keys()
+        token = validated_token_cache.get(token_from_header, keys[0].pem, local_only=True) if keys else None
+        if token is not None:
+            self.validate_user_data(token)
+            self.token = token
+        else:
+            self.token = await sync_to_async(self.decode_token, thread_sensitive=False)(token_from_header)
+
+    async def aparse_jwt_token(self, request):
+        """
+        Async variant of parse_jwt_token, for ASGI views and channels consumers
+
+        The token is decoded by adecode_jwt_token, then the user is loaded in a single call to the thread shared with the ORM.
+        """
+        await self.adecode_jwt_token(request)
+        if self.token is not None:
+            await sync_to_async(self.load_user)()
+
+    def get_token_from_request(self, request) -> Optional[str]:
+        if request is None:
+            return None
+
         token_from_header = request.headers.get("X-DAB-JW-TOKEN", None)
         if not token_from_header:
             logger.info("X-DAB-JW-TOKEN header not set for JWT authentication")
-            return
+            return None
         logger.debug(f"Received JWT auth token: {token_from_header}")
+        return token_from_header
 
-        cert_object = JWTCert()
+    def decode_token(self, token_from_header: str) -> Optional[dict]:
+        "Returns the validated body of the token, or None if there is no key to validate it with"
         try:
-            cert_object.get_decryption_key()
+            keys, loaded_from_source = jwt_key_holder.get_keys()
         except JWTCertException as jce:
             logger.error(jce)
             raise AuthenticationFailed(jce)
 
-        if cert_object.key is None:
-            return None, None
+        if not keys:
+            return None
+
+        # A token we have already validated with this key does not need to be decoded again
+        token = validated_token_cache.get(token_from_header, keys[0].pem)
+        if token is not None:
+            self.validate_user_data(token)
+            return token
 
         try:
-            self.token = self.validate_token(token_from_header, cert_object.key)
+            token = self.validate_token_with_keys(token_from_header, keys)
         except jwt.exceptions.DecodeError as de:
             # This exception means the decryption key failed... maybe it was because the cache is bad.
-            if not cert_object.cached:
+            if loaded_from_source:
                 # It wasn't cached anyway so we an just raise our exception
                 self.log_and_raise(_("JWT decoding failed: %(e)s, check your key and generated token"), {"e": de})
 
             # We had a cached key so lets get the key again ignoring the cache
-            old_key = cert_object.key
+            old_key = keys[0].pem
             try:
-                cert_object.get_decryption_key(ignore_cache=True)
+                keys = jwt_key_holder.refresh(old_key)
             except JWTCertException as jce:
                 self.log_and_raise(_("Failed to get JWT token on the second try: %(e)s"), {"e": jce})
-            if old_key == cert_object.key:
+            if not keys or old_key == keys[0].pem:
                 # The new key matched the old key so don't even try and decrypt again, the key just doesn't match
                 self.log_and_raise(_("JWT decoding failed: %(e)s, cached key was correct; check your key and generated token"), {"e": de})
             # Since we got a new key, lets go ahead and try to validate the token again.
             # If it fails this time we can just raise whatever
-            self.token = self.validate_token(token_from_header, cert_object.key)
-
-        # Let's see if we have the same user info in the cache already
-        is_cached, user_defaults = self.cache.check_user_in_cache(self.token)
-
-        self.user = None
-        if is_cached:
-            try:
-                self.user = get_user_by_ansible_id(self.token['sub'])
-            except ObjectDoesNotExist:
-                # ooofff... I'm sorry, you user was in the cache but deleted from the database?
-                # but now you have to pay the price to continue logging in
-                pass
+            token = self.validate_token_with_keys(token_from_header, keys)
+        validated_token_cache.set(token_from_header, keys[0].pem, token)
+        return token
 
-        if not self.user:
-            # Either the user wasn't cached or the requested user was not in the DB so we need to make a new one
-            try:
-                resource = Resource.create_resource(
-                    ResourceType.objects.get(name="shared.user"), resource_data=self.token["user_data"], ansible_id=self.token["sub"]
+    def create_user_from_token(self, user_defaults: dict) -> None:
+        "Creates the user of the token, or updates a local user with the same username"
+        try:
+            resource = Resource.create_resource(
+                ResourceType.objects.get(name="shared.user"), resource_data=self.token["user_data"], ansible_id=self.token["sub"]
+            )
+            self.user = resource.content_object
+            logger.info(f"New user {self.user.username} created from JWT auth")
+        except IntegrityError as exc:
+            logger.debug(f'Existing user {self.token["user_data"]} is a conflict with local user, error: {exc}')
+            with no_reverse_sync():
+                if user_defaults['is_superuser'] is False:
+                    user_defaults.pop('is_superuser')
+                self.user, created = get_user_model().objects.update_or_create(
+                    username=self.token["user_data"]['username'],
+                    defaults=user_defaults,
                 )
-                self.user = resource.content_object
-                logger.info(f"New user {self.user.username} created from JWT auth")
-            except IntegrityError as exc:
-                logger.debug(f'Existing user {self.token["user_data"]} is a conflict with local user, error: {exc}')
-                with no_reverse_sync():
-                    if user_defaults['is_superuser'] is False:
-                        user_defaults.pop('is_superuser')
-                    self.user, created = get_user_model().objects.update_or_create(
-                        username=self.token["user_data"]['username'],
-                        defaults=user_defaults,
-                    )
-
-        setattr(self.user, "resource_api_actions", self.token.get("resource_api_actions", None))
-
-        logger.info(f"User {self.user.username} authenticated from JWT auth")
 
     def log_and_raise(self, conditional_translate_object, expand_values={}):
         logger.error(conditional_translate_object.not_translated() % expand_values)
         raise AuthenticationFailed(conditional_translate_object.translated() % expand_values)
 
+    def get_user_fields_fingerprint(self) -> str:
+        "Digest of the user_data of the token which map_user_fields acts on"
+        user_data = self.token.get('user_data', {})
+        fields = {attribute: user_data.get(attribute, None) for attribute in self.mapped_user_fields}
+        return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
     def map_user_fields(self):
+        """
+        Updates the mapped user fields from the user_data of the token
+
+        Only the changed fields are saved, and nothing is saved if the same user_data was already applied to the user,
+        for instance if a value differs only because the user model normalizes it.
+        The last_login of the user is updated along with the other fields,
+        at most every ANSIBLE_BASE_JWT_LAST_LOGIN_UPDATE_SECONDS (0, the default, never updates it).
+        """
         if self.token is None or self.user is None:
             logger.error("Unable to map user fields because user or token is not defined, please call authenticate first")
             return
 
-        user_needs_save = False
+        changed_fields = []
         for attribute in self.mapped_user_fields:
             old_value = getattr(self.user, attribute, None)
             new_value = self.token.get('user_data', {}).get(attribute, None)
             if old_value != new_value:
                 if attribute == 'is_superuser' and new_value is False:
                     continue
-                logger.debug(f"Changing {attribute} for {self.user.username} from {old_value} to {new_value}")
-                setattr(self.user, attribute, new_value)
-                user_needs_save = True
-        if user_needs_save:
-            logger.info(f"Saving user {self.user.username}")
-            self.user.save()
+                changed_fields.append((attribute, old_value, new_value))
+
+        now = timezone.now()
+        last_login_interval = get_setting('ANSIBLE_BASE_JWT_LAST_LOGIN_UPDATE_SECONDS', 0)
+        update_last_login = bool(
+            last_login_interval
+            and hasattr(self.user, 'last_login')
+            and (self.user.last_login is None or (now - self.user.last_login).total_seconds() >= last_login_interval)
+        )
+
+        fingerprint = None
+        if changed_fields:
+            fingerprint = self.get_user_fields_fingerprint()
+            if self.cache.check_user_fields_in_cache(self.user.pk, fingerprint):
+                logger.debug(f"User data for {self.user.username} was already applied, not saving differences")
+                changed_fields = []
+
+        if not (changed_fields or update_last_login):
+            return
+
+        update_fields = []
+        for attribute, old_value, new_value in changed_fields:
+            logger.debug(f"Changing {attribute} for {self.user.username} from {old_value} to {new_value}")
+            setattr(self.user, attribute, new_value)
+            update_fields.append(attribute)
+        if update_last_login:
+            self.user.last_login = now
+            update_fields.append('last_login')
+        if changed_fields and isinstance(self.user, ModifiableModel):
+            # modified is auto_now, but it is only written if listed in update_fields
+            update_fields.append('modified')
+
+        logger.info(f"Saving user {self.user.username}")
+        self.user.save(update_fields=update_fields)
+        if fingerprint:
+            self.cache.set_user_fields_in_cache(self.user.pk, fingerprint)
+
+    def validate_token_with_keys(self, unencrypted_token, keys: list[JWTPublicKey]):
+        "Validate the token with the current key, and previous keys if still in a rotation window"
+        for key in keys[:-1]:
+            try:
+                return self.validate_token(unencrypted_token, key.public_key)
+            except jwt.exceptions.DecodeError:
+                logger.debug("JWT decoding failed, trying previous decryption key")
+        return self.validate_token(unencrypted_token, keys[-1].public_key)
 
     def validate_token(self, unencrypted_token, decryption_key):
         validated_body = None
@@ -187,7 +314,14 @@ class JWTCommonAuth:
 
         logger.debug(validated_body)
 
-        # Ensure all of the user pieces are part of the token
+        self.validate_user_data(validated_body)
+
+        # At this time we are not doing anything with regards to the version other than ensuring its there.
+
+        return validated_body
+
+    def validate_user_data(self, validated_body: dict) -> None:
+        "Ensure all of the user pieces are part of the token"
         missing_user_data = []
         for field in self.mapped_user_fields:
             if field not in validated_body['user_data']:
@@ -195,10 +329,6 @@ class JWTCommonAuth:
         if missing_user_data:
             self.log_and_raise(_("JWT did not have proper user_data, missing fields: %(missing_fields)s"), {"missing_fields": ", ".join(missing_user_data)})
 
-        # At this time we are not doing anything with regards to the version other than ensuring its there.
-
-        return validated_body
-
     def get_role_definition(self, name: str) -> Optional[Model]:
         """Simply get the RoleDefinition from the database if it exists and handler corner cases
 
@@ -217,103 +347,169 @@ class JWTCommonAuth:
                 return rd
         return None
 
+    def get_rbac_claims_fingerprint(self) -> str:
+        "Digest of the parts of the token that process_rbac_permissions acts on"
+        claims = {key: self.token.get(key, default) for key, default in (('global_roles', []), ('object_roles', {}), ('objects', {}))}
+        return hashlib.sha256(json.dumps(claims, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
     def process_rbac_permissions(self):
         """
         This is a default process_permissions which should be usable if you are using RBAC from DAB
+
+        The claims are almost always the same as the last request of the user,
+        so this does nothing if the fingerprint of the claims matches the last one applied.
+        Otherwise, only the difference between the claims and the current JWT-managed assignments
+        is applied, with one recompute of role evaluations at the end.
         """
         if self.token is None or self.user is None:
             logger.error("Unable to process rbac permissions because user or token is not defined, please call authenticate first")
             return
 
+        fingerprint = self.get_rbac_claims_fingerprint()
+        if self.cache.check_rbac_claims_in_cache(self.user.pk, fingerprint):
+            logger.debug(f"RBAC claims for {self.user.username} are unchanged, skipping reconciliation")
+            return
+
         from ansible_base.rbac.models import RoleUserAssignment
+        from ansible_base.rbac.triggers import defer_recompute
+
+        # Existing assignments of JWT-managed roles, keyed by (role_definition_id, content_type_id, object_id)
+        role_diff = {}
+        for assignment in RoleUserAssignment.objects.filter(user=self.user, role_definition__name__in=settings.ANSIBLE_BASE_JWT_MANAGED_ROLES).prefetch_related(
+            'role_definition'
+        ):
+            role_diff[(assignment.role_definition_id, assignment.content_type_id, assignment.object_id)] = assignment
+
+        # If any claim could not be applied, the fingerprint is not saved, so it is tried again next request
+        all_applied = True
+
+        with defer_recompute():
+            resolved_objects = self.resolve_objects() if self.token.get('object_roles') else {}
+
+            for system_role_name in self.token.get("global_roles", []):
+                logger.debug(f"Processing system role {system_role_name} for {self.user.username}")
+                rd = self.get_role_definition(system_role_name)
+                if rd:
+                    if rd.name in settings.ANSIBLE_BASE_JWT_MANAGED_ROLES:
+                        if role_diff.pop((rd.id, None, None), None) is None:
+                            rd.give_global_permission(self.user)
+                            logger.info(f"Granted user {self.user.username} global role {system_role_name}")
+                    else:
+                        logger.error(f"Unable to grant {self.user.username} system level role {system_role_name} because it is not a JWT managed role")
+                        all_applied = False
+                else:
+                    logger.error(f"Unable to grant {self.user.username} system level role {system_role_name} because it does not exist")
+                    all_applied = False
+                    continue
 
-        role_diff = RoleUserAssignment.objects.filter(user=self.user, role_definition__name__in=settings.ANSIBLE_BASE_JWT_MANAGED_ROLES)
+            for object_role_name in self.token.get('object_roles', {}).keys():
+                rd = self.get_role_definition(object_role_name)
+                if rd is None:
+                    logger.error(f"Unable to grant {self.user.username} object role {object_role_name} because it does not exist")
+                    all_applied = False
+                    continue
+                elif rd.name not in settings.ANSIBLE_BASE_JWT_MANAGED_ROLES:
+                    logger.error(f"Unable to grant {self.user.username} object role {object_role_name} because it is not a JWT managed role")
+                    all_applied = False
+                    continue
 
-        for system_role_name in self.token.get("global_roles", []):
-            logger.debug(f"Processing system role {system_role_name} for {self.user.username}")
-            rd = self.get_role_definition(system_role_name)
-            if rd:
-                if rd.name in settings.ANSIBLE_BASE_JWT_MANAGED_ROLES:
-                    assignment = rd.give_global_permission(self.user)
-                    role_diff = role_diff.exclude(pk=assignment.pk)
-                    logger.info(f"Granted user {self.user.username} global role {system_role_name}")
+                object_type = self.token['object_roles'][object_role_name]['content_type']
+                object_indexes = self.token['object_roles'][object_role_name]['objects']
+
+                for index in object_indexes:
+                    object_data = self.token['objects'][object_type][index]
+                    resource, obj = resolved_objects[object_type][index]
+                    if obj is None:
+                        all_applied = False
+                        continue
+                    object_id = str(obj._meta.pk.get_db_prep_value(obj.pk, connection))
+                    if role_diff.pop((rd.id, resource.content_type_id, object_id), None) is None:
+                        rd.give_permission(self.user, obj)
+                        logger.info(
+                            f"Granted user {self.user.username} role {object_role_name} to object {obj.name} with ansible_id {object_data['ansible_id']}"
+                        )
+
+            # Remove all permissions not authorized by the JWT
+            for role_assignment in role_diff.values():
+                rd = role_assignment.role_definition
+                content_object = role_assignment.content_object
+                if content_object:
+                    rd.remove_permission(self.user, content_object)
                 else:
-                    logger.error(f"Unable to grant {self.user.username} system level role {system_role_name} because it is not a JWT managed role")
-            else:
-                logger.error(f"Unable to grant {self.user.username} system level role {system_role_name} because it does not exist")
-                continue
-
-        for object_role_name in self.token.get('object_roles', {}).keys():
-            rd = self.get_role_definition(object_role_name)
-            if rd is None:
-                logger.error(f"Unable to grant {self.user.username} object role {object_role_name} because it does not exist")
-                continue
-            elif rd.name not in settings.ANSIBLE_BASE_JWT_MANAGED_ROLES:
-                logger.error(f"Unable to grant {self.user.username} object role {object_role_name} because it is not a JWT managed role")
-                continue
-
-            object_type = self.token['object_roles'][object_role_name]['content_type']
-            object_indexes = self.token['object_roles'][object_role_name]['objects']
-
-            for index in object_indexes:
-                object_data = self.token['objects'][object_type][index]
-                resource, obj = self.get_or_create_resource(object_type, object_data)
-                if resource is not None:
-                    assignment = rd.give_permission(self.user, obj)
-                    role_diff = role_diff.exclude(pk=assignment.pk)
-                    logger.info(f"Granted user {self.user.username} role {object_role_name} to object {obj.name} with ansible_id {object_data['ansible_id']}")
-
-        # Remove all permissions not authorized by the JWT
-        for role_assignment in role_diff:
-            rd = role_assignment.role_definition
-            content_object = role_assignment.content_object
-            if content_object:
-                rd.remove_permission(self.user, content_object)
-            else:
-                rd.remove_global_permission(self.user)
+                    rd.remove_global_permission(self.user)
 
-    def get_or_create_resource(self, content_type: str, data: dict) -> Tuple[Optional[Resource], Optional[Model]]:
-        """
-        Gets or creates a resource from a content type and its default data
+        if all_applied:
+            self.cache.set_rbac_claims_in_cache(self.user.pk, fingerprint)
 
-        This can only build or get organizations or teams
+    def resolve_objects(self, token_objects: Optional[dict] = None) -> Dict[str, List[Tuple[Optional[Resource], Optional[Model]]]]:
         """
-        object_ansible_id = data['ansible_id']
-        try:
-            resource = Resource.objects.get(ansible_id=object_ansible_id)
-            logger.debug(f"Resource {object_ansible_id} already exists")
-            return resource, resource.content_object
-        except Resource.DoesNotExist:
-            pass
-
-        # The resource was missing so we need to create its stub
-        if content_type == 'team':
-            # For a team we first have to make sure the org is there
-            org_id = data['org']
-            organization_data = self.token['objects']["organization"][org_id]
+        Gets or creates the resource and object of every entry in the objects of the token, or in token_objects if given
 
-            # Now that we have the org we can build a team
-            org_resource, _ = self.get_or_create_resource("organization", organization_data)
+        Returns a dict of the object types in the token to lists of (resource, object),
+        in the same order as the entries of the token, so the indexes used by object_roles apply.
+        Existing resources are loaded with one query, and their objects with one query per content type.
+        Missing organizations are created as stubs before missing teams, which reference them.
+        Entries of types which can not be built are resolved to (None, None).
+        """
+        if token_objects is None:
+            token_objects = self.token.get('objects', {})
+        resolved = {object_type: [(None, None)] * len(entries) for object_type, entries in token_objects.items()}
+        for object_type in token_objects:
+            if object_type not in stub_resource_types:
+                logger.error(f"build_resource_stub does not know how to build an object of type {object_type}")
+
+        ansible_ids = set()
+        for object_type in stub_resource_types:
+            ansible_ids.update(str(data['ansible_id']) for data in token_objects.get(object_type, []))
+        if not ansible_ids:
+            return resolved
+
+        resources = {str(resource.ansible_id): resource for resource in Resource.objects.filter(ansible_id__in=ansible_ids).select_related('content_type')}
+
+        object_ids_by_content_type = defaultdict(set)
+        for resource in resources.values():
+            object_ids_by_content_type[resource.content_type].add(resource.object_id)
+        for content_type, object_ids in object_ids_by_content_type.items():
+            content_objects = {str(pk): obj for pk, obj in content_type.model_class().objects.in_bulk(list(object_ids)).items()}
+            for resource in resources.values():
+                if resource.content_type_id == content_type.id and resource.object_id in content_objects:
+                    # Setting the generic foreign key caches the object on the resource
+                    resource.content_object = content_objects[resource.object_id]
+
+        # stub_resource_types is ordered so that organizations exist before the teams in them are created
+        for object_type, resource_type_name in stub_resource_types.items():
+            resource_type = None
+            for index, data in enumerate(token_objects.get(object_type, [])):
+                ansible_id = str(data['ansible_id'])
+                if ansible_id in resources:
+                    logger.debug(f"Resource {ansible_id} already exists")
+                    resource = resources[ansible_id]
+                    resolved[object_type][index] = (resource, resource.content_object)
+                    continue
 
-            resource = Resource.create_resource(
-                ResourceType.objects.get(name="shared.team"),
-                {"name": data["name"], "organization": org_resource.ansible_id},
-                ansible_id=data["ansible_id"],
-            )
+                if resource_type is None:
+                    resource_type = ResourceType.objects.get(name=resource_type_name)
+                resource_data = {"name": data["name"]}
+                if object_type == 'team':
+                    org_resource = resolved['organization'][data['org']][0]
+                    resource_data["organization"] = org_resource.ansible_id
+                resource = Resource.create_resource(resource_type, resource_data, ansible_id=ansible_id)
+                resources[ansible_id] = resource
+                resolved[object_type][index] = (resource, resource.content_object)
 
-            return resource, resource.content_object
+        return resolved
 
-        elif content_type == 'organization':
-            resource = Resource.create_resource(
-                ResourceType.objects.get(name="shared.organization"),
-                {"name": data["name"]},
-                ansible_id=data["ansible_id"],
-            )
+    def get_or_create_resource(self, content_type: str, data: dict) -> Tuple[Optional[Resource], Optional[Model]]:
+        """
+        Gets or creates a resource from a content type and its default data, see resolve_objects
 
-            return resource, resource.content_object
+        This can only build or get organizations or teams, the organization of a team is taken from the objects of the token
+        """
+        if content_type == 'team':
+            token_objects = {'organization': [self.token['objects']['organization'][data['org']]], 'team': [dict(data, org=0)]}
         else:
-            logger.error(f"build_resource_stub does not know how to build an object of type {type}")
-            return None, None
+            token_objects = {content_type: [data]}
+        return self.resolve_objects(token_objects)[content_type][0]
 
 
 class JWTAuthentication(BaseAuthentication):
@@ -334,6 +530,28 @@ class JWTAuthentication(BaseAuthentication):
         else:
             return None
 
+    async def aauthenticate(self, request):
+        """
+        Async variant of authenticate, for ASGI views and channels consumers
+
+        The token is decoded by JWTCommonAuth.adecode_jwt_token. Loading the user, process_user_data and process_permissions
+        then run in a single call to the thread shared with the ORM, as authenticate would with database_sync_to_async.
+        Their cache checks keep that call short when the token brings no changes.
+        """
+        await self.common_auth.adecode_jwt_token(request)
+
+        if self.common_auth.token is not None:
+            return await sync_to_async(self.authenticate_token)()
+        else:
+            return None
+
+    def authenticate_token(self):
+        "Loads the user of the decoded token and processes it, returns the result of authenticate"
+        self.common_auth.load_user()
+        self.process_user_data()
+        self.process_permissions()
+        return self.common_auth.user, None
+
     def process_user_data(self):
         self.common_auth.map_user_fields()
 
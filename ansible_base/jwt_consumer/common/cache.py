@@ -1,4 +1,9 @@
+import copy
+import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Tuple
 
 from django.conf import settings
@@ -14,6 +19,10 @@ jwt_cache_name = getattr(settings, 'ANSIBLE_BASE_JWT_CACHE_NAME', 'default')
 cache = caches[jwt_cache_name]
 # This is the cache name we will use for the JWT key
 cache_key = 'ansible_base_jwt_public_key'
+# Prefix of the cache keys holding the fingerprint of the last RBAC claims applied to a user
+rbac_claims_cache_key_prefix = 'ansible_base_jwt_rbac_claims_'
+# Prefix of the cache keys holding the fingerprint of the last user_data saved to a user
+user_fields_cache_key_prefix = 'ansible_base_jwt_user_fields_'
 
 
 class JWTCache:
@@ -22,14 +31,17 @@ class JWTCache:
         cache_timeout = get_setting('ANSIBLE_BASE_JWT_CACHE_TIMEOUT_SECONDS', 604800)
         return cache_timeout
 
-    def check_user_in_cache(self, validated_body: dict) -> Tuple[bool, dict]:
+    def get_expected_user_cache_value(self, validated_body: dict) -> dict:
         # These are the defaults which will get passed to the user creation and what we expect in the cache
-        expected_cache_value = {
+        return {
             "first_name": validated_body['user_data']["first_name"],
             "last_name": validated_body['user_data']["last_name"],
             "email": validated_body['user_data']["email"],
             "is_superuser": validated_body['user_data']["is_superuser"],
         }
+
+    def check_user_in_cache(self, validated_body: dict) -> Tuple[bool, dict]:
+        expected_cache_value = self.get_expected_user_cache_value(validated_body)
         cached_user = cache.get(validated_body["sub"], None)
         # If the user was in the cache and the values of the cache match the expected values we had it in cache
         if cached_user is not None and cached_user == expected_cache_value:
@@ -38,6 +50,24 @@ class JWTCache:
         cache.set(validated_body["sub"], expected_cache_value, timeout=self.get_cache_timeout())
         return False, expected_cache_value
 
+    def check_rbac_claims_in_cache(self, user_id: int, fingerprint: str) -> bool:
+        "Tells if the RBAC claims with this fingerprint were already applied to the user"
+        return cache.get(f'{rbac_claims_cache_key_prefix}{user_id}', None) == fingerprint
+
+    def set_rbac_claims_in_cache(self, user_id: int, fingerprint: str) -> None:
+        cache.set(f'{rbac_claims_cache_key_prefix}{user_id}', fingerprint, timeout=self.get_cache_timeout())
+
+    def delete_rbac_claims_from_cache(self, user_id: int) -> None:
+        "Makes the next request of the user reconcile its assignments with the RBAC claims of the token again"
+        cache.delete(f'{rbac_claims_cache_key_prefix}{user_id}')
+
+    def check_user_fields_in_cache(self, user_id: int, fingerprint: str) -> bool:
+        "Tells if the user_data with this fingerprint was already saved to the user"
+        return cache.get(f'{user_fields_cache_key_prefix}{user_id}', None) == fingerprint
+
+    def set_user_fields_in_cache(self, user_id: int, fingerprint: str) -> None:
+        cache.set(f'{user_fields_cache_key_prefix}{user_id}', fingerprint, timeout=self.get_cache_timeout())
+
     def get_key_from_cache(self) -> Optional[str]:
         # If we are not ignoring the cache (forcing a reload of the key), check it
         key = cache.get(cache_key, None)
@@ -46,3 +76,113 @@ class JWTCache:
 
     def set_key_in_cache(self, key: str) -> None:
         cache.set(cache_key, key, timeout=self.get_cache_timeout())
+
+
+def forget_rbac_claims_of_assignment(sender, instance, **kwargs):
+    """
+    post_save and post_delete of RoleUserAssignment, also sent when an assignment is deleted along with its object.
+    Once the assignments of a user changed locally, the claims last applied to the user no longer describe them.
+    """
+    JWTCache().delete_rbac_claims_from_cache(instance.user_id)
+
+
+class JWTValidatedTokenCache:
+    """
+    Remembers the body of tokens that passed signature and claim validation,
+    so that a token which is sent again does not need to be decoded again.
+
+    Entries are keyed by the SHA-256 digest of the raw token and expire at the token exp claim.
+    This is an in-process LRU bounded by ANSIBLE_BASE_JWT_VALIDATED_TOKEN_CACHE_SIZE, a size of 0 disables it.
+    If ANSIBLE_BASE_JWT_VALIDATED_TOKEN_USE_DJANGO_CACHE is True, the Django cache is consulted on a local miss.
+    All entries are discarded if a different decryption key is used, as happens with key rotation.
+    """
+
+    django_cache_prefix = 'ansible_base_jwt_validated_token_'
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_digest = None
+
+    @staticmethod
+    def digest(value: str) -> str:
+        return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+    def get_max_size(self) -> int:
+        return get_setting('ANSIBLE_BASE_JWT_VALIDATED_TOKEN_CACHE_SIZE', 1000)
+
+    def use_django_cache(self) -> bool:
+        return get_setting('ANSIBLE_BASE_JWT_VALIDATED_TOKEN_USE_DJANGO_CACHE', False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _check_key(self, decryption_key: str) -> str:
+        "Flushes entries if the decryption key changed, must be called with the lock held"
+        key_digest = self.digest(decryption_key)
+        if key_digest != self._key_digest:
+            if self._key_digest is not None:
+                logger.info("JWT decryption key changed, clearing validated token cache")
+            self._entries.clear()
+            self._key_digest = key_digest
+        return key_digest
+
+    def get(self, raw_token: str, decryption_key: str, local_only: bool = False) -> Optional[dict]:
+        """
+        Returns a copy of the validated token body, or None if the token needs to be validated
+
+        If local_only is True the Django cache is not checked, so this can be called from async code.
+        """
+        if not self.get_max_size():
+            return None
+
+        token_digest = self.digest(raw_token)
+        with self._lock:
+            key_digest = self._check_key(decryption_key)
+            entry = self._entries.get(token_digest)
+            if entry is not None:
+                self._entries.move_to_end(token_digest)
+
+        if entry is None and not local_only and self.use_django_cache():
+            cached_value = cache.get(f'{self.django_cache_prefix}{token_digest}', None)
+            if cached_value is not None and cached_value[0] == key_digest:
+                entry = cached_value[1:]
+                self._store(token_digest, key_digest, entry)
+
+        if entry is None:
+            return None
+        expiration, validated_body = entry
+        if time.time() >= expiration:
+            with self._lock:
+                self._entries.pop(token_digest, None)
+            return None
+        return copy.deepcopy(validated_body)
+
+    def set(self, raw_token: str, decryption_key: str, validated_body: dict) -> None:
+        if not self.get_max_size() or not isinstance(validated_body.get('exp'), (int, float)):
+            return
+
+        token_digest = self.digest(raw_token)
+        entry = (validated_body['exp'], copy.deepcopy(validated_body))
+        with self._lock:
+            key_digest = self._check_key(decryption_key)
+        self._store(token_digest, key_digest, entry)
+
+        if self.use_django_cache():
+            timeout = int(validated_body['exp'] - time.time())
+            if timeout > 0:
+                cache.set(f'{self.django_cache_prefix}{token_digest}', (key_digest,) + entry, timeout=timeout)
+
+    def _store(self, token_digest: str, key_digest: str, entry: tuple) -> None:
+        max_size = self.get_max_size()
+        with self._lock:
+            if key_digest != self._key_digest:
+                return  # key rotated while we were working, entry is no longer trustworthy
+            self._entries[token_digest] = entry
+            self._entries.move_to_end(token_digest)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+
+validated_token_cache = JWTValidatedTokenCache()
@@ -1,7 +1,12 @@
 import logging
+import threading
+import time
+from typing import Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
 import requests
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
 from django.utils.translation import gettext as _
 
 from ansible_base.jwt_consumer.common.cache import JWTCache
@@ -112,3 +117,110 @@ class JWTCert:
         logger.debug(f"{self.key}")
         self.cache.set_key_in_cache(self.key)
         self.cached = False
+
+
+class JWTPublicKey:
+    "A public key in PEM form along with its parsed key object, which PyJWT can use without parsing it again"
+
+    def __init__(self, pem: str, retire_at: Optional[float] = None):
+        self.pem = pem
+        # Time (from time.monotonic) after which a previous key is no longer accepted, None for the current key
+        self.retire_at = retire_at
+        try:
+            self.public_key: RSAPublicKey = load_pem_public_key(pem.encode('utf-8'))
+        except (ValueError, TypeError) as e:
+            raise JWTCertException(_("Unable to parse JWT decryption key: {0}").format(e))
+
+
+class JWTKeyHolder:
+    """
+    Process-wide holder of the keys used to validate tokens.
+
+    JWTCert loads the key from the Django cache or its source, and this keeps the parsed result
+    for ANSIBLE_BASE_JWT_KEY_REFRESH_SECONDS so requests do not need to load or parse the key.
+    Loading is guarded by a lock so that when the key is missing or rotates
+    only one thread fetches it while the others wait for the result.
+
+    After a rotation, the previous key is still accepted for ANSIBLE_BASE_JWT_KEY_ROTATION_WINDOW_SECONDS
+    so that tokens issued just before the rotation do not fail.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._key_setting = None
+        self._expires_at = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = []
+            self._key_setting = None
+            self._expires_at = 0.0
+
+    def _is_stale(self, key_setting) -> bool:
+        return (not self._keys) or key_setting != self._key_setting or time.monotonic() >= self._expires_at
+
+    def _load(self, cert: JWTCert) -> None:
+        "Replace the current key with the one loaded by cert, must be called with the lock held"
+        now = time.monotonic()
+        if cert.key is None:
+            self._keys = []
+            return
+
+        previous_keys = []
+        if cert.jwt_key_setting == self._key_setting:
+            rotation_window = get_setting('ANSIBLE_BASE_JWT_KEY_ROTATION_WINDOW_SECONDS', 0)
+            for old_key in self._keys:
+                if old_key.pem == cert.key:
+                    continue
+                if old_key.retire_at is None:
+                    logger.info("JWT decryption key has changed")
+                    old_key.retire_at = now + rotation_window
+                if old_key.retire_at > now:
+                    previous_keys.append(old_key)
+
+        self._keys = [JWTPublicKey(cert.key)] + previous_keys
+        self._key_setting = cert.jwt_key_setting
+        self._expires_at = now + get_setting('ANSIBLE_BASE_JWT_KEY_REFRESH_SECONDS', 300)
+
+    def get_keys(self) -> Tuple[list[JWTPublicKey], bool]:
+        """
+        Returns the keys that may validate a token, current key first,
+        and a boolean telling if the current key was just loaded from its source, not from any cache.
+        """
+        key_setting = get_setting(JWTCert.key_name, get_setting('jwt_public_key', None))
+        if self._is_stale(key_setting):
+            with self._lock:
+                # Another thread may have loaded the key while we waited for the lock
+                if self._is_stale(key_setting):
+                    cert = JWTCert()
+                    cert.get_decryption_key()
+                    self._load(cert)
+                    return list(self._keys), cert.cached is False
+        return list(self._keys), False
+
+    def get_loaded_keys(self) -> Optional[list[JWTPublicKey]]:
+        """
+        Returns the keys if they are loaded and do not need a refresh, otherwise None.
+        This never loads the key, so it can be called from async code.
+        """
+        key_setting = get_setting(JWTCert.key_name, get_setting('jwt_public_key', None))
+        if self._is_stale(key_setting):
+            return None
+        return list(self._keys)
+
+    def refresh(self, stale_pem: str) -> list[JWTPublicKey]:
+        """
+        Loads the key from its source after stale_pem failed to validate a token.
+        If another thread already replaced stale_pem, its result is used without fetching again.
+        """
+        with self._lock:
+            if self._keys and self._keys[0].pem != stale_pem:
+                return list(self._keys)
+            cert = JWTCert()
+            cert.get_decryption_key(ignore_cache=True)
+            self._load(cert)
+            return list(self._keys)
+
+
+jwt_key_holder = JWTKeyHolder()
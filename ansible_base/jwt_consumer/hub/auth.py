@@ -5,7 +5,6 @@ from django.contrib.contenttypes.models import ContentType
 from ansible_base.jwt_consumer.common.auth import JWTAuthentication
 from ansible_base.jwt_consumer.common.exceptions import InvalidService
 from ansible_base.rbac.models import RoleDefinition, RoleUserAssignment
-from ansible_base.resource_registry.models import Resource
 
 logger = logging.getLogger('ansible_base.jwt_consumer.hub.auth')
 
@@ -39,15 +38,13 @@ class HubJWTAuth(JWTAuthentication):
         # the teams this user should have a "shared" [!local] assignment to
         member_teams = []
 
+        # resources and teams of all the objects in the token, fetched or created together
+        resolved_objects = self.common_auth.resolve_objects() if self.common_auth.token.get('object_roles') else {}
+
         for role_name in self.common_auth.token.get('object_roles', {}).keys():
             if role_name.startswith('Team'):
                 for object_index in self.common_auth.token['object_roles'][role_name]['objects']:
-                    team_data = self.common_auth.token['objects']['team'][object_index]
-                    ansible_id = team_data['ansible_id']
-                    try:
-                        team = Resource.objects.get(ansible_id=ansible_id).content_object
-                    except Resource.DoesNotExist:
-                        team = self.common_auth.get_or_create_resource('team', team_data)[1]
+                    team = resolved_objects['team'][object_index][1]
 
                     if role_name == 'Team Admin':
                         admin_teams.append(team)
@@ -63,8 +60,13 @@ class HubJWTAuth(JWTAuthentication):
             team_pks = [team.pk for team in teams]
 
             # delete all assignments not defined by this jwt ...
-            for assignment in RoleUserAssignment.objects.filter(user=self.common_auth.user, role_definition=roledef).exclude(object_id__in=team_pks):
-                team = Team.objects.get(pk=assignment.object_id)
+            # object_id is a text column, so the ids are listed instead of used as a subquery
+            stale_team_ids = list(
+                RoleUserAssignment.objects.filter(user=self.common_auth.user, role_definition=roledef)
+                .exclude(object_id__in=team_pks)
+                .values_list('object_id', flat=True)
+            )
+            for team in Team.objects.filter(pk__in=stale_team_ids):
                 roledef.remove_permission(self.common_auth.user, team)
 
             # assign "non-local" for each team ...
@@ -13,10 +13,15 @@ from rest_framework.settings import api_settings
 logger = logging.getLogger('ansible_base.lib.channels.middleware')
 
 
-@database_sync_to_async
-def _get_authenticated_user(scope: dict):
+def _build_request(scope: dict) -> HttpRequest:
     request = HttpRequest()
     request.META = {_http_key(k.decode()): v.decode() for (k, v) in scope["headers"]}
+    return request
+
+
+@database_sync_to_async
+def _get_authenticated_user(scope: dict):
+    request = _build_request(scope)
     auth_classes = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
     try:
         return Request(request, authenticators=auth_classes).user
@@ -24,13 +29,37 @@ def _get_authenticated_user(scope: dict):
         return None
 
 
+async def _aget_authenticated_user(scope: dict):
+    """
+    Authenticates like _get_authenticated_user, but authenticators with an aauthenticate method,
+    like the JWT authentication classes, are awaited instead of being run in a worker thread.
+    The authenticators are tried in the order of DEFAULT_AUTHENTICATION_CLASSES.
+    """
+    auth_classes = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    if not any(hasattr(authenticator, 'aauthenticate') for authenticator in auth_classes):
+        return await _get_authenticated_user(scope)
+
+    request = Request(_build_request(scope), authenticators=auth_classes)
+    try:
+        for authenticator in auth_classes:
+            if hasattr(authenticator, 'aauthenticate'):
+                user_auth_tuple = await authenticator.aauthenticate(request)
+            else:
+                user_auth_tuple = await database_sync_to_async(authenticator.authenticate)(request)
+            if user_auth_tuple is not None:
+                return user_auth_tuple[0]
+    except Exception:
+        return None
+    return None
+
+
 class DrfAuthMiddleware(AuthMiddleware):
     async def __call__(self, scope, receive, send):
         session_user = await get_session_user(scope)
         if session_user and session_user.is_authenticated:
             user = session_user
         else:
-            user = await _get_authenticated_user(scope)
+            user = await _aget_authenticated_user(scope)
 
         if not user or not isinstance(user, get_user_model()):
             logger.error("Websocket connection does not provide valid authentication")
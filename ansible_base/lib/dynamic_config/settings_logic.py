@@ -212,6 +212,10 @@ def get_dab_settings(
         # entries mapping that permission to the assignment's organization
         dab_data['ANSIBLE_BASE_CACHE_PARENT_PERMISSIONS'] = False
 
+        # Time RBAC recomputes and permission evaluations, sending results with the
+        # ansible_base.rbac.instrumentation.rbac_timing signal, which logs them by default
+        dab_data['ANSIBLE_BASE_RBAC_INSTRUMENTATION'] = False
+
         # API clients can assign users and teams roles for shared resources
         dab_data['ALLOW_LOCAL_RESOURCE_MANAGEMENT'] = True
         # API clients can assign roles provided by the JWT
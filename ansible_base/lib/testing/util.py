@@ -57,6 +57,9 @@ class StaticResourceAPIClient(ResourceAPIClient):
         response.status_code = 200
         response.encoding = "utf-8"
 
+        # The content is already read, so iter_content and iter_lines work on it
+        response._content_consumed = True
+
         if path in self.router:
             response.status_code = self.router[path]["status_code"]
             response._content = self.router[path]["content"]
@@ -4,9 +4,9 @@ from uuid import UUID
 from django.apps import apps as django_apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
-from django.db.models import CharField, Model, OuterRef
-from django.db.models.functions import Cast
+from django.db.models import Model
 from django.db.models.query import QuerySet
 
 from ansible_base.lib.abstract_models.organization import AbstractOrganization
@@ -38,15 +38,51 @@ def get_organization_model() -> Type[AbstractOrganization]:
 
 
 def get_object_by_ansible_id(qs: QuerySet, ansible_id: Union[str, UUID], annotate_as: str = 'ansible_id_for_filter') -> Model:
+    """
+    Returns the object of the queryset which has a resource with the given ansible_id
+
+    The resource is looked up by its indexed ansible_id first, and the object by primary key after that.
+    The ansible_id of the resource is set on the object as the annotate_as attribute.
+    """
     resource_cls = django_apps.get_model('dab_resource_registry', 'Resource')
     content_type_cls = django_apps.get_model('contenttypes', 'ContentType')
     cls = qs.model
     ct = content_type_cls.objects.get_for_model(cls)
-    pk_field_name = cls._meta.pk.name
-    pk_reference = Cast(OuterRef(pk_field_name), output_field=CharField())
-    resource_qs = resource_cls.objects.filter(object_id=pk_reference, content_type=ct).values('ansible_id')
-    return qs.annotate(**{annotate_as: resource_qs}).get(**{annotate_as: ansible_id})
+    try:
+        object_id, resource_ansible_id = resource_cls.objects.filter(ansible_id=ansible_id, content_type=ct).values_list('object_id', 'ansible_id').get()
+    except resource_cls.DoesNotExist:
+        raise cls.DoesNotExist(f'{cls._meta.object_name} matching query does not exist.')
+    obj = qs.get(pk=object_id)
+    setattr(obj, annotate_as, resource_ansible_id)
+    return obj
+
+
+# Maps the ansible_id of users to their pk, this uses the default cache so it is shared between processes
+# entries are removed by the resource registry signals when a user resource is deleted or changed
+user_id_cache_key_prefix = 'ansible_base_user_id_for_ansible_id_'
+user_id_cache_timeout = 3600
+
+
+def user_id_cache_key(ansible_id: Union[str, UUID]) -> str:
+    return f'{user_id_cache_key_prefix}{str(ansible_id).lower()}'
+
+
+def forget_user_id_for_ansible_id(ansible_id: Union[str, UUID]) -> None:
+    cache.delete(user_id_cache_key(ansible_id))
 
 
 def get_user_by_ansible_id(ansible_id: Union[str, UUID], annotate_as: str = 'ansible_id_for_filter') -> Model:
-    return get_object_by_ansible_id(get_user_model().objects.all(), ansible_id, annotate_as=annotate_as)
+    user_cls = get_user_model()
+    cache_key = user_id_cache_key(ansible_id)
+    user_id = cache.get(cache_key)
+    if user_id is not None:
+        try:
+            user = user_cls.objects.get(pk=user_id)
+            setattr(user, annotate_as, ansible_id if isinstance(ansible_id, UUID) else UUID(ansible_id))
+            return user
+        except user_cls.DoesNotExist:
+            cache.delete(cache_key)
+
+    user = get_object_by_ansible_id(user_cls.objects.all(), ansible_id, annotate_as=annotate_as)
+    cache.set(cache_key, user.pk, timeout=user_id_cache_timeout)
+    return user
@@ -1,5 +1,6 @@
 from contextlib import contextmanager
 
+from django.apps import apps
 from django.db import connection, transaction
 from django.db.migrations.executor import MigrationExecutor
 
@@ -15,6 +16,18 @@ def ensure_transaction():
         yield
 
 
+def buffered_atomic():
+    """
+    Like transaction.atomic(), but the activity stream entries of the block are written
+    with a single bulk_create once it commits, when the activitystream app is installed
+    """
+    if apps.is_installed('ansible_base.activitystream'):
+        from ansible_base.activitystream import buffered_activity_stream
+
+        return buffered_activity_stream()
+    return transaction.atomic()
+
+
 def migrations_are_complete() -> bool:
     """Returns a boolean telling you if manage.py migrate has been run to completion
 
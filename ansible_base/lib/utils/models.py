@@ -263,7 +263,8 @@ def diff(
                 continue
 
             if all_values_as_strings:
-                if getattr(obj, field) is None:
+                # value_from_object reads the column, without loading related objects
+                if field_obj.value_from_object(obj) is None:
                     value = None
                 else:
                     value = field_obj.value_to_string(obj)
@@ -5,6 +5,7 @@ from uuid import UUID
 
 from django.conf import settings
 
+from ansible_base.rbac.instrumentation import rbac_timer
 from ansible_base.rbac.models import ObjectRole, RoleDefinition, RoleEvaluation, RoleEvaluationUUID
 from ansible_base.rbac.permission_registry import permission_registry
 from ansible_base.rbac.prefetch import TypesPrefetch
@@ -24,6 +25,23 @@ Those methods are what truly dictate the object-role to object-permission transl
 """
 
 
+_evaluations_generation = 0
+
+
+def evaluations_generation() -> int:
+    """Counter that increments every time computed permission data is updated in this process
+
+    Anything that memoizes permission evaluations in memory can compare against this
+    to know that its memo may be out-of-date.
+    """
+    return _evaluations_generation
+
+
+def bump_evaluations_generation() -> None:
+    global _evaluations_generation
+    _evaluations_generation += 1
+
+
 def all_team_parents(team_id: int, team_team_parents: dict, seen: Optional[set] = None) -> set[int]:
     """
     Returns parent teams, and parent teams of parent teams, until we have them all
@@ -127,36 +145,40 @@ def compute_team_member_roles():
     This relationship is a list of teams that the role grants membership for
     This method is always ran globally.
     """
-    # Manually prefetch the team to org memberships
-    org_team_mapping = get_org_team_mapping()
-
-    # Build out the direct member roles for teams
-    direct_member_roles = get_direct_team_member_roles(org_team_mapping)
-
-    # Build a team-to-team child-to-parents mapping for teams that have permission to other teams
-    team_team_parents = get_parent_teams_of_teams(org_team_mapping)
-
-    # Now we need to crawl the team-team graph to get the full list of roles that grants access to each team
-    # for each parent team that grants membership to a team, we need to add the roles that grant
-    # membership to that parent team
-    all_member_roles = {}
-    for team_id, member_roles in direct_member_roles.items():
-        all_member_roles[team_id] = set(member_roles)  # will also avoid mutating original data structure later
-        for parent_team_id in all_team_parents(team_id, team_team_parents):
-            all_member_roles[team_id].update(set(direct_member_roles.get(parent_team_id, [])))
-
-    # Great! we should be done building all_member_roles which tells what roles gives team membership for all teams
-    # now at this point we save that data
-    for team in permission_registry.team_model.objects.prefetch_related('member_roles'):
-        # NOTE: the .set method will not use the prefetched data, thus the messy implementation here
-        existing_ids = set(r.id for r in team.member_roles.all())
-        expected_ids = set(all_member_roles.get(team.id, []))
-        to_add = expected_ids - existing_ids
-        to_remove = existing_ids - expected_ids
-        if to_add:
-            team.member_roles.add(*to_add)
-        if to_remove:
-            team.member_roles.remove(*to_remove)
+    with rbac_timer('compute_team_member_roles') as record:
+        # Manually prefetch the team to org memberships
+        org_team_mapping = get_org_team_mapping()
+
+        # Build out the direct member roles for teams
+        direct_member_roles = get_direct_team_member_roles(org_team_mapping)
+
+        # Build a team-to-team child-to-parents mapping for teams that have permission to other teams
+        team_team_parents = get_parent_teams_of_teams(org_team_mapping)
+
+        # Now we need to crawl the team-team graph to get the full list of roles that grants access to each team
+        # for each parent team that grants membership to a team, we need to add the roles that grant
+        # membership to that parent team
+        all_member_roles = {}
+        for team_id, member_roles in direct_member_roles.items():
+            all_member_roles[team_id] = set(member_roles)  # will also avoid mutating original data structure later
+            for parent_team_id in all_team_parents(team_id, team_team_parents):
+                all_member_roles[team_id].update(set(direct_member_roles.get(parent_team_id, [])))
+        record.object_roles = len(set().union(*all_member_roles.values()))
+
+        # Great! we should be done building all_member_roles which tells what roles gives team membership for all teams
+        # now at this point we save that data
+        for team in permission_registry.team_model.objects.prefetch_related('member_roles'):
+            # NOTE: the .set method will not use the prefetched data, thus the messy implementation here
+            existing_ids = set(r.id for r in team.member_roles.all())
+            expected_ids = set(all_member_roles.get(team.id, []))
+            to_add = expected_ids - existing_ids
+            to_remove = existing_ids - expected_ids
+            if to_add:
+                team.member_roles.add(*to_add)
+            if to_remove:
+                team.member_roles.remove(*to_remove)
+
+    bump_evaluations_generation()
 
 
 def compute_object_role_permissions(object_roles=None, types_prefetch=None):
@@ -164,53 +186,60 @@ def compute_object_role_permissions(object_roles=None, types_prefetch=None):
     Assumes the ObjectRole.provides_teams relationship is correct.
     Makes the RoleEvaluation table correct for all specified object_roles
     """
-    to_delete = set()
-    to_add = []
-
-    if types_prefetch is None:
-        types_prefetch = TypesPrefetch.from_database(RoleDefinition)
-    if object_roles is None:
-        object_roles = ObjectRole.objects.iterator()
-
-    for object_role in object_roles:
-        role_to_delete, role_to_add = object_role.needed_cache_updates(types_prefetch=types_prefetch)
-
-        if role_to_delete:
-            logger.debug(f'Removing {len(role_to_delete)} object-permissions from {object_role}')
-            to_delete.update(role_to_delete)
-
-        if role_to_add:
-            logger.debug(f'Adding {len(role_to_add)} object-permissions to {object_role}')
-            to_add.extend(role_to_add)
-
-    if to_add:
-        logger.info(f'Adding {len(to_add)} object-permission records')
-        to_add_int = []
-        to_add_uuid = []
-        for evaluation in to_add:
-            if isinstance(evaluation.object_id, int):
-                to_add_int.append(evaluation)
-            elif isinstance(evaluation.object_id, UUID):
-                to_add_uuid.append(evaluation)
-            else:
-                raise RuntimeError(f'Could not find a place in cache for {evaluation}')
-        if to_add_int:
-            RoleEvaluation.objects.bulk_create(to_add_int, ignore_conflicts=settings.ANSIBLE_BASE_EVALUATIONS_IGNORE_CONFLICTS)
-        if to_add_uuid:
-            RoleEvaluationUUID.objects.bulk_create(to_add_uuid, ignore_conflicts=settings.ANSIBLE_BASE_EVALUATIONS_IGNORE_CONFLICTS)
-
-    if to_delete:
-        logger.info(f'Deleting {len(to_delete)} object-permission records')
-        to_delete_int = []
-        to_delete_uuid = []
-        for evaluation_id, evaluation_type in to_delete:
-            if evaluation_type is int:
-                to_delete_int.append(evaluation_id)
-            elif evaluation_type is UUID:
-                to_delete_uuid.append(evaluation_id)
-            else:
-                raise RuntimeError(f'Unexpected type to delete {evaluation_id}-{evaluation_type}')
-        if to_delete_int:
-            RoleEvaluation.objects.filter(id__in=to_delete_int).delete()
-        if to_delete_uuid:
-            RoleEvaluationUUID.objects.filter(id__in=to_delete_uuid).delete()
+    with rbac_timer('compute_object_role_permissions') as record:
+        to_delete = set()
+        to_add = []
+
+        if types_prefetch is None:
+            types_prefetch = TypesPrefetch.from_database(RoleDefinition)
+        if object_roles is None:
+            object_roles = ObjectRole.objects.iterator()
+
+        for object_role in object_roles:
+            record.object_roles += 1
+            role_to_delete, role_to_add = object_role.needed_cache_updates(types_prefetch=types_prefetch)
+
+            if role_to_delete:
+                logger.debug(f'Removing {len(role_to_delete)} object-permissions from {object_role}')
+                to_delete.update(role_to_delete)
+
+            if role_to_add:
+                logger.debug(f'Adding {len(role_to_add)} object-permissions to {object_role}')
+                to_add.extend(role_to_add)
+
+        record.evaluations_added = len(to_add)
+        record.evaluations_removed = len(to_delete)
+
+        if to_add:
+            logger.info(f'Adding {len(to_add)} object-permission records')
+            to_add_int = []
+            to_add_uuid = []
+            for evaluation in to_add:
+                if isinstance(evaluation.object_id, int):
+                    to_add_int.append(evaluation)
+                elif isinstance(evaluation.object_id, UUID):
+                    to_add_uuid.append(evaluation)
+                else:
+                    raise RuntimeError(f'Could not find a place in cache for {evaluation}')
+            if to_add_int:
+                RoleEvaluation.objects.bulk_create(to_add_int, ignore_conflicts=settings.ANSIBLE_BASE_EVALUATIONS_IGNORE_CONFLICTS)
+            if to_add_uuid:
+                RoleEvaluationUUID.objects.bulk_create(to_add_uuid, ignore_conflicts=settings.ANSIBLE_BASE_EVALUATIONS_IGNORE_CONFLICTS)
+
+        if to_delete:
+            logger.info(f'Deleting {len(to_delete)} object-permission records')
+            to_delete_int = []
+            to_delete_uuid = []
+            for evaluation_id, evaluation_type in to_delete:
+                if evaluation_type is int:
+                    to_delete_int.append(evaluation_id)
+                elif evaluation_type is UUID:
+                    to_delete_uuid.append(evaluation_id)
+                else:
+                    raise RuntimeError(f'Unexpected type to delete {evaluation_id}-{evaluation_type}')
+            if to_delete_int:
+                RoleEvaluation.objects.filter(id__in=to_delete_int).delete()
+            if to_delete_uuid:
+                RoleEvaluationUUID.objects.filter(id__in=to_delete_uuid).delete()
+
+    bump_evaluations_generation()
@@ -7,6 +7,7 @@ from django.db.models.query import QuerySet
 from rest_framework.serializers import ValidationError
 
 from ansible_base.rbac import permission_registry
+from ansible_base.rbac.instrumentation import rbac_timer
 from ansible_base.rbac.models import DABPermission, RoleDefinition, get_evaluation_model
 from ansible_base.rbac.validators import validate_codename_for_model
 
@@ -79,10 +80,11 @@ class AccessibleObjectsDescriptor(BaseEvaluationDescriptor):
         if codename == 'view' and ('view' not in self.cls._meta.default_permissions):
             # Model does not track view permissions
             return queryset
-        full_codename = validate_codename_for_model(codename, self.cls)
-        if actor._meta.model_name == 'user' and has_super_permission(actor, full_codename):
-            return queryset
-        return get_evaluation_model(self.cls).accessible_objects(self.cls, actor, full_codename, queryset=queryset)
+        with rbac_timer('access_qs'):
+            full_codename = validate_codename_for_model(codename, self.cls)
+            if actor._meta.model_name == 'user' and has_super_permission(actor, full_codename):
+                return queryset
+            return get_evaluation_model(self.cls).accessible_objects(self.cls, actor, full_codename, queryset=queryset)
 
 
 class AccessibleIdsDescriptor(BaseEvaluationDescriptor):
@@ -101,10 +103,11 @@ class AccessibleIdsDescriptor(BaseEvaluationDescriptor):
 def bound_has_obj_perm(self, obj, codename) -> bool:
     if not permission_registry.is_registered(obj):
         raise ValidationError(f'Object of {obj._meta.model_name} type is not registered with DAB RBAC')
-    full_codename = validate_codename_for_model(codename, obj)
-    if has_super_permission(self, full_codename):
-        return True
-    return get_evaluation_model(obj).has_obj_perm(self, obj, full_codename)
+    with rbac_timer('has_obj_perm'):
+        full_codename = validate_codename_for_model(codename, obj)
+        if has_super_permission(self, full_codename):
+            return True
+        return get_evaluation_model(obj).has_obj_perm(self, obj, full_codename)
 
 
 def connect_rbac_methods(cls):
@@ -0,0 +1,115 @@
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection
+from django.dispatch import Signal
+
+logger = logging.getLogger('ansible_base.rbac.instrumentation')
+
+
+"""
+Timing and query counting for the RBAC hot paths, intended for diagnosing slow
+permission evaluations and recomputes in production.
+
+Records are only collected if ANSIBLE_BASE_RBAC_INSTRUMENTATION is True.
+When disabled, instrumented code pays for one settings lookup.
+
+Every record is sent with the rbac_timing signal, receivers get a record=RBACTimingRecord kwarg.
+A logging receiver is connected by default, and applications may connect their own, like:
+
+from ansible_base.rbac.instrumentation import PrometheusExporter, rbac_timing
+
+rbac_timing.connect(PrometheusExporter(), weak=False)
+"""
+
+rbac_timing = Signal()
+
+
+@dataclass
+class RBACTimingRecord:
+    operation: str
+    duration: float = 0.0
+    object_roles: int = 0
+    evaluations_added: int = 0
+    evaluations_removed: int = 0
+    queries: int = 0
+
+
+def instrumentation_enabled() -> bool:
+    return getattr(settings, 'ANSIBLE_BASE_RBAC_INSTRUMENTATION', False)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def rbac_timer(operation: str):
+    """Context manager that times the enclosed block and sends a rbac_timing signal
+
+    Yields a record, the caller may fill in counts like record.object_roles
+    which will be reported along with the duration and number of queries.
+    """
+    record = RBACTimingRecord(operation=operation)
+    if not instrumentation_enabled():
+        yield record
+        return
+
+    counter = _QueryCounter()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(counter):
+            yield record
+    finally:
+        record.duration = time.perf_counter() - start
+        record.queries = counter.count
+        rbac_timing.send(sender=RBACTimingRecord, record=record)
+
+
+def log_rbac_timing(sender, record: RBACTimingRecord, **kwargs) -> None:
+    "Default receiver for the rbac_timing signal"
+    logger.info(
+        f'{record.operation} took {record.duration * 1000:.2f}ms, queries={record.queries}, object_roles={record.object_roles}, '
+        f'evaluations_added={record.evaluations_added}, evaluations_removed={record.evaluations_removed}'
+    )
+
+
+rbac_timing.connect(log_rbac_timing, dispatch_uid='ansible_base.rbac.instrumentation.log_rbac_timing')
+
+
+class PrometheusExporter:
+    """Receiver for the rbac_timing signal that exports to prometheus_client metrics
+
+    This requires the prometheus_client library, which is not a dependency of django-ansible-base.
+    """
+
+    def __init__(self, registry: Optional[object] = None, prefix: str = 'dab_rbac'):
+        try:
+            from prometheus_client import REGISTRY, Counter, Histogram
+        except ImportError:
+            raise RuntimeError('The prometheus_client library must be installed to use the RBAC PrometheusExporter')
+
+        if registry is None:
+            registry = REGISTRY
+        labels = ['operation']
+        self.duration = Histogram(f'{prefix}_operation_seconds', 'Duration of RBAC operations', labels, registry=registry)
+        self.queries = Counter(f'{prefix}_operation_queries', 'Database queries issued by RBAC operations', labels, registry=registry)
+        self.object_roles = Counter(f'{prefix}_object_roles_processed', 'Object roles processed by RBAC operations', labels, registry=registry)
+        self.evaluations_added = Counter(f'{prefix}_evaluations_added', 'Role evaluations created', labels, registry=registry)
+        self.evaluations_removed = Counter(f'{prefix}_evaluations_removed', 'Role evaluations deleted', labels, registry=registry)
+
+    def __call__(self, sender, record: RBACTimingRecord, **kwargs) -> None:
+        self.duration.labels(record.operation).observe(record.duration)
+        self.queries.labels(record.operation).inc(record.queries)
+        self.object_roles.labels(record.operation).inc(record.object_roles)
+        self.evaluations_added.labels(record.operation).inc(record.evaluations_added)
+        self.evaluations_removed.labels(record.operation).inc(record.evaluations_removed)
@@ -209,14 +209,17 @@ class RoleDefinition(CommonModel):
 
         # Clear any cached permissions
         if actor._meta.model_name == 'user':
-            if hasattr(actor, '_singleton_permissions'):
-                delattr(actor, '_singleton_permissions')
+            for attr in ('_singleton_permissions', '_visible_org_ids'):
+                if hasattr(actor, attr):
+                    delattr(actor, attr)
         else:
             # when team permissions change, users in memory may be affected by this
             # but there is no way to know what users, so we use a global flag
+            from ansible_base.rbac.caching import bump_evaluations_generation
             from ansible_base.rbac.evaluations import bound_singleton_permissions
 
             bound_singleton_permissions._team_clear_signal = True
+            bump_evaluations_generation()
 
         return assignment
 
@@ -447,6 +450,94 @@ class RoleTeamAssignment(AssignmentBase):
         return self.team
 
 
+class ExpansionPlan:
+    """Compiled instructions for what evaluations an object role produces
+
+    This depends only on the role definition permissions and the type of the object role,
+    not on the object, so it is computed once and saved in _expansion_plans.
+    object_codenames - codenames that are evaluated on the object of the role itself
+    child_groups - evaluation content type id to (child_model, filter_path, codenames)
+      where child objects are found by child_model.objects.filter(**{filter_path: object_id})
+    """
+
+    def __init__(self, role_model):
+        self.role_model = role_model
+        self.object_codenames = set()
+        self.child_groups = {}
+
+    @classmethod
+    def compile(cls, role_definition_id, role_content_type, permissions, types_prefetch):
+        plan = cls(role_content_type.model_class())
+        child_models = permission_registry.get_child_models(plan.role_model)
+        for permission in permissions:
+            permission_content_type = types_prefetch.get_content_type(permission.content_type_id)
+
+            # direct object permission
+            if permission.content_type_id == role_content_type.id:
+                plan.object_codenames.add(permission.codename)
+                continue
+
+            # add child permission on the parent object, usually only for add permission
+            if is_add_perm(permission.codename) or settings.ANSIBLE_BASE_CACHE_PARENT_PERMISSIONS:
+                plan.object_codenames.add(permission.codename)
+
+            # add child object permission on child objects
+            # Only propogate add permission to children which are parents of the permission model
+            filter_path = None
+            child_model = None
+            if is_add_perm(permission.codename):
+                for path, model in child_models:
+                    if '__' in path and model._meta.model_name == permission_content_type.model:
+                        path_to_parent, filter_path = path.split('__', 1)
+                        child_model = permission_content_type.model_class()._meta.get_field(path_to_parent).related_model
+                        eval_ct = ContentType.objects.get_for_model(child_model).id
+                if not child_model:
+                    continue
+            else:
+                for path, model in child_models:
+                    if model._meta.model_name == permission_content_type.model:
+                        filter_path = path
+                        child_model = model
+                        eval_ct = permission.content_type_id
+                        break
+                else:
+                    logger.warning(f'RoleDefinition(pk={role_definition_id}) listed {permission.codename} but model is not a child, ignoring')
+                    continue
+
+            # for multiple permissions of same type, the first one found determines the query
+            if eval_ct not in plan.child_groups:
+                plan.child_groups[eval_ct] = (child_model, filter_path, [])
+            plan.child_groups[eval_ct][2].append(permission.codename)
+        return plan
+
+
+# role_definition_id to {plan_key: ExpansionPlan}
+_expansion_plans = {}
+
+
+def get_expansion_plan(object_role, types_prefetch) -> ExpansionPlan:
+    """Return the saved ExpansionPlan for the role definition and type of object_role, compiling it if needed
+
+    The key includes the ids of the permissions from types_prefetch,
+    so a stale plan is never used even if another process edited the role definition.
+    """
+    permissions = list(types_prefetch.permissions_for_object_role(object_role))
+    plan_key = (object_role.content_type_id, tuple(perm.id for perm in permissions), settings.ANSIBLE_BASE_CACHE_PARENT_PERMISSIONS)
+    rd_plans = _expansion_plans.setdefault(object_role.role_definition_id, {})
+    if plan_key not in rd_plans:
+        role_content_type = types_prefetch.get_content_type(object_role.content_type_id)
+        rd_plans[plan_key] = ExpansionPlan.compile(object_role.role_definition_id, role_content_type, permissions, types_prefetch)
+    return rd_plans[plan_key]
+
+
+def clear_expansion_plans(role_definition_id: Optional[int] = None) -> None:
+    "Discard saved plans for one role definition, or for all of them"
+    if role_definition_id is None:
+        _expansion_plans.clear()
+    else:
+        _expansion_plans.pop(role_definition_id, None)
+
+
 class ObjectRole(ObjectRoleFields):
     """
     This is the successor to the Role model in the old AWX RBAC system
@@ -514,59 +605,21 @@ class ObjectRole(ObjectRoleFields):
 
     def expected_direct_permissions(self, types_prefetch=None):
         expected_evaluations = set()
-        cached_id_lists = {}
         if not types_prefetch:
             types_prefetch = TypesPrefetch()
-        role_content_type = types_prefetch.get_content_type(self.content_type_id)
-        role_model = role_content_type.model_class()
+        plan = get_expansion_plan(self, types_prefetch)
         # ObjectRole.object_id is stored as text, we convert it to the model pk native type
-        object_id = role_model._meta.pk.to_python(self.object_id)
-        for permission in types_prefetch.permissions_for_object_role(self):
-            permission_content_type = types_prefetch.get_content_type(permission.content_type_id)
-
-            # direct object permission
-            if permission.content_type_id == self.content_type_id:
-                expected_evaluations.add((permission.codename, self.content_type_id, object_id))
-                continue
-
-            # add child permission on the parent object, usually only for add permission
-            if is_add_perm(permission.codename) or settings.ANSIBLE_BASE_CACHE_PARENT_PERMISSIONS:
-                expected_evaluations.add((permission.codename, self.content_type_id, object_id))
+        object_id = plan.role_model._meta.pk.to_python(self.object_id)
 
-            # add child object permission on child objects
-            # Only propogate add permission to children which are parents of the permission model
-            filter_path = None
-            child_model = None
-            if is_add_perm(permission.codename):
-                for path, model in permission_registry.get_child_models(role_model):
-                    if '__' in path and model._meta.model_name == permission_content_type.model:
-                        path_to_parent, filter_path = path.split('__', 1)
-                        child_model = permission_content_type.model_class()._meta.get_field(path_to_parent).related_model
-                        eval_ct = ContentType.objects.get_for_model(child_model).id
-                if not child_model:
-                    continue
-            else:
-                for path, model in permission_registry.get_child_models(role_model):
-                    if model._meta.model_name == permission_content_type.model:
-                        filter_path = path
-                        child_model = model
-                        eval_ct = permission.content_type_id
-                        break
-                else:
-                    logger.warning(f'{self.role_definition} listed {permission.codename} but model is not a child, ignoring')
-                    continue
-
-            # fetching child objects of an organization is very performance sensitive
-            # for multiple permissions of same type, make sure to only do query once
-            id_list = []
-            if eval_ct in cached_id_lists:
-                id_list = cached_id_lists[eval_ct]
-            else:
-                id_list = child_model.objects.filter(**{filter_path: object_id}).values_list('pk', flat=True)
-                cached_id_lists[eval_ct] = list(id_list)
+        for codename in plan.object_codenames:
+            expected_evaluations.add((codename, self.content_type_id, object_id))
 
-            for id in id_list:
-                expected_evaluations.add((permission.codename, eval_ct, id))
+        # fetching child objects of an organization is very performance sensitive
+        # plans are grouped by the evaluation type so this is one query per type
+        for eval_ct, (child_model, filter_path, codenames) in plan.child_groups.items():
+            for id in child_model.objects.filter(**{filter_path: object_id}).values_list('pk', flat=True):
+                for codename in codenames:
+                    expected_evaluations.add((codename, eval_ct, id))
         return expected_evaluations
 
     def needed_cache_updates(self, types_prefetch=None):
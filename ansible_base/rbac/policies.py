@@ -1,21 +1,64 @@
 from django.apps import apps
 from django.conf import settings
-from django.db.models import Model
+from django.db.models import Exists, Model, OuterRef, Q
 from django.db.models.query import QuerySet
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import PermissionDenied
 
 from ansible_base.lib.utils.settings import get_setting
+from ansible_base.rbac.caching import evaluations_generation
 from ansible_base.rbac.evaluations import has_super_permission
-from ansible_base.rbac.models import ObjectRole
+from ansible_base.rbac.models import ObjectRole, RoleDefinition
 from ansible_base.rbac.permission_registry import permission_registry
 from ansible_base.rbac.validators import permissions_allowed_for_role
 
 
+def _policy_memo(request_user) -> dict:
+    """Returns the memo of organization lookups for the user
+
+    The memo lives on the user object, which normally lives for one request,
+    so that visible_users and can_change_user do not repeat the organization lookups.
+    Any recompute of role evaluations invalidates the memo.
+    """
+    memo = getattr(request_user, '_visible_org_ids', None)
+    if memo is None or memo[0] != evaluations_generation():
+        memo = (evaluations_generation(), {'org_ids': {}})
+        request_user._visible_org_ids = memo
+    return memo[1]
+
+
+def member_org_role_definition_ids(request_user) -> list[int]:
+    """Ids of role definitions that give membership to an organization
+
+    These are few, so evaluating them up-front keeps the permission join
+    out of the user queries that use them. The result is memoized like visible_org_ids.
+    """
+    memo = _policy_memo(request_user)
+    if 'member_role_definition_ids' not in memo:
+        memo['member_role_definition_ids'] = list(RoleDefinition.objects.filter(permissions__codename='member_organization').values_list('id', flat=True))
+    return memo['member_role_definition_ids']
+
+
+def visible_org_ids(request_user, full_codename: str) -> set[str]:
+    """Returns the ids of organizations the user has the given permission to
+
+    The ids are returned as text to match ObjectRole.object_id.
+    The result is memoized on the user object, see _policy_memo.
+    """
+    org_cls = apps.get_model(settings.ANSIBLE_BASE_ORGANIZATION_MODEL)
+    org_ids = _policy_memo(request_user)['org_ids']
+    if full_codename not in org_ids:
+        org_ids[full_codename] = set(str(pk) for pk in org_cls.access_qs(request_user, full_codename).values_list('pk', flat=True))
+    return org_ids[full_codename]
+
+
 def visible_users(request_user, queryset=None, always_show_superusers=True, always_show_self=True) -> QuerySet:
-    """Gives a queryset of users that another user should be able to view"""
+    """Gives a queryset of users that another user should be able to view
+
+    All conditions are combined into a single WHERE clause with an EXISTS subquery,
+    which avoids OR-ing querysets together and the DISTINCT that requires.
+    """
     user_cls = permission_registry.user_model
-    org_cls = apps.get_model(settings.ANSIBLE_BASE_ORGANIZATION_MODEL)
 
     if can_view_all_users(request_user):
         if queryset is not None:
@@ -23,26 +66,29 @@ def visible_users(request_user, queryset=None, always_show_superusers=True, alwa
         else:
             return user_cls.objects.all()
 
-    object_id_fd = ObjectRole._meta.get_field('object_id')
-    members_of_visible_orgs = ObjectRole.objects.filter(
-        role_definition__permissions__codename='member_organization', object_id__in=org_cls.access_ids_qs(request_user, 'view', cast_field=object_id_fd)
-    ).values('users')
     if queryset is None:
-        queryset = user_cls.objects
-
-    queryset = queryset.filter(pk__in=members_of_visible_orgs)
+        queryset = user_cls.objects.all()
+
+    visible_filter = Q(pk__in=[])
+    org_ids = visible_org_ids(request_user, 'view_organization')
+    if org_ids:
+        member_roles = ObjectRole.objects.filter(
+            users=OuterRef('pk'),
+            role_definition_id__in=member_org_role_definition_ids(request_user),
+            content_type_id=permission_registry.org_ct_id,
+            object_id__in=org_ids,
+        )
+        visible_filter |= Q(Exists(member_roles))
     if always_show_superusers:
-        queryset = queryset | user_cls.objects.filter(is_superuser=True)
+        visible_filter |= Q(is_superuser=True)
     if always_show_self:
-        queryset = queryset | user_cls.objects.filter(pk=request_user.id)
-    return queryset.distinct()
+        visible_filter |= Q(pk=request_user.id)
+    return queryset.filter(visible_filter)
 
 
 def can_view_all_users(request_user):
-    org_cls = apps.get_model(settings.ANSIBLE_BASE_ORGANIZATION_MODEL)
-
     return has_super_permission(request_user, 'view') or (
-        get_setting('ORG_ADMINS_CAN_SEE_ALL_USERS', False) and org_cls.access_ids_qs(request_user, 'change').exists()
+        get_setting('ORG_ADMINS_CAN_SEE_ALL_USERS', False) and bool(visible_org_ids(request_user, 'change_organization'))
     )
 
 
@@ -61,14 +107,13 @@ def can_change_user(request_user, target_user) -> bool:
         return True
 
     # If the user is not in any organizations, answer can not consider organization permissions
-    org_cls = apps.get_model(settings.ANSIBLE_BASE_ORGANIZATION_MODEL)
-    target_user_orgs = org_cls.access_qs(target_user, 'member_organization')
-    if not target_user_orgs.exists():
+    target_user_orgs = visible_org_ids(target_user, 'member_organization')
+    if not target_user_orgs:
         return request_user.is_superuser
 
     # Organization admins can manage users in their organization
     # this requires change permission to all organizations the target user is a member of
-    return not target_user_orgs.exclude(pk__in=org_cls.access_ids_qs(request_user, 'change_organization')).exists()
+    return target_user_orgs.issubset(visible_org_ids(request_user, 'change_organization'))
 
 
 def check_content_obj_permission(request_user, obj) -> None:
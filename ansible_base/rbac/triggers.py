@@ -1,15 +1,18 @@
 import logging
+import threading
 from contextlib import contextmanager
 from typing import Optional, Union
 from uuid import UUID
 
+from django.db import transaction
 from django.db.models import Model, Q
 from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
 from django.db.utils import ProgrammingError
 from django.dispatch import Signal
 
 from ansible_base.rbac.caching import compute_object_role_permissions, compute_team_member_roles
-from ansible_base.rbac.models import ObjectRole, RoleDefinition, RoleEvaluation, get_evaluation_model
+from ansible_base.rbac.instrumentation import rbac_timer
+from ansible_base.rbac.models import ObjectRole, RoleDefinition, RoleEvaluation, clear_expansion_plans, get_evaluation_model
 from ansible_base.rbac.permission_registry import permission_registry
 from ansible_base.rbac.validators import validate_team_assignment_enabled
 
@@ -43,48 +46,91 @@ def needed_updates_on_assignment(role_definition, actor, object_role, created=Fa
     returns tuple
         (bool: should update team owners, set: object roles to update)
     """
-    # we maintain a list of object roles that we need to update evaluations for
-    to_update = set()
-    if created:
-        to_update.add(object_role)
+    with rbac_timer('needed_updates_on_assignment') as record:
+        # we maintain a list of object roles that we need to update evaluations for
+        to_update = set()
+        if created:
+            to_update.add(object_role)
 
-    has_team_perm = role_definition.permissions.filter(codename=permission_registry.team_permission).exists()
+        has_team_perm = role_definition.permissions.filter(codename=permission_registry.team_permission).exists()
 
-    if actor._meta.model_name == permission_registry.team_model._meta.model_name:
-        has_org_member = role_definition.permissions.filter(codename='member_organization').exists()
+        if actor._meta.model_name == permission_registry.team_model._meta.model_name:
+            has_org_member = role_definition.permissions.filter(codename='member_organization').exists()
+
+            # Raise exception if settings prohibits this assignment
+            validate_team_assignment_enabled(object_role.content_type, has_team_perm=has_team_perm, has_org_member=has_org_member)
+
+        # If permissions for team are changed. That tends to affect a lot.
+        changes_team_owners = False
+        if actor._meta.model_name != 'user':
+            to_update.update(team_ancestor_roles(actor))
+            if not giving:
+                # this will delete some permission assignments that will be removed from this relationship
+                to_update.update(object_role.descendent_roles())
+            changes_team_owners = True
+
+        deleted = False
+        if (not giving) and (not (object_role.users.exists() or object_role.teams.exists())):
+            # time to delete the object role because it is unused
+            if object_role in to_update:
+                to_update.remove(object_role)
+            deleted = True
+
+        # giving or revoking team permissions may not change the parentage
+        # but this will still change what downstream roles grant what permissions
+        if (has_team_perm and created) or (giving and changes_team_owners):
+            to_update.update(object_role.descendent_roles())
 
-        # Raise exception if settings prohibits this assignment
-        validate_team_assignment_enabled(object_role.content_type, has_team_perm=has_team_perm, has_org_member=has_org_member)
+        # actions which can change the team parentage structure
+        recompute_teams = bool(has_team_perm and (created or deleted or changes_team_owners))
+        record.object_roles = len(to_update)
 
-    # If permissions for team are changed. That tends to affect a lot.
-    changes_team_owners = False
-    if actor._meta.model_name != 'user':
-        to_update.update(team_ancestor_roles(actor))
-        if not giving:
-            # this will delete some permission assignments that will be removed from this relationship
-            to_update.update(object_role.descendent_roles())
-        changes_team_owners = True
+        return (recompute_teams, to_update)
 
-    deleted = False
-    if (not giving) and (not (object_role.users.exists() or object_role.teams.exists())):
-        # time to delete the object role because it is unused
-        if object_role in to_update:
-            to_update.remove(object_role)
-        deleted = True
 
-    # giving or revoking team permissions may not change the parentage
-    # but this will still change what downstream roles grant what permissions
-    if (has_team_perm and created) or (giving and changes_team_owners):
-        to_update.update(object_role.descendent_roles())
+_deferred = threading.local()
+
+
+@contextmanager
+def defer_recompute():
+    """
+    Within this context, role evaluations are recomputed once on exit,
+    instead of after every give_permission or remove_permission call.
+    This is intended for applying a batch of user assignments, permission checks
+    made inside of the context will not reflect the assignments made in it.
+    The context is atomic, so assignments are never committed without their evaluations.
+    """
+    if getattr(_deferred, 'active', False):
+        yield  # nested, outermost context will do the recompute
+        return
 
-    # actions which can change the team parentage structure
-    recompute_teams = bool(has_team_perm and (created or deleted or changes_team_owners))
+    _deferred.active = True
+    _deferred.update_teams = False
+    _deferred.to_update = set()
+    with transaction.atomic():
+        try:
+            yield
+        finally:
+            # If the body raised, its assignments are rolled back with the transaction, so only the state is reset
+            _deferred.active = False
+            update_teams, to_update = _deferred.update_teams, _deferred.to_update
+            _deferred.update_teams = False
+            _deferred.to_update = set()
 
-    return (recompute_teams, to_update)
+        if update_teams:
+            compute_team_member_roles()
+        if to_update:
+            # Object roles may have been deleted by later removals in the batch, and in-memory objects may be stale
+            compute_object_role_permissions(object_roles=ObjectRole.objects.filter(id__in=[object_role.id for object_role in to_update if object_role.id]))
 
 
 def update_after_assignment(update_teams, to_update):
     "Call this with the output of needed_updates_on_assignment"
+    if getattr(_deferred, 'active', False):
+        _deferred.update_teams = _deferred.update_teams or update_teams
+        _deferred.to_update.update(to_update)
+        return
+
     if update_teams:
         compute_team_member_roles()
 
@@ -94,6 +140,10 @@ def update_after_assignment(update_teams, to_update):
 def permissions_changed(instance, action, model, pk_set, reverse, **kwargs):
     if action.startswith('pre_'):
         return
+    if reverse:
+        clear_expansion_plans()
+    else:
+        clear_expansion_plans(instance.id)
     to_recompute = set(ObjectRole.objects.filter(role_definition=instance).prefetch_related('teams__member_roles'))
     if not to_recompute:
         return
@@ -122,6 +122,7 @@ def connect_resource_signals(sender, **kwargs):
             signals.post_delete.connect(handlers.remove_resource, sender=cls)
 
             if _should_reverse_sync():
+                signals.post_init.connect(handlers.snapshot_synced_fields_post_init, sender=cls)
                 signals.pre_save.connect(handlers.decide_to_sync_update, sender=cls)
                 signals.post_save.connect(handlers.sync_to_resource_server_post_save, sender=cls)
                 signals.pre_delete.connect(handlers.sync_to_resource_server_pre_delete, sender=cls)
@@ -146,6 +147,9 @@ def connect_resource_signals(sender, **kwargs):
 
                 cls.delete = delete
 
+    for model, field_name in handlers.get_synced_m2m_fields():
+        signals.m2m_changed.connect(handlers.update_resource_hash_m2m, sender=getattr(model, field_name).through)
+
 
 def disconnect_resource_signals(sender, **kwargs):
     from ansible_base.resource_registry.signals import handlers
@@ -155,6 +159,7 @@ def disconnect_resource_signals(sender, **kwargs):
             signals.post_save.disconnect(handlers.update_resource, sender=cls)
             signals.post_delete.disconnect(handlers.remove_resource, sender=cls)
 
+            signals.post_init.disconnect(handlers.snapshot_synced_fields_post_init, sender=cls)
             signals.pre_save.disconnect(handlers.decide_to_sync_update, sender=cls)
             signals.post_save.disconnect(handlers.sync_to_resource_server_post_save, sender=cls)
             signals.pre_delete.disconnect(handlers.sync_to_resource_server_pre_delete, sender=cls)
@@ -167,6 +172,9 @@ def disconnect_resource_signals(sender, **kwargs):
                 cls.delete = cls._original_delete
                 del cls._original_delete
 
+    for model, field_name in handlers.get_synced_m2m_fields():
+        signals.m2m_changed.disconnect(handlers.update_resource_hash_m2m, sender=getattr(model, field_name).through)
+
 
 class ResourceRegistryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -175,7 +183,12 @@ class ResourceRegistryConfig(AppConfig):
     verbose_name = 'Service resources API'
 
     def ready(self):
+        from ansible_base.resource_registry.signals import handlers
+
         connect_resource_signals(sender=None)
+        Resource = self.get_model('Resource')
+        signals.post_save.connect(handlers.forget_user_ansible_id, sender=Resource, dispatch_uid='dab_resource_forget_user_ansible_id_save')
+        signals.post_delete.connect(handlers.forget_user_ansible_id, sender=Resource, dispatch_uid='dab_resource_forget_user_ansible_id_delete')
         signals.pre_migrate.connect(disconnect_resource_signals, sender=self)
         signals.post_migrate.connect(initialize_resources, sender=self)
         signals.post_migrate.connect(connect_resource_signals, sender=self)
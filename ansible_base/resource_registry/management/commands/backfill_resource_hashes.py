@@ -0,0 +1,63 @@
+"""
+Command to populate the resource_hash column of the resources of shared resource types.
+The manifest endpoint serves this column, resources without a hash are serialized on every request.
+
+Usage::
+
+    django-admin backfill_resource_hashes  # resources without a hash
+
+Optional resource type name argument::
+
+    django-admin backfill_resource_hashes shared.user shared.team
+
+Optional parameters::
+
+    `--all` to recompute every hash, for example after a bulk update that bypassed signals
+    `--batch-size number` number of resources to load and update at a time
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ansible_base.resource_registry.models import Resource, ResourceType
+
+
+class Command(BaseCommand):
+    help = "Populate the stored hash of shared resources, which is served by the resource type manifest."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "resource_type_names",
+            nargs="*",
+            help="Optional, one or more names e.g: `shared.user` or `shared.user shared.organization`",
+        )
+        parser.add_argument("--all", action="store_true", default=False, help="Recompute every hash, not only the missing ones")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of resources to process at a time")
+
+    def handle(self, *args, **options):
+        resource_types = [rt for rt in ResourceType.objects.all() if rt.can_be_managed]
+        if names := options["resource_type_names"]:
+            valid_options = [rt.name for rt in resource_types]
+            if invalid := [name for name in names if name not in valid_options]:
+                raise CommandError(f"Invalid resource_type {', '.join(invalid)}, options are {valid_options}")
+            resource_types = [rt for rt in resource_types if rt.name in names]
+
+        for resource_type in resource_types:
+            updated = self.backfill(resource_type, options["all"], options["batch_size"])
+            self.stdout.write(f"{resource_type.name}: updated {updated} resource hashes")
+
+    def backfill(self, resource_type, recompute_all, batch_size):
+        resources = Resource.objects.filter(content_type=resource_type.content_type).order_by("pk")
+        if not recompute_all:
+            resources = resources.filter(resource_hash__isnull=True)
+
+        updated = 0
+        last_pk = 0
+        while True:
+            # Resources leave the resource_hash__isnull filter as they are updated, so paginate by pk
+            batch = list(resources.filter(pk__gt=last_pk).prefetch_related("content_object")[:batch_size])
+            if not batch:
+                return updated
+            last_pk = batch[-1].pk
+            changed = [resource for resource in batch if resource.refresh_resource_hash(resource.content_object)]
+            Resource.objects.bulk_update(changed, ["resource_hash", "hash_updated"])
+            updated += len(changed)
@@ -0,0 +1,39 @@
+"""
+Command to deliver the reverse sync outbox to the resource server, see RESOURCE_SERVER_SYNC_OUTBOX.
+
+Usage::
+
+    django-admin dispatch_reverse_sync  # deliver the entries which are due and exit
+
+Optional parameters::
+
+    `--batch-size number` number of entries to load and coalesce at a time
+    `--loop` keep running as a worker, dispatching every `--interval` seconds
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ansible_base.resource_registry.tasks.reverse_sync import dispatch_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver the changes waiting in the reverse sync outbox to the resource server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of outbox entries to process at a time")
+        parser.add_argument("--loop", action="store_true", default=False, help="Keep dispatching until interrupted")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to wait between dispatches with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            record = dispatch_outbox(batch_size=options["batch_size"])
+            if record.delivered or record.failed or not options["loop"]:
+                self.stdout.write(
+                    f"Delivered {record.delivered} | Failed {record.failed} | Coalesced {record.coalesced} | "
+                    f"Queue depth {record.queue_depth} | Oldest entry {record.oldest_entry_age:.1f}s"
+                )
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,32 @@
+"""
+Command to delete old resource changes, which are listed by the changes endpoint of the resource types.
+
+Services pulling the changes with `resource_sync --delta` need to run a full sync at least once
+per retention period, as the deletes which were pruned before they pulled them are otherwise missed.
+
+Usage::
+
+    django-admin prune_resource_changes  # changes older than 30 days
+
+Optional parameters::
+
+    `--days number` number of days to keep the changes for
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from ansible_base.resource_registry.models import ResourceChange
+
+
+class Command(BaseCommand):
+    help = "Delete the resource changes older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Number of days to keep the changes for")
+
+    def handle(self, *args, **options):
+        count, _ = ResourceChange.objects.filter(changed__lt=now() - timedelta(days=options["days"])).delete()
+        self.stdout.write(f"Deleted {count} resource changes")
@@ -21,6 +21,8 @@ Optional parameters::
     `--retrysleep seconds` to set interval between retries
     `--retain_seconds` to set how much seconds to retain deleted resources
     `--asyncio` Flag to enable asyncio executor
+    `--workers number` to sync with a number of threads, each with its own database connection
+    `--delta` to only pull the changes since the last sync of each resource type
 """
 
 from django.core.management.base import BaseCommand, CommandError
@@ -70,13 +72,27 @@ class Command(BaseCommand):  # pragma: no cover
             required=False,
         )
         parser.add_argument("--asyncio", action="store_true", default=False, help="Enable asyncio executor")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of threads syncing resources concurrently, requires a database that allows concurrent writes.",
+            required=False,
+        )
+        parser.add_argument(
+            "--delta",
+            action="store_true",
+            default=False,
+            help="Only sync the changes since the last sync of each resource type, types never synced are synced in full.",
+        )
 
     def handle(self, *args, **options):
         """Handle RESOURCE_PROVIDER sync"""
-        arguments = ["resource_type_names", "retries", "retrysleep", "retain_seconds", "asyncio"]
+        arguments = ["resource_type_names", "retries", "retrysleep", "retain_seconds", "asyncio", "workers", "delta"]
         options = {k: v for k, v in options.items() if k in arguments}
         try:
-            executor = SyncExecutor(**options, stdout=self.stdout)
+            # Results are only written out, not kept, so large manifests sync in constant memory
+            executor = SyncExecutor(**options, stdout=self.stdout, keep_results=False)
             executor.run()
         except ResourceSyncHTTPError as exc:
             raise CommandError(f"Error accessing Resource Server: {str(exc)}")
@@ -0,0 +1,29 @@
+from django.db import models
+
+from ansible_base.resource_registry.models import Resource
+
+
+class ResourceRegistryManagerMixin:
+    """
+    Mixin for the managers of resource models, bulk_create() and bulk_update() register
+    the resources of the objects with Resource.objects.bulk_register(), like save() does
+    through the post_save signal. Pass reverse_sync=True to also sync them to the resource server.
+
+    Objects made by bulk_create(ignore_conflicts=True) are only registered if the database
+    sets their primary key.
+    """
+
+    def bulk_create(self, objs, *args, reverse_sync=False, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        Resource.objects.bulk_register(objs, reverse_sync=reverse_sync)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, reverse_sync=False, **kwargs):
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        Resource.objects.bulk_register(objs, reverse_sync=reverse_sync)
+        return rows
+
+
+class ResourceRegistryManager(ResourceRegistryManagerMixin, models.Manager):
+    pass
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dab_resource_registry', '0005_resource_is_partially_migrated_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='resource_hash',
+            field=models.CharField(default=None, help_text='Hash of the shared data of the content_object, as listed in the resource type manifest.', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='hash_updated',
+            field=models.DateTimeField(default=None, help_text='The date/time the resource_hash was last changed.', null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:30
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dab_resource_registry', '0006_resource_resource_hash_resource_hash_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReverseSyncEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='The date/time the change was made.')),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=16)),
+                ('resource_type', models.CharField(help_text='Name of the resource type, like shared.user.', max_length=256)),
+                ('ansible_id', models.UUIDField(db_index=True)),
+                ('resource_data', models.JSONField(default=None, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='The shared data of the resource at the time of the change.', null=True)),
+                ('jwt_user_id', models.UUIDField(default=None, help_text='ansible_id of the user who made the change, the change is synced as this user.', null=True)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of failed deliveries.')),
+                ('next_attempt', models.DateTimeField(default=None, help_text='The entry is not retried before this date/time.', null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
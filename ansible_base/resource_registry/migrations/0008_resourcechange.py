@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('dab_resource_registry', '0007_reversesyncentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='change_sequence',
+            field=models.BigIntegerField(db_index=True, default=None, help_text='Sequence of the last change to the shared data of the content_object, listed by the resource type changes.', null=True),
+        ),
+        migrations.AddField(
+            model_name='resourcetype',
+            name='sync_cursor',
+            field=models.BigIntegerField(default=None, help_text='Change sequence of the resource server that the resources of this type were last synced to.', null=True),
+        ),
+        migrations.CreateModel(
+            name='ResourceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ansible_id', models.UUIDField(db_index=True)),
+                ('service_id', models.UUIDField(help_text='ID of the service managing the resource at the time of the change.')),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=16)),
+                ('changed', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='The date/time of the change.')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resource_changes', to='contenttypes.contenttype')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['content_type', 'id'], name='dab_resourc_content_57e87f_idx')],
+            },
+        ),
+    ]
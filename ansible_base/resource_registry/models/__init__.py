@@ -1,2 +1,4 @@
+from .change import ResourceChange, listed_sequence_limit, settled_before  # noqa: 401
+from .outbox import ReverseSyncEntry  # noqa: 401
 from .resource import Resource, ResourceType, init_resource_from_object  # noqa: 401
 from .service_identifier import service_id  # noqa: 401
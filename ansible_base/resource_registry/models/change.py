@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import Count, Max, Min
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+
+
+def settled_before():
+    "Changes recorded before this time can be listed by the changes endpoint of their resource type"
+    return now() - timedelta(seconds=getattr(settings, 'RESOURCE_CHANGES_SETTLE_SECONDS', 30))
+
+
+class ResourceChange(models.Model):
+    """
+    A change to the shared data of a resource. The id is the change sequence listed by the
+    changes endpoint of the resource type, deleted resources are kept as tombstones.
+    """
+
+    ACTION_CHOICES = (
+        ("create", _("Create")),
+        ("update", _("Update")),
+        ("delete", _("Delete")),
+    )
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name="resource_changes")
+    ansible_id = models.UUIDField(db_index=True)
+    service_id = models.UUIDField(help_text=_("ID of the service managing the resource at the time of the change."))
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES)
+    changed = models.DateTimeField(default=now, editable=False, help_text=_("The date/time of the change."))
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["content_type", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.id} {self.action} {self.ansible_id}"
+
+
+def listed_sequence_limit():
+    """
+    Returns the highest change sequence that the changes endpoints can list, None when there is no limit.
+
+    Sequences are given when changes are inserted, so the changes of a transaction committing late leave a hole
+    below the changes already committed. The changes listed stop below the hole until the change after it is older
+    than RESOURCE_CHANGES_GAP_SECONDS, then the hole is taken as changes which were rolled back.
+    """
+    recent = ResourceChange.objects.filter(changed__gt=now() - timedelta(seconds=getattr(settings, 'RESOURCE_CHANGES_GAP_SECONDS', 600)))
+    bounds = recent.aggregate(count=Count('id'), first=Min('id'), last=Max('id'))
+    if not bounds['count']:
+        return None
+    if bounds['first'] > 1 and not ResourceChange.objects.filter(id=bounds['first'] - 1).exists():
+        return bounds['first'] - 2
+    if bounds['count'] == bounds['last'] - bounds['first'] + 1:
+        return None
+    sequences = list(recent.order_by('id').values_list('id', flat=True))
+    return next(sequence for sequence, following in zip(sequences, sequences[1:]) if following != sequence + 1)
@@ -0,0 +1,37 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+
+
+class ReverseSyncEntry(models.Model):
+    """
+    A change to a resource waiting to be reverse-synced to the resource server.
+
+    Entries are written in the transaction of the change when RESOURCE_SERVER_SYNC_OUTBOX is enabled,
+    and delivered in order by ansible_base.resource_registry.tasks.reverse_sync.dispatch_outbox.
+    """
+
+    ACTION_CHOICES = (
+        ("create", _("Create")),
+        ("update", _("Update")),
+        ("delete", _("Delete")),
+    )
+
+    created = models.DateTimeField(default=now, editable=False, help_text=_("The date/time the change was made."))
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES)
+    resource_type = models.CharField(max_length=256, help_text=_("Name of the resource type, like shared.user."))
+    ansible_id = models.UUIDField(db_index=True)
+    resource_data = models.JSONField(
+        null=True, default=None, encoder=DjangoJSONEncoder, help_text=_("The shared data of the resource at the time of the change.")
+    )
+    jwt_user_id = models.UUIDField(null=True, default=None, help_text=_("ansible_id of the user who made the change, the change is synced as this user."))
+    attempts = models.PositiveIntegerField(default=0, help_text=_("Number of failed deliveries."))
+    next_attempt = models.DateTimeField(null=True, default=None, help_text=_("The entry is not retried before this date/time."))
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.action} {self.resource_type} {self.ansible_id}"
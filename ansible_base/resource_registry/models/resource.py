@@ -1,13 +1,19 @@
 import uuid
 from functools import lru_cache
-from typing import Union
+from typing import Optional, Union
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models, transaction
+from django.utils.functional import cached_property
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from rest_framework.serializers import ValidationError
 
+from ansible_base.lib.utils.auth import forget_user_id_for_ansible_id
+from ansible_base.lib.utils.db import buffered_atomic
+
+from .change import ResourceChange, settled_before
 from .service_identifier import service_id
 
 
@@ -17,15 +23,21 @@ def resource_type_cache(content_type_id):
 
 
 class ResourceType(models.Model):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    @cached_property
+    def resource_registry(self):
+        # Loaded when needed, not for every resource type read with select_related
         from ansible_base.resource_registry.registry import get_registry
 
-        self.resource_registry = get_registry()
+        return get_registry()
 
     content_type = models.OneToOneField(ContentType, on_delete=models.CASCADE, related_name="resource_type", unique=True)
     externally_managed = models.BooleanField()
     name = models.CharField(max_length=256, unique=True, db_index=True, editable=False, blank=False, null=False)
+    sync_cursor = models.BigIntegerField(
+        null=True,
+        default=None,
+        help_text="Change sequence of the resource server that the resources of this type were last synced to.",
+    )
 
     @property
     def serializer_class(self):
@@ -39,7 +51,89 @@ class ResourceType(models.Model):
         return self.resource_registry.get_config_for_model(model=ContentType.objects.get_for_id(self.content_type_id).model_class())
 
 
+class ResourceManager(models.Manager):
+    def record_changes(self, changes: list) -> None:
+        "Bulk version of Resource.record_change() for a list of (resource, action), without saving the resources"
+        records = ResourceChange.objects.bulk_create(
+            [
+                ResourceChange(content_type_id=resource.content_type_id, ansible_id=resource.ansible_id, service_id=resource.service_id, action=action)
+                for resource, action in changes
+            ]
+        )
+        for (resource, _action), record in zip(changes, records):
+            resource.change_sequence = record.pk
+
+    def bulk_register(self, objs, batch_size: int = 1000, reverse_sync: bool = False) -> list:
+        """
+        Create or update the resources of saved instances of resource models, what the post_save
+        signal does for a single instance, for objects made by bulk_create() or changed by bulk_update().
+
+        Every batch_size objects cost a constant number of queries. The resource_hash of the objects is
+        computed in bulk, and existing resources whose name and hash are unchanged are left alone.
+        With reverse_sync, the changes are also synced to the resource server in bulk.
+        Returns the created and updated resources.
+        """
+        from ..utils.resource_type_serializers import get_related_ansible_ids
+
+        objs_by_model = {}
+        for obj in objs:
+            # Objects made by bulk_create(ignore_conflicts=True) may not have a pk
+            if obj.pk is not None:
+                objs_by_model.setdefault(obj._meta.concrete_model, []).append(obj)
+
+        resources = []
+        changes = []
+        with buffered_atomic():
+            for model, model_objs in objs_by_model.items():
+                content_type = ContentType.objects.get_for_model(model)
+                resource_type = resource_type_cache(content_type.pk)
+                resource_config = resource_type.get_resource_config()
+                for start in range(0, len(model_objs), batch_size):
+                    batch = model_objs[start : start + batch_size]
+                    batch_resources = self.filter(content_type=content_type, object_id__in=[str(obj.pk) for obj in batch])
+                    existing = {resource.object_id: resource for resource in batch_resources}
+                    serializer = None
+                    if serializer_class := resource_config.managed_serializer:
+                        serializer = serializer_class(context={"related_ansible_ids": get_related_ansible_ids(serializer_class, batch)})
+                    to_create = []
+                    to_update = []
+                    for obj in batch:
+                        resource = existing.get(str(obj.pk))
+                        if resource is None:
+                            resource = init_resource_from_object(obj, resource_type=resource_type, resource_config=resource_config)
+                            if serializer is not None:
+                                resource.resource_hash = serializer.hash_instance(obj)
+                                resource.hash_updated = now()
+                            to_create.append(resource)
+                            changes.append((obj, resource, "create"))
+                            continue
+
+                        name = str(getattr(obj, resource_config.name_field))[:512] if hasattr(obj, resource_config.name_field) else resource.name
+                        resource_hash = serializer.hash_instance(obj) if serializer is not None else None
+                        if name == resource.name and resource_hash == resource.resource_hash:
+                            continue
+                        resource.name = name
+                        if resource_hash != resource.resource_hash:
+                            resource.resource_hash = resource_hash
+                            resource.hash_updated = now()
+                        to_update.append(resource)
+                        changes.append((obj, resource, "update"))
+                    self.record_changes([(resource, "create") for resource in to_create] + [(resource, "update") for resource in to_update])
+                    self.bulk_create(to_create)
+                    self.bulk_update(to_update, ["name", "resource_hash", "hash_updated", "change_sequence"])
+                    resources.extend(to_create)
+                    resources.extend(to_update)
+
+        if reverse_sync and changes:
+            from ..utils.sync_to_resource_server import bulk_sync_to_resource_server
+
+            bulk_sync_to_resource_server(changes)
+        return resources
+
+
 class Resource(models.Model):
+    objects = ResourceManager()
+
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name="resources")
 
     # this has to accommodate integer and UUID object IDs
@@ -64,6 +158,26 @@ class Resource(models.Model):
         help_text="This gets set to True when a resource has been copied into the resource server, but the service_id hasn't been updated yet.",
     )
 
+    resource_hash = models.CharField(
+        max_length=64,
+        null=True,
+        default=None,
+        help_text="Hash of the shared data of the content_object, as listed in the resource type manifest.",
+    )
+
+    hash_updated = models.DateTimeField(
+        null=True,
+        default=None,
+        help_text="The date/time the resource_hash was last changed.",
+    )
+
+    change_sequence = models.BigIntegerField(
+        null=True,
+        default=None,
+        db_index=True,
+        help_text="Sequence of the last change to the shared data of the content_object, listed by the resource type changes.",
+    )
+
     def summary_fields(self):
         return {"ansible_id": self.ansible_id, "resource_type": self.resource_type}
 
@@ -77,17 +191,85 @@ class Resource(models.Model):
             models.Index(fields=["content_type", "object_id"]),
         ]
 
-    def update_from_content_object(self):
+    def update_from_content_object(self, content_object=None):
         """
         Update any cached attributes from the Resource's content_object
         """
+        if content_object is None:
+            content_object = self.content_object
         name_field = self.content_type.resource_type.get_resource_config().name_field
 
-        if hasattr(self.content_object, name_field):
-            name = getattr(self.content_object, name_field)[:512]
+        update_fields = []
+        if hasattr(content_object, name_field):
+            name = getattr(content_object, name_field)[:512]
             if self.name != name:
                 self.name = name
-                self.save()
+                update_fields.append('name')
+
+        if self.refresh_resource_hash(content_object):
+            self.record_change("update")
+            update_fields.extend(['resource_hash', 'hash_updated', 'change_sequence'])
+
+        if update_fields:
+            self.save(update_fields=update_fields)
+
+    def compute_resource_hash(self, content_object=None) -> Optional[str]:
+        """
+        Serialize the content_object with its shared resource type serializer and return the hash,
+        None for resource types that are not shared
+        """
+        serializer_class = resource_type_cache(self.content_type_id).serializer_class
+        if content_object is None:
+            content_object = self.content_object
+        if serializer_class is None or content_object is None:
+            return None
+        return serializer_class(content_object).get_hash()
+
+    def record_change(self, action: str) -> ResourceChange:
+        """
+        Record a change of the resource for the resource type changes and set change_sequence, without saving.
+        """
+        change = ResourceChange.objects.create(content_type_id=self.content_type_id, ansible_id=self.ansible_id, service_id=self.service_id, action=action)
+        self.change_sequence = change.pk
+        return change
+
+    def assign_ids(self, ansible_id: Union[str, uuid.UUID, None] = None, service_id: Union[str, uuid.UUID, None] = None, uncommitted: bool = False) -> None:
+        """
+        Set the ansible_id and service_id given to the resource, without saving.
+
+        The changes of the resource which are not listed by the changes endpoint yet are moved to the new ids.
+        If the resource may have been listed under the old ansible_id, it is deleted and created under the new one instead.
+        Pass uncommitted=True when all the changes of the resource were recorded in the current transaction.
+        """
+        changes = ResourceChange.objects.filter(content_type_id=self.content_type_id, ansible_id=self.ansible_id)
+        if not uncommitted:
+            if ansible_id and str(ansible_id) != str(self.ansible_id) and changes.filter(changed__lte=settled_before()).exists():
+                # To the resource type changes, the resource under the old ansible_id is gone
+                self.record_change("delete")
+                self.ansible_id = ansible_id
+                if service_id:
+                    self.service_id = service_id
+                self.record_change("create")
+                return
+            changes = changes.filter(changed__gt=settled_before())
+
+        if ansible_id:
+            self.ansible_id = ansible_id
+        if service_id:
+            self.service_id = service_id
+        changes.update(ansible_id=self.ansible_id, service_id=self.service_id)
+
+    def refresh_resource_hash(self, content_object=None) -> bool:
+        """
+        Set resource_hash from the current state of the content_object, without saving.
+        Returns True if the hash changed.
+        """
+        resource_hash = self.compute_resource_hash(content_object)
+        if resource_hash == self.resource_hash:
+            return False
+        self.resource_hash = resource_hash
+        self.hash_updated = now()
+        return True
 
     @classmethod
     def get_resource_for_object(cls, obj):
@@ -126,10 +308,8 @@ class Resource(models.Model):
                 content_object.save(resource_data, is_new=True)
             resource = cls.objects.get(object_id=content_object.instance.pk, content_type=c_type)
 
-            if ansible_id:
-                resource.ansible_id = ansible_id
-            if service_id:
-                resource.service_id = service_id
+            # The create was recorded with the generated ids
+            resource.assign_ids(ansible_id=ansible_id, service_id=service_id, uncommitted=True)
             resource.save()
 
             return resource
@@ -147,7 +327,13 @@ class Resource(models.Model):
 
         with transaction.atomic():
             if ansible_id:
-                self.ansible_id = ansible_id
+                # post_save only knows the new ansible_id, so the old one is forgotten here
+                forget_user_id_for_ansible_id(self.ansible_id)
+                if str(ansible_id) != str(self.ansible_id):
+                    # To the resource type changes, the resource under the old ansible_id is gone
+                    self.record_change("delete")
+                    self.ansible_id = ansible_id
+                    self.record_change("create")
             if service_id:
                 self.service_id = service_id
             if is_partially_migrated is not None:
@@ -12,10 +12,14 @@ class ResourceServerConfig(TypedDict):
     SECRET_KEY: str
     VALIDATE_HTTPS: bool
     JWT_ALGORITHM: str
+    TIMEOUT: float
+    RETRIES: int
+    RETRY_BACKOFF: float
+    POOL_MAXSIZE: int
 
 
 def get_resource_server_config() -> ResourceServerConfig:
-    defaults = {"JWT_ALGORITHM": "HS256", "VALIDATE_HTTPS": True}
+    defaults = {"JWT_ALGORITHM": "HS256", "VALIDATE_HTTPS": True, "TIMEOUT": 30, "RETRIES": 3, "RETRY_BACKOFF": 0.5, "POOL_MAXSIZE": 10}
     defaults.update(settings.RESOURCE_SERVER)
     return defaults
 
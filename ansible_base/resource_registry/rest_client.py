@@ -1,10 +1,14 @@
 import logging
+import os
+import threading
 import time
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 from typing import Optional
 
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from ansible_base.resource_registry.resource_server import get_resource_server_config, get_service_token
 
@@ -20,15 +24,92 @@ urllib3.disable_warnings()
 logger = logging.getLogger('ansible_base.resources_api.rest_client')
 
 
+_sessions = {}
+_clients = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Clients are cached per jwt_user_id, which is a user for reverse sync, so the cache is bounded
+CLIENT_CACHE_SIZE = 128
+
+
+def get_session(retries: int = 0, retry_backoff: float = 0.5, pool_maxsize: int = 10) -> requests.Session:
+    """
+    Returns the requests session of this thread for the given retry and pool settings,
+    its connection pool keeps connections to the resource server alive between requests.
+
+    Requests are retried on connection errors, and idempotent requests also on read errors and
+    502, 503 and 504 responses, waiting retry_backoff * 2 ** (retry - 1) seconds between retries.
+    """
+    # Sessions are not shared with forked processes, which would use the same sockets,
+    # nor between threads, as requests does not guarantee that a session is thread safe
+    key = (os.getpid(), threading.get_ident(), retries, retry_backoff, pool_maxsize)
+    with _cache_lock:
+        if key not in _sessions:
+            # Drop the sessions of threads which are gone, like the workers of a finished sync,
+            # the sockets of sessions inherited from a parent process are left to it
+            alive = {thread.ident for thread in threading.enumerate()}
+            for stale_key in [k for k in _sessions if k[0] != key[0] or k[1] not in alive]:
+                session = _sessions.pop(stale_key)
+                if stale_key[0] == key[0]:
+                    session.close()
+            retry = Retry(
+                total=retries,
+                backoff_factor=retry_backoff,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+
 def get_resource_server_client(service_path, **kwargs):
+    """
+    Returns a client for the configured resource server.
+
+    Clients are cached for the process, by the configuration and arguments,
+    so the JWT of a client is reused until it expires.
+    """
     config = get_resource_server_config()
+    key = (
+        os.getpid(),
+        service_path,
+        tuple(sorted((k, str(v)) for k, v in config.items())),
+        tuple(sorted((k, str(v)) for k, v in kwargs.items())),
+    )
+    with _cache_lock:
+        if key in _clients:
+            _clients.move_to_end(key)
+            return _clients[key]
 
-    return ResourceAPIClient(
+    client = ResourceAPIClient(
         service_url=config["URL"],
         service_path=service_path,
         verify_https=config["VALIDATE_HTTPS"],
+        timeout=config["TIMEOUT"],
+        retries=config["RETRIES"],
+        retry_backoff=config["RETRY_BACKOFF"],
+        pool_maxsize=config["POOL_MAXSIZE"],
         **kwargs,
     )
+    with _cache_lock:
+        _clients[key] = client
+        while len(_clients) > CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+    return client
+
+
+def clear_resource_server_clients():
+    "Clears the process cache of clients and sessions, e.g. after the resource server settings change"
+    with _cache_lock:
+        _clients.clear()
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
 
 
 class ResourceAPIClient:
@@ -48,6 +129,10 @@ class ResourceAPIClient:
         raise_if_bad_request: bool = False,
         jwt_user_id=None,
         jwt_expiration=60,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        retry_backoff: float = 0.5,
+        pool_maxsize: int = 10,
     ):
         """
         service_url (str): fully qualified hostname for the service that the client
@@ -59,6 +144,10 @@ class ResourceAPIClient:
             successful status code.
         jwt_user_id (UUID): ansible ID of the user to make the request as.
         jwt_expiration (int): number of seconds that the JWT token is valid.
+        timeout (float): seconds to wait for the server to connect or send data, None waits forever.
+        retries (int): number of times to retry requests, see get_session.
+        retry_backoff (float): backoff factor between retries.
+        pool_maxsize (int): number of connections kept alive per host.
         """
         if jwt_user_id is not None:
             jwt_user_id = str(jwt_user_id)
@@ -70,6 +159,13 @@ class ResourceAPIClient:
         self.jwt_expiration = jwt_expiration
         self._jwt = None
         self._jwt_timeout = None
+        self.timeout = timeout
+        self._session_options = {"retries": retries, "retry_backoff": retry_backoff, "pool_maxsize": pool_maxsize}
+
+    @property
+    def session(self) -> requests.Session:
+        "The session of the current thread, so a client can be used by several threads"
+        return get_session(**self._session_options)
 
     def refresh_jwt(self):
         # Add a buffer to the token timeout to account for slower requests.
@@ -98,7 +194,7 @@ class ResourceAPIClient:
         url = self.base_url + path.lstrip("/")
         logger.info(f"Making {method} request to {url}.")
 
-        kwargs = {**self.requests_auth_kwargs, "method": method, "url": url, "verify": self.verify_https}
+        kwargs = {**self.requests_auth_kwargs, "method": method, "url": url, "verify": self.verify_https, "timeout": self.timeout}
 
         if data:
             kwargs["json"] = data
@@ -107,7 +203,7 @@ class ResourceAPIClient:
         if stream:
             kwargs["stream"] = stream
 
-        resp = requests.request(**kwargs)
+        resp = self.session.request(**kwargs)
         logger.debug(f"Response status code from {url}: {resp.status_code}")
 
         if self.raise_if_bad_request:
@@ -151,6 +247,11 @@ class ResourceAPIClient:
     def list_resources(self, filters: Optional[dict] = None):
         return self._make_request("get", "resources/", params=filters)
 
+    def get_resources(self, ansible_ids: list):
+        """List the resources with the given ansible_ids, including their resource_data"""
+        filters = {"ansible_id__in": ",".join(str(ansible_id) for ansible_id in ansible_ids), "include_resource_data": "true", "page_size": len(ansible_ids)}
+        return self._make_request("get", "resources/", params=filters)
+
     def get_resource_type(self, name):
         return self._make_request("get", f"resource-types/{name}/")
 
@@ -159,3 +260,11 @@ class ResourceAPIClient:
 
     def get_resource_type_manifest(self, name):
         return self._make_request("get", f"resource-types/{name}/manifest/", stream=True)
+
+    def get_resource_type_changes(self, name, since: Optional[int] = None, limit: Optional[int] = None):
+        params = {}
+        if since is not None:
+            params["since"] = since
+        if limit is not None:
+            params["limit"] = limit
+        return self._make_request("get", f"resource-types/{name}/changes/", params=params)
@@ -1,11 +1,14 @@
 import logging
 from typing import Optional
 
+from django.db import models
+from django.db.models import prefetch_related_objects
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from ansible_base.lib.utils.response import get_relative_url
 from ansible_base.resource_registry.models import Resource, ResourceType
+from ansible_base.resource_registry.utils.resource_type_serializers import get_related_ansible_ids
 
 logger = logging.getLogger('ansible_base.serializers')
 
@@ -17,8 +20,8 @@ class ResourceDataField(serializers.JSONField):
     """
 
     def to_representation(self, resource):
-        if serializer := resource.content_type.resource_type.serializer_class:
-            return serializer(resource.content_object).data
+        if serializer_class := self.parent.get_resource_config(resource).managed_serializer:
+            return self.parent.get_shared_serializer(serializer_class).serialize(resource.content_object)
         return {}
 
     def to_internal_value(self, data):
@@ -26,6 +29,29 @@ class ResourceDataField(serializers.JSONField):
         return {self.field_name: data}
 
 
+class ResourceBatchSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of resources with a fixed number of queries. The content objects are loaded with one
+    query per content type, and the ansible_ids of their related resources with one query per related type.
+    """
+
+    def to_representation(self, data):
+        resources = list(data.all() if isinstance(data, models.Manager) else data)
+        resource_data = self.child.fields.get("resource_data")
+        if resource_data is not None and not resource_data.write_only:
+            prefetch_related_objects(resources, "content_object")
+            content_objects_by_type = {}
+            for resource in resources:
+                if resource.content_object is not None:
+                    content_objects_by_type.setdefault(resource.content_type_id, (resource, []))[1].append(resource.content_object)
+            related_ansible_ids = self.context.setdefault("related_ansible_ids", {})
+            for resource, content_objects in content_objects_by_type.values():
+                if serializer_class := self.child.get_resource_config(resource).managed_serializer:
+                    for resource_type, ansible_ids in get_related_ansible_ids(serializer_class, content_objects).items():
+                        related_ansible_ids.setdefault(resource_type, {}).update(ansible_ids)
+        return [self.child.to_representation(resource) for resource in resources]
+
+
 class ResourceListSerializer(serializers.ModelSerializer):
     has_serializer = serializers.SerializerMethodField()
     url = serializers.SerializerMethodField()
@@ -49,13 +75,28 @@ class ResourceListSerializer(serializers.ModelSerializer):
             "resource_data",
             "url",
         ]
+        list_serializer_class = ResourceBatchSerializer
+
+    def get_resource_config(self, obj):
+        "The ResourceConfig of the resource type, looked up once per content type for the resources serialized together"
+        resource_configs = self.context.setdefault("resource_configs", {})
+        if obj.content_type_id not in resource_configs:
+            resource_configs[obj.content_type_id] = obj.content_type.resource_type.get_resource_config()
+        return resource_configs[obj.content_type_id]
+
+    def get_shared_serializer(self, serializer_class):
+        "A shared resource type serializer, reused for the resources serialized together"
+        shared_serializers = self.context.setdefault("shared_serializers", {})
+        if serializer_class not in shared_serializers:
+            shared_serializers[serializer_class] = serializer_class(context=self.context)
+        return shared_serializers[serializer_class]
 
     def get_url(self, obj) -> str:
         # conversion to string is done to satisfy type checking and OpenAPI schema generator
         return get_relative_url('resource-detail', kwargs={"ansible_id": obj.ansible_id})
 
     def get_has_serializer(self, obj) -> bool:
-        return bool(obj.content_type.resource_type.get_resource_config().managed_serializer)
+        return bool(self.get_resource_config(obj).managed_serializer)
 
     # update ansible ID
     def update(self, instance, validated_data):
@@ -91,6 +132,12 @@ class ResourceListSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"resource_type": _(f"Resource type: {validated_data['resource_type']} does not exist.")})
 
 
+class ResourceDataListSerializer(ResourceListSerializer):
+    "List serializer which includes resource_data, for reading resources in bulk"
+
+    resource_data = ResourceDataField(source="*", read_only=True)
+
+
 class ResourceSerializer(ResourceListSerializer):
     additional_data = serializers.SerializerMethodField()
     resource_data = ResourceDataField(source="*")
@@ -103,7 +150,7 @@ class ResourceSerializer(ResourceListSerializer):
         ]
 
     def get_additional_data(self, obj):
-        if serializer := obj.content_type.resource_type.serializer_class:
+        if serializer := self.get_resource_config(obj).managed_serializer:
             if serializer.ADDITIONAL_DATA_SERIALIZER is not None:
                 return serializer.ADDITIONAL_DATA_SERIALIZER(obj.content_object).data
 
@@ -2,6 +2,11 @@ import threading
 from contextlib import contextmanager
 from functools import lru_cache
 
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+
+from ansible_base.lib.utils.auth import forget_user_id_for_ansible_id
 from ansible_base.resource_registry.models import Resource, init_resource_from_object
 from ansible_base.resource_registry.registry import get_registry
 from ansible_base.resource_registry.utils.sync_to_resource_server import sync_to_resource_server
@@ -21,6 +26,8 @@ def get_resource_models():
 def remove_resource(sender, instance, **kwargs):
     try:
         resource = Resource.get_resource_for_object(instance)
+        # The tombstone of the resource in the changes of its resource type
+        resource.record_change('delete')
         resource.delete()
     except Resource.DoesNotExist:
         return
@@ -29,12 +36,109 @@ def remove_resource(sender, instance, **kwargs):
 def update_resource(sender, instance, created, **kwargs):
     try:
         resource = Resource.get_resource_for_object(instance)
-        resource.update_from_content_object()
+        resource.update_from_content_object(instance)
+        # Reused by sync_to_resource_server_post_save(), which runs next
+        instance._synced_resource = resource
     except Resource.DoesNotExist:
         resource = init_resource_from_object(instance)
+        resource.refresh_resource_hash(instance)
+        resource.record_change('create')
         resource.save()
 
 
+@lru_cache(maxsize=1)
+def get_synced_m2m_fields():
+    """
+    Returns the many to many fields of the resource models that are also fields of
+    their shared resource type serializer, as a list of (model, field name) tuples.
+    Changes to these fields change the resource hash without saving the model.
+    """
+    synced_m2m_fields = []
+    registry = get_registry()
+    if registry:
+        for resource_config in registry.get_resources().values():
+            if resource_config.managed_serializer is None:
+                continue
+            serializer_fields = resource_config.managed_serializer().get_fields().keys()
+            for field in resource_config.model._meta.many_to_many:
+                if field.name in serializer_fields:
+                    synced_m2m_fields.append((resource_config.model, field.name))
+    return synced_m2m_fields
+
+
+# m2m_changed of the synced many to many fields
+def update_resource_hash_m2m(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if reverse:
+        # instance is the related object, the resources are the objects on the other side
+        if action == 'pre_clear':
+            field_name = next(name for resource_model, name in get_synced_m2m_fields() if getattr(resource_model, name).through is sender)
+            instance._resource_hash_cleared_pks = set(model.objects.filter(**{field_name: instance}).values_list('pk', flat=True))
+            return
+        if action == 'post_clear':
+            pk_set = instance.__dict__.pop('_resource_hash_cleared_pks', None)
+        if action not in ('post_add', 'post_remove', 'post_clear') or not pk_set:
+            return
+        objects = model.objects.filter(pk__in=pk_set)
+    else:
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        objects = [instance]
+
+    for obj in objects:
+        try:
+            resource = Resource.get_resource_for_object(obj)
+        except Resource.DoesNotExist:
+            continue
+        if resource.refresh_resource_hash(obj):
+            resource.record_change('update')
+            resource.save(update_fields=['resource_hash', 'hash_updated', 'change_sequence'])
+
+
+# post_save and post_delete of Resource
+def forget_user_ansible_id(sender, instance, **kwargs):
+    "Removes the user of a changed or deleted resource from the ansible_id to user pk cache"
+    if instance.content_type_id == ContentType.objects.get_for_model(get_user_model()).id:
+        forget_user_id_for_ansible_id(instance.ansible_id)
+
+
+@lru_cache(maxsize=1)
+def get_synced_fields():
+    """
+    Returns the fields of the resource models which are synced to the resource server,
+    as a {model: {serializer field name: model attribute name}} dict.
+    Foreign keys are compared by their _id attribute, so comparing them needs no query.
+    """
+    synced_fields = {}
+    registry = get_registry()
+    if registry:
+        for resource_config in registry.get_resources().values():
+            if resource_config.managed_serializer is None:
+                continue
+            fields = {}
+            for name in resource_config.managed_serializer().get_fields().keys():
+                try:
+                    fields[name] = resource_config.model._meta.get_field(name).attname
+                except (FieldDoesNotExist, AttributeError):
+                    fields[name] = name
+            synced_fields[resource_config.model] = fields
+    return synced_fields
+
+
+def snapshot_synced_fields(instance):
+    """
+    Keeps the loaded values of the synced fields on the instance, for decide_to_sync_update() to diff against.
+    Deferred fields are left out, reading them here would cost a query for every loaded instance.
+    """
+    fields = get_synced_fields().get(instance._meta.concrete_model)
+    if fields:
+        instance._synced_field_values = {attname: instance.__dict__[attname] for attname in fields.values() if attname in instance.__dict__}
+
+
+# post_init
+def snapshot_synced_fields_post_init(sender, instance, **kwargs):
+    snapshot_synced_fields(instance)
+
+
 # pre_save
 def decide_to_sync_update(sender, instance, raw, using, update_fields, **kwargs):
     """
@@ -42,34 +146,32 @@ def decide_to_sync_update(sender, instance, raw, using, update_fields, **kwargs)
     based on which fields have changed.
 
     This has to be in pre-save because we have to be able to get the original
-    instance to calculate which fields changed, if update_fields wasn't passed
+    values to calculate which fields changed, if update_fields wasn't passed.
+    Those come from the snapshot taken when the instance was loaded or last saved.
     """
 
     if instance._state.adding:
         # We only concern ourselves with updates
         return
 
-    try:
-        resource = Resource.get_resource_for_object(instance)
-    except Resource.DoesNotExist:
+    fields_that_sync = get_synced_fields().get(sender._meta.concrete_model)
+    if fields_that_sync is None:
         # We can't sync here, but we want to log that, so let sync_to_resource_server() discard it.
         return
 
-    fields_that_sync = resource.content_type.resource_type.serializer_class().get_fields().keys()
-
     if update_fields is None:
-        # If we're not given a useful update_fields, manually calculate the changed fields
-        # at the cost of an extra query
-        existing_instance = sender.objects.get(pk=instance.pk)
-        changed_fields = set()
-        for field in fields_that_sync:
-            if getattr(existing_instance, field) != getattr(instance, field):
-                changed_fields.add(field)
+        # If we're not given a useful update_fields, calculate the changed fields from the snapshot
+        original_values = getattr(instance, '_synced_field_values', {})
+        if any(attname not in original_values for attname in fields_that_sync.values()):
+            # A field was not loaded with the instance, get the original values at the cost of an extra query
+            existing_instance = sender.objects.get(pk=instance.pk)
+            original_values = {attname: getattr(existing_instance, attname) for attname in fields_that_sync.values()}
+        changed_fields = {name for name, attname in fields_that_sync.items() if original_values[attname] != getattr(instance, attname)}
     else:
-        # If we're given update_fields, we can just check those
+        # If we're given update_fields, we can just check those, by field or attribute name
         changed_fields = set(update_fields)
 
-    if not changed_fields.intersection(fields_that_sync):
+    if not changed_fields.intersection({*fields_that_sync.keys(), *fields_that_sync.values()}):
         instance._skip_reverse_resource_sync = True
 
 
@@ -96,11 +198,14 @@ def no_reverse_sync():
 
 # post_save
 def sync_to_resource_server_post_save(sender, instance, created, update_fields, **kwargs):
-    if not reverse_sync_enabled:
-        return
-
-    action = "create" if created else "update"
-    sync_to_resource_server(instance, action)
+    # Reuse the resource looked up by update_resource() for this save
+    resource = instance.__dict__.pop('_synced_resource', None)
+    if reverse_sync_enabled:
+        action = "create" if created else "update"
+        sync_to_resource_server(instance, action, resource=resource)
+
+    # The saved values are the originals of the next save
+    snapshot_synced_fields(instance)
 
 
 # pre_delete
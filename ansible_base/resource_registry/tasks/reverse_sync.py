@@ -0,0 +1,231 @@
+from __future__ import annotations  # support python<3.10
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from requests import HTTPError
+
+from ansible_base.lib.utils.auth import forget_user_id_for_ansible_id
+from ansible_base.resource_registry.models import Resource, ReverseSyncEntry
+from ansible_base.resource_registry.rest_client import ResourceRequestBody, get_resource_server_client
+
+logger = logging.getLogger('ansible_base.resource_registry.tasks.reverse_sync')
+
+
+"""
+Delivery of the reverse sync outbox, see RESOURCE_SERVER_SYNC_OUTBOX.
+
+Entries are delivered in the order they were written, the entries of a resource
+found in the same batch are coalesced into a single request. A failed delivery
+is retried with exponential backoff, later changes to the same resource wait for it,
+while other resources are still delivered.
+
+A outbox_dispatch signal is sent after every dispatch_outbox() call, receivers get a record=OutboxDispatchRecord kwarg.
+A logging receiver is connected by default, and applications may connect their own, like:
+
+from ansible_base.resource_registry.tasks.reverse_sync import PrometheusExporter, outbox_dispatch
+
+outbox_dispatch.connect(PrometheusExporter(), weak=False)
+"""
+
+outbox_dispatch = Signal()
+
+
+@dataclass
+class OutboxDispatchRecord:
+    delivered: int = 0  # requests sent successfully
+    failed: int = 0  # requests that will be retried
+    coalesced: int = 0  # entries that did not need a request of their own
+    queue_depth: int = 0  # entries left in the outbox
+    oldest_entry_age: float = 0.0  # seconds since the oldest entry left in the outbox was written
+    latencies: list = field(default_factory=list)  # seconds from the first change to delivery, for each request
+    duration: float = 0.0
+
+
+@dataclass
+class OutboxDelivery:
+    "The coalesced entries of a resource"
+
+    action: Optional[str]  # None if nothing needs to be sent
+    entries: list
+
+    @property
+    def first(self) -> ReverseSyncEntry:
+        return self.entries[0]
+
+    @property
+    def latest(self) -> ReverseSyncEntry:
+        return self.entries[-1]
+
+
+def coalesce_entries(entries: list) -> list:
+    """
+    Groups the ordered entries by resource into deliveries, ordered by their first entry.
+
+    A create followed by updates is sent as a create of the latest data, updates as a single update,
+    and updates followed by a delete as the delete. A create followed by a delete never reached
+    the resource server, so nothing is sent. Entries after a delete are left for the next batch.
+    """
+    deliveries = {}
+    closed = set()
+    for entry in entries:
+        if entry.ansible_id in closed:
+            continue
+        delivery = deliveries.get(entry.ansible_id)
+        if delivery is None:
+            delivery = deliveries[entry.ansible_id] = OutboxDelivery(action=entry.action, entries=[entry])
+        else:
+            delivery.entries.append(entry)
+            if entry.action == "delete":
+                delivery.action = None if delivery.action == "create" else "delete"
+            elif delivery.action == "update":
+                delivery.action = entry.action
+        if entry.action == "delete":
+            closed.add(entry.ansible_id)
+    return list(deliveries.values())
+
+
+def retry_delay(attempts: int) -> timedelta:
+    "Time to wait before the next delivery of entries which failed attempts times"
+    backoff = getattr(settings, 'RESOURCE_SERVER_OUTBOX_RETRY_BACKOFF', 5)
+    max_backoff = getattr(settings, 'RESOURCE_SERVER_OUTBOX_MAX_RETRY_BACKOFF', 3600)
+    return timedelta(seconds=min(max_backoff, backoff * 2 ** (attempts - 1)))
+
+
+def deliver(delivery: OutboxDelivery) -> None:
+    "Sends the delivery to the resource server, raises on failure"
+    if delivery.action is None:
+        return
+
+    latest = delivery.latest
+    client = get_resource_server_client(
+        settings.RESOURCE_SERVICE_PATH,
+        jwt_user_id=str(latest.jwt_user_id) if latest.jwt_user_id else None,
+        raise_if_bad_request=True,
+    )
+    ansible_id = str(latest.ansible_id)
+    body = ResourceRequestBody(resource_type=latest.resource_type, ansible_id=ansible_id, resource_data=latest.resource_data)
+
+    if delivery.action == "create":
+        json = client.create_resource(body).json()
+        if isinstance(json, dict):
+            # Like sync_to_resource_server, the resource server has the final say on the ansible_id
+            with transaction.atomic():
+                resource = Resource.objects.filter(ansible_id=ansible_id).first()
+                if resource is not None:
+                    if str(resource.ansible_id) != str(json['ansible_id']):
+                        forget_user_id_for_ansible_id(resource.ansible_id)
+                        ReverseSyncEntry.objects.filter(ansible_id=ansible_id).exclude(pk__in=[entry.pk for entry in delivery.entries]).update(
+                            ansible_id=json['ansible_id']
+                        )
+                    resource.assign_ids(ansible_id=json['ansible_id'], service_id=json['service_id'])
+                    resource.save()
+    elif delivery.action == "update":
+        client.update_resource(ansible_id, body)
+    elif delivery.action == "delete":
+        try:
+            client.delete_resource(ansible_id)
+        except HTTPError as e:
+            # Already gone from the resource server
+            if e.response is None or e.response.status_code != 404:
+                raise
+
+
+def dispatch_outbox(batch_size: int = 100, max_batches: Optional[int] = None) -> OutboxDispatchRecord:
+    """
+    Delivers the entries of the outbox which are due, batch_size entries at a time, until none are left.
+
+    Only one dispatcher should run at a time, concurrent dispatchers could deliver changes out of order.
+    """
+    record = OutboxDispatchRecord()
+    start = time.perf_counter()
+    batches = 0
+    failed_ids = set()
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        now = timezone.now()
+        waiting = ReverseSyncEntry.objects.filter(next_attempt__gt=now).values('ansible_id')
+        entries = list(ReverseSyncEntry.objects.exclude(ansible_id__in=waiting).exclude(ansible_id__in=failed_ids).order_by('id')[:batch_size])
+        if not entries:
+            break
+
+        for delivery in coalesce_entries(entries):
+            try:
+                deliver(delivery)
+            except Exception as e:
+                logger.exception(f"Failed to deliver {delivery.action} of resource {delivery.first.ansible_id} to resource server: {e}")
+                attempts = delivery.first.attempts + 1
+                ReverseSyncEntry.objects.filter(pk__in=[entry.pk for entry in delivery.entries]).update(
+                    attempts=attempts, next_attempt=timezone.now() + retry_delay(attempts), last_error=str(e)
+                )
+                # A retry delay of 0 would otherwise deliver it again in the same call
+                failed_ids.add(delivery.first.ansible_id)
+                record.failed += 1
+                continue
+
+            ReverseSyncEntry.objects.filter(pk__in=[entry.pk for entry in delivery.entries]).delete()
+            if delivery.action is None:
+                record.coalesced += len(delivery.entries)
+            else:
+                record.delivered += 1
+                record.coalesced += len(delivery.entries) - 1
+                record.latencies.append((timezone.now() - delivery.first.created).total_seconds())
+
+    record.queue_depth = ReverseSyncEntry.objects.count()
+    oldest = ReverseSyncEntry.objects.order_by('created').values_list('created', flat=True).first()
+    if oldest is not None:
+        record.oldest_entry_age = (timezone.now() - oldest).total_seconds()
+    record.duration = time.perf_counter() - start
+    outbox_dispatch.send(sender=OutboxDispatchRecord, record=record)
+    return record
+
+
+def log_outbox_dispatch(sender, record: OutboxDispatchRecord, **kwargs) -> None:
+    "Default receiver for the outbox_dispatch signal"
+    max_latency = max(record.latencies, default=0.0)
+    logger.info(
+        f'Reverse sync outbox delivered={record.delivered}, failed={record.failed}, coalesced={record.coalesced}, '
+        f'queue_depth={record.queue_depth}, oldest_entry_age={record.oldest_entry_age:.1f}s, max_latency={max_latency:.1f}s, '
+        f'took {record.duration * 1000:.2f}ms'
+    )
+
+
+outbox_dispatch.connect(log_outbox_dispatch, dispatch_uid='ansible_base.resource_registry.tasks.reverse_sync.log_outbox_dispatch')
+
+
+class PrometheusExporter:
+    """Receiver for the outbox_dispatch signal that exports to prometheus_client metrics
+
+    This requires the prometheus_client library, which is not a dependency of django-ansible-base.
+    """
+
+    def __init__(self, registry: Optional[object] = None, prefix: str = 'dab_reverse_sync'):
+        try:
+            from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+        except ImportError:
+            raise RuntimeError('The prometheus_client library must be installed to use the reverse sync PrometheusExporter')
+
+        if registry is None:
+            registry = REGISTRY
+        self.delivered = Counter(f'{prefix}_delivered', 'Requests delivered to the resource server', registry=registry)
+        self.failed = Counter(f'{prefix}_failed', 'Failed deliveries to the resource server', registry=registry)
+        self.coalesced = Counter(f'{prefix}_coalesced', 'Outbox entries coalesced into another request', registry=registry)
+        self.queue_depth = Gauge(f'{prefix}_queue_depth', 'Entries waiting in the outbox', registry=registry)
+        self.oldest_entry_age = Gauge(f'{prefix}_oldest_entry_age_seconds', 'Age of the oldest entry in the outbox', registry=registry)
+        self.latency = Histogram(f'{prefix}_delivery_latency_seconds', 'Time from a change to its delivery', registry=registry)
+
+    def __call__(self, sender, record: OutboxDispatchRecord, **kwargs) -> None:
+        self.delivered.inc(record.delivered)
+        self.failed.inc(record.failed)
+        self.coalesced.inc(record.coalesced)
+        self.queue_depth.set(record.queue_depth)
+        self.oldest_entry_age.set(record.oldest_entry_age)
+        for latency in record.latencies:
+            self.latency.observe(latency)
@@ -1,22 +1,27 @@
 from __future__ import annotations  # support python<3.10
 
 import asyncio
+import copy
 import csv
+import threading
 import time
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import Executor, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import timedelta
 from enum import Enum
-from io import StringIO, TextIOBase
+from io import TextIOBase
+from typing import Iterable, Iterator
 
 from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import QuerySet
 from django.db.utils import DatabaseError, IntegrityError
 from django.utils import timezone
 from requests import HTTPError
 
+from ansible_base.lib.utils.db import buffered_atomic
 from ansible_base.resource_registry.models import Resource, ResourceType
 from ansible_base.resource_registry.registry import get_registry
 from ansible_base.resource_registry.rest_client import ResourceAPIClient, get_resource_server_client
@@ -34,6 +39,10 @@ class ResourceSyncHTTPError(HTTPError):
     """Custom catchall error"""
 
 
+class ChangesNotFound(HTTPError):
+    """Raise when server returns 404 for the changes of a resource type"""
+
+
 class SyncStatus(str, Enum):
     CREATED = "created"
     UPDATED = "updated"
@@ -74,13 +83,28 @@ def create_api_client() -> ResourceAPIClient:
     return client
 
 
-def fetch_manifest(
+def status_checked_client(api_client: ResourceAPIClient | None = None) -> ResourceAPIClient:
+    """A client which does not raise on bad responses, the sync checks their status itself.
+
+    Clients are shared by the process, see get_resource_server_client, so a copy is changed rather than the given client.
+    """
+    api_client = api_client or create_api_client()
+    if api_client.raise_if_bad_request:
+        api_client = copy.copy(api_client)
+        api_client.raise_if_bad_request = False
+    return api_client
+
+
+def iter_manifest(
     resource_type_name: str,
     api_client: ResourceAPIClient | None = None,
-) -> list[ManifestItem]:
-    """Fetch RESOURCE_SERVER manifest, parses the CSV and returns a list."""
-    api_client = api_client or create_api_client()
-    api_client.raise_if_bad_request = False  # Status check is needed
+    batch_size: int = 1000,
+) -> Iterator[list[ManifestItem]]:
+    """Fetch RESOURCE_SERVER manifest and return an iterator of lists of up to batch_size items.
+
+    The CSV is parsed as it is received, so only one batch is held in memory.
+    """
+    api_client = status_checked_client(api_client)
 
     resp_metadata = api_client.get_service_metadata()
     resp_metadata.raise_for_status()
@@ -96,8 +120,41 @@ def fetch_manifest(
     except HTTPError as exc:
         raise ResourceSyncHTTPError() from exc
 
-    csv_reader = csv.DictReader(StringIO(manifest_stream.text))
-    return [ManifestItem(service_id=service_id, **row) for row in csv_reader]
+    return _read_manifest(manifest_stream, service_id, batch_size)
+
+
+def _read_manifest(manifest_stream, service_id: str, batch_size: int) -> Iterator[list[ManifestItem]]:
+    # Rows are separated by \r\n, which iter_lines may split into an extra empty line
+    lines = (line.decode("utf-8") for line in manifest_stream.iter_lines() if line)
+    batch = []
+    for row in csv.DictReader(lines):
+        batch.append(ManifestItem(service_id=service_id, **row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fetch_changes_cursor(resource_type_name: str, api_client: ResourceAPIClient | None = None) -> int:
+    """The current cursor of the RESOURCE_SERVER changes of a resource type, to pull the changes made after it."""
+    api_client = status_checked_client(api_client)
+    resp = api_client.get_resource_type_changes(resource_type_name)
+    if resp.status_code == 404:
+        raise ChangesNotFound(f"changes for {resource_type_name} NOT FOUND.")
+    try:
+        resp.raise_for_status()
+    except HTTPError as exc:
+        raise ResourceSyncHTTPError() from exc
+    return resp.json()["cursor"]
+
+
+def fetch_manifest(
+    resource_type_name: str,
+    api_client: ResourceAPIClient | None = None,
+) -> list[ManifestItem]:
+    """Fetch RESOURCE_SERVER manifest, parses the CSV and returns a list."""
+    return [item for batch in iter_manifest(resource_type_name, api_client=api_client) for item in batch]
 
 
 def get_orphan_resources(
@@ -111,6 +168,72 @@ def get_orphan_resources(
     ).exclude(ansible_id__in=[item.ansible_id for item in manifest_list])
 
 
+def _iter_local_ansible_ids(resources: QuerySet, chunk_size: int) -> Iterator[str]:
+    """Ansible IDs of the resources in order, read in chunks"""
+    ansible_ids_qs = resources.order_by("ansible_id").values_list("ansible_id", flat=True)
+    last_ansible_id = None
+    while True:
+        chunk_qs = ansible_ids_qs if last_ansible_id is None else ansible_ids_qs.filter(ansible_id__gt=last_ansible_id)
+        chunk = list(chunk_qs[:chunk_size])
+        if not chunk:
+            return
+        last_ansible_id = chunk[-1]
+        for ansible_id in chunk:
+            yield str(ansible_id)
+
+
+def find_orphan_resources(
+    resource_type_name: str,
+    manifest_batches: Iterable[list[ManifestItem]],
+    chunk_size: int = 1000,
+) -> QuerySet:
+    """QuerySet with orphaned managed resources to be deleted, consuming the manifest in batches.
+
+    The manifest is listed in order of ansible_id, so it is merged with the local resources in the same
+    order and only the orphans are kept in memory. If the manifest turns out not to be sorted, the
+    ansible_ids of the local resources that were not matched yet are loaded into a set instead.
+    """
+    local_ansible_ids = None
+    current = previous = None
+    orphans = []
+    unmatched = None  # set of local ansible_ids, once the manifest is known not to be sorted
+
+    for batch in manifest_batches:
+        for item in batch:
+            if local_ansible_ids is None:
+                service_id = item.service_id
+                resources = Resource.objects.filter(service_id=service_id, content_type__resource_type__name=resource_type_name)
+                local_ansible_ids = _iter_local_ansible_ids(resources, chunk_size)
+                current = next(local_ansible_ids, None)
+
+            ansible_id = item.ansible_id
+            if unmatched is None and previous is not None and ansible_id < previous:
+                unmatched = set(orphans)
+                if current is not None:
+                    unmatched.add(current)
+                unmatched.update(local_ansible_ids)
+            if unmatched is not None:
+                unmatched.discard(ansible_id)
+                continue
+
+            previous = ansible_id
+            while current is not None and current < ansible_id:
+                orphans.append(current)
+                current = next(local_ansible_ids, None)
+            if current == ansible_id:
+                current = next(local_ansible_ids, None)
+
+    if local_ansible_ids is None:
+        # Empty manifest, the service_id of the resources is unknown
+        return Resource.objects.none()
+    if unmatched is not None:
+        orphans = list(unmatched)
+    elif current is not None:
+        orphans.append(current)
+        orphans.extend(local_ansible_ids)
+    return resources.filter(ansible_id__in=orphans)
+
+
 def delete_resource(resource: Resource):
     """Wrapper to delete content_object and its related Resource.
     It is up to the caller to wrap it on a database transaction.
@@ -152,13 +275,88 @@ def _attempt_update_resource(
         return SyncResult(SyncStatus.UPDATED, manifest_item)
 
 
+def get_local_hash(resource: Resource) -> str | None:
+    """Hash of the local resource, as served in its manifest."""
+    return resource.resource_hash or resource.compute_resource_hash()
+
+
+@dataclass
+class PrefetchedResources:
+    """Local resources and RESOURCE_SERVER resources of a window of the manifest, read in bulk."""
+
+    # ansible_id: Resource, for every item of the window which exists locally
+    local: dict = field(default_factory=dict)
+    # ansible_id: resource from the RESOURCE_SERVER resource list, including resource_type and resource_data
+    remote: dict = field(default_factory=dict)
+    # name: ResourceType, may be shared by the windows of a sync
+    resource_types: dict = field(default_factory=dict)
+
+    def get_resource_type(self, name: str) -> ResourceType:
+        if name not in self.resource_types:
+            self.resource_types[name] = ResourceType.objects.get(name=name)
+        return self.resource_types[name]
+
+
+def prefetch_resources(
+    manifest_items: list[ManifestItem],
+    api_client: ResourceAPIClient | None = None,
+    batch_size: int = 100,
+    resource_types: dict | None = None,
+    pool: Executor | None = None,
+) -> PrefetchedResources:
+    """Read the local resources of manifest items with one query, and the RESOURCE_SERVER
+    resources of the items that differ in requests of up to batch_size resources.
+    The requests are sent concurrently if a pool is given.
+
+    Resources which could not be read in bulk are left for resource_sync to request one at a time.
+    """
+    api_client = api_client or create_api_client()
+    prefetched = PrefetchedResources(resource_types={} if resource_types is None else resource_types)
+
+    service_ids = {item.ansible_id: str(item.service_id) for item in manifest_items}
+    for resource in Resource.objects.filter(ansible_id__in=list(service_ids)):
+        ansible_id = str(resource.ansible_id)
+        if service_ids.get(ansible_id) == str(resource.service_id):
+            prefetched.local[ansible_id] = resource
+
+    stale_ansible_ids = [
+        item.ansible_id
+        for item in manifest_items
+        if item.ansible_id not in prefetched.local or get_local_hash(prefetched.local[item.ansible_id]) != item.resource_hash
+    ]
+
+    def get_resources(ansible_ids):
+        try:
+            return api_client.get_resources(ansible_ids)
+        except HTTPError:
+            return None
+
+    batches = [stale_ansible_ids[i : i + batch_size] for i in range(0, len(stale_ansible_ids), batch_size)]
+    for resp in (pool.map if pool else map)(get_resources, batches):
+        if resp is None or resp.status_code != 200:
+            # Servers without include_resource_data reject it as a filter
+            continue
+        for resource in resp.json().get("results", []):
+            if "resource_data" in resource:
+                prefetched.remote[str(resource["ansible_id"])] = resource
+
+    return prefetched
+
+
 def resource_sync(
     manifest_item: ManifestItem,
     api_client: ResourceAPIClient | None = None,
+    prefetched: PrefetchedResources | None = None,
 ) -> SyncResult:
-    """Uni-directional sync local resources from RESOURCE_SERVER resources."""
+    """Uni-directional sync local resources from RESOURCE_SERVER resources.
+
+    prefetched is the result of prefetch_resources for a list of items including this one.
+    """
     api_client = api_client or create_api_client()
-    local_managed_resource = get_managed_resource(manifest_item)
+    if prefetched is None:
+        local_managed_resource = get_managed_resource(manifest_item)
+    else:
+        local_managed_resource = prefetched.local.get(manifest_item.ansible_id)
     resource_data = None
     resource_type_name = None
     unavailable = False  # for retry mechanism
@@ -169,6 +367,10 @@ def resource_sync(
         nonlocal resource_type_name
         nonlocal unavailable
         if resource_data is None or resource_type_name is None:
+            if prefetched is not None and (resource := prefetched.remote.get(manifest_item.ansible_id)):
+                resource_data = resource["resource_data"]
+                resource_type_name = resource["resource_type"]
+                return
             resp = api_client.get_resource(manifest_item.ansible_id)
             if 400 <= resp.status_code < 500:  # pragma: no cover
                 unavailable = True
@@ -179,9 +381,7 @@ def resource_sync(
 
     if local_managed_resource:
         # Exists locally: Compare and Update
-        sc = local_managed_resource.content_type.resource_type.serializer_class
-        local_hash = sc(local_managed_resource.content_object).get_hash()
-        if manifest_item.resource_hash == local_hash:
+        if manifest_item.resource_hash == get_local_hash(local_managed_resource):
             return SyncResult(SyncStatus.NOOP, manifest_item)
         set_resource_local_variables()
         if unavailable:  # pragma: no cover
@@ -200,7 +400,10 @@ def resource_sync(
             if unavailable:  # pragma: no cover
                 return SyncResult(SyncStatus.UNAVAILABLE, manifest_item)
             manifest_item.resource_data = resource_data
-            resource_type = ResourceType.objects.get(name=resource_type_name)
+            if prefetched is None:
+                resource_type = ResourceType.objects.get(name=resource_type_name)
+            else:
+                resource_type = prefetched.get_resource_type(resource_type_name)
             Resource.create_resource(
                 resource_type=resource_type,
                 resource_data=resource_data,
@@ -231,12 +434,32 @@ class SyncExecutor:
     attempts: int = 0
     deleted_count: int = 0
     asyncio: bool = False
+    # Pull only the RESOURCE_SERVER changes since the last sync of each resource type, see ResourceType.sync_cursor
+    delta: bool = False
     results: dict = field(default_factory=lambda: defaultdict(list))
+    # Number of manifest items parsed and synced at a time
+    window_size: int = 1000
+    # Keep the manifest item of every result in results, set to False to sync large manifests in constant memory
+    keep_results: bool = True
+    # Number of resources read from RESOURCE_SERVER per request
+    fetch_batch_size: int = 100
+    # ResourceTypes by name, looked up once per sync
+    resource_types: dict = field(default_factory=dict)
+    # Number of threads syncing the items of a window concurrently. Each thread uses its own database
+    # connection and one transaction per window, so this needs a database that allows concurrent writers.
+    # With asyncio, the chunks of a window are awaited concurrently on the same threads.
+    workers: int = 1
+    _pool: ThreadPoolExecutor | None = field(default=None, init=False, repr=False)
+    _write_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self):
+        self.api_client = status_checked_client(self.api_client)
 
     def write(self, text: str = ""):
         """Write to assigned IO or simply ignores the text."""
         if self.stdout:
-            self.stdout.write(text)
+            with self._write_lock:
+                self.stdout.write(text)
 
     def _report_manifest_item(self, result: SyncResult):
         """Record status for each single resource of the manifest."""
@@ -249,71 +472,107 @@ class SyncExecutor:
             msg += f" {details}"
         self.write(msg)
 
-    def _report_results(self, results: list[SyncResult]):
-        """Grouped results report at the end of the execution."""
-        created_count = updated_count = conflicted_count = skipped_count = 0
+    def _record_results(self, results: list[SyncResult], counts: Counter):
+        """Record the results of a window of the manifest."""
         for status, manifest_item in results:
-            self.results[status.value].append(manifest_item)
+            if self.keep_results:
+                self.results[status.value].append(manifest_item)
             self.unavailable.discard(manifest_item)
             # when python>3.10 replace with match
             if status == SyncStatus.UNAVAILABLE:  # pragma: no cover
                 self.unavailable.add(manifest_item)
-            elif status == SyncStatus.CREATED:
-                created_count += 1
-            elif status == SyncStatus.UPDATED:
-                updated_count += 1
-            elif status == SyncStatus.CONFLICT:
-                conflicted_count += 1
-            elif status == SyncStatus.NOOP:
-                skipped_count += 1
-            else:  # pragma: no cover
+            elif status not in (SyncStatus.CREATED, SyncStatus.UPDATED, SyncStatus.CONFLICT, SyncStatus.NOOP):  # pragma: no cover
                 raise TypeError("Unhandled SyncResult")
+            counts[status] += 1
 
+    def _report_results(self, counts: Counter):
+        """Grouped results report at the end of the execution."""
         self.write(
-            f"Processed {len(results) + self.deleted_count} | "
-            f"Created {created_count} | "
-            f"Updated {updated_count} | "
-            f"Conflict {conflicted_count} | "
+            f"Processed {sum(counts.values()) + self.deleted_count} | "
+            f"Created {counts[SyncStatus.CREATED]} | "
+            f"Updated {counts[SyncStatus.UPDATED]} | "
+            f"Conflict {counts[SyncStatus.CONFLICT]} | "
             f"Unavailable {len(self.unavailable)} | "
-            f"Skipped {skipped_count} | "
+            f"Skipped {counts[SyncStatus.NOOP]} | "
             f"Deleted {self.deleted_count}"
         )
 
-    async def _a_process_manifest_item(self, manifest_item):  # pragma: no cover
+    def _prefetch(self, manifest_items):
+        """Read the local and remote resources of a window in bulk."""
+        return prefetch_resources(manifest_items, self.api_client, batch_size=self.fetch_batch_size, resource_types=self.resource_types, pool=self._pool)
+
+    def _split_window(self, batch):
+        """Split the items of a window in one chunk per worker."""
+        size = -(-len(batch) // self.workers)
+        return [batch[i : i + size] for i in range(0, len(batch), size)]
+
+    async def _a_process_manifest_item(self, manifest_item, prefetched=None):  # pragma: no cover
         """Awaitable to process a manifest item using asyncio"""
-        result = await async_resource_sync(manifest_item, self.api_client)
+        result = await async_resource_sync(manifest_item, self.api_client, prefetched)
         self._report_manifest_item(result)
         return result
 
-    async def _a_process_manifest_list(self, manifest_list):  # pragma: no cover
-        """Awaitable to process a sequence of items using Asyncio."""
-        queue = [self._a_process_manifest_item(item) for item in manifest_list]
-        results = await asyncio.gather(*queue)
-        self._report_results(results)
+    async def _a_process_manifest_list(self, manifest_batches):
+        """Awaitable to process windows of items using Asyncio.
 
-    def _process_manifest_item(self, manifest_item):
+        With workers, the chunks of a window are awaited concurrently on the worker threads,
+        otherwise the database work of the items runs on the single thread of sync_to_async.
+        """
+        counts = Counter()
+        loop = asyncio.get_running_loop()
+        for batch in manifest_batches:
+            prefetched = await sync_to_async(self._prefetch)(batch)
+            if self._pool is None:  # pragma: no cover
+                results = await asyncio.gather(*[self._a_process_manifest_item(item, prefetched) for item in batch])
+            else:
+                chunks = [loop.run_in_executor(self._pool, self._process_manifest_items_in_thread, chunk, prefetched) for chunk in self._split_window(batch)]
+                results = [result for chunk_results in await asyncio.gather(*chunks) for result in chunk_results]
+            self._record_results(results, counts)
+        self._report_results(counts)
+
+    def _process_manifest_item(self, manifest_item, prefetched=None):
         """Process a manifest item"""
-        result = resource_sync(manifest_item, self.api_client)
+        result = resource_sync(manifest_item, self.api_client, prefetched)
         self._report_manifest_item(result)
         return result
 
-    def _process_manifest_list(self, manifest_list):
-        """Process items sequentially."""
-        results = [self._process_manifest_item(item) for item in manifest_list]
-        self._report_results(results)
+    def _process_manifest_items_in_thread(self, manifest_items, prefetched):
+        """Process items in a worker thread, in one transaction of the thread's database connection."""
+        try:
+            with buffered_atomic():
+                return [self._process_manifest_item(item, prefetched) for item in manifest_items]
+        finally:
+            connection.close()
 
-    def _cleanup_orphans(self, resource_type, manifest_list):
-        """Delete local managed resources that are not part of the manifest."""
-        resources_to_cleanup = get_orphan_resources(
-            resource_type,
-            manifest_list,
-        )
-        self.deleted_count = resources_to_cleanup.count()
-        if self.deleted_count:
-            self.write(f"Deleting {self.deleted_count} orphaned resources")
+    def _process_manifest_list(self, manifest_batches):
+        """Process windows of items sequentially, or split among the workers.
+
+        The next window is only parsed once the current one is done, so memory does not grow with the manifest.
+        """
+        counts = Counter()
+        for batch in manifest_batches:
+            prefetched = self._prefetch(batch)
+            if self._pool is None:
+                with buffered_atomic():
+                    results = [self._process_manifest_item(item, prefetched) for item in batch]
+            else:
+                futures = [self._pool.submit(self._process_manifest_items_in_thread, chunk, prefetched) for chunk in self._split_window(batch)]
+                results = [result for future in futures for result in future.result()]
+            self._record_results(results, counts)
+        self._report_results(counts)
+
+    def _cleanup_orphans(self, resources_to_cleanup, retain: bool = True):
+        """Delete local managed resources that are not part of the manifest.
+
+        With retain=False, the resources were deleted on RESOURCE_SERVER, so recently created ones are deleted too.
+        """
+        count = resources_to_cleanup.count()
+        self.deleted_count += count
+        if count:
+            self.write(f"Deleting {count} orphaned resources")
             for orphan in resources_to_cleanup:
                 # If it was created in the latest X seconds, ignore it.
-                if orphan.content_object.created >= timezone.now() - timedelta(seconds=self.retain_seconds):
+                if retain and orphan.content_object.created >= timezone.now() - timedelta(seconds=self.retain_seconds):
                     continue
                 try:
                     _sc = orphan.content_type.resource_type.serializer_class
@@ -335,50 +594,147 @@ class SyncExecutor:
                 self.write(f"waiting {self.retrysleep} seconds")
                 time.sleep(self.retrysleep)
             if self.asyncio is True:
-                asyncio.run(self._a_process_manifest_list(self.unavailable))
+                asyncio.run(self._a_process_manifest_list([list(self.unavailable)]))
             else:
-                self._process_manifest_list(self.unavailable)
+                self._process_manifest_list([list(self.unavailable)])
             self.attempts += 1
 
-    def _dispatch_sync_process(self, manifest_list: list[ManifestItem]):
+    def _dispatch_sync_process(self, manifest_batches: Iterable[list[ManifestItem]]):
         """Sync all the items from the manifest using either asyncio or sequentialy."""
-        if self.asyncio is True:  # pragma: no cover
-            self.write(f"Processing {len(manifest_list)} resources with asyncio executor.")
+        if self.asyncio is True:
+            workers = f" and {self.workers} workers" if self._pool is not None else ""
+            self.write(f"Processing resources in windows of {self.window_size} with asyncio executor{workers}.")
+            self.write()
+            asyncio.run(self._a_process_manifest_list(manifest_batches))
+        elif self._pool is not None:
+            self.write(f"Processing resources in windows of {self.window_size} with {self.workers} workers.")
             self.write()
-            asyncio.run(self._a_process_manifest_list(manifest_list))
+            self._process_manifest_list(manifest_batches)
         else:
-            self.write(f"Processing {len(manifest_list)} resources sequentially.")
+            self.write(f"Processing resources in windows of {self.window_size} sequentially.")
             self.write()
-            self._process_manifest_list(manifest_list)
+            self._process_manifest_list(manifest_batches)
+
+    def _iter_changes(self, resource_type: ResourceType, service_id: str):
+        """Pull the pages of changes since the cursor of the resource type, a window at a time.
+
+        Deleted resources are deleted when the page is read, the other changes are yielded as manifest items.
+        The cursor is saved once the items of a page are processed, unless some were unavailable.
+        """
+        cursor = resource_type.sync_cursor
+        unavailable_before = set(self.unavailable)
+        while True:
+            resp = self.api_client.get_resource_type_changes(resource_type.name, since=cursor, limit=self.window_size)
+            if resp.status_code == 404:
+                raise ChangesNotFound(f"changes for {resource_type.name} NOT FOUND.")
+            try:
+                resp.raise_for_status()
+            except HTTPError as exc:
+                raise ResourceSyncHTTPError() from exc
+            page = resp.json()
+
+            # Only the latest change of a resource matters
+            latest = {change["ansible_id"]: change for change in page["changes"]}
+            deleted = [ansible_id for ansible_id, change in latest.items() if change["action"] == "delete"]
+            if deleted:
+                resources = Resource.objects.filter(service_id=service_id, content_type__resource_type=resource_type, ansible_id__in=deleted)
+                self._cleanup_orphans(resources, retain=False)
+            items = [
+                ManifestItem(ansible_id=ansible_id, resource_hash=change["resource_hash"], service_id=service_id)
+                for ansible_id, change in latest.items()
+                if change["action"] != "delete"
+            ]
+            if items:
+                yield items
+
+            if self.unavailable - unavailable_before:
+                # Pulled again by the next sync
+                return
+            cursor = page["cursor"]
+            ResourceType.objects.filter(pk=resource_type.pk).update(sync_cursor=cursor)
+            if not page["has_more"]:
+                return
+
+    def _sync_resource_type_changes(self, resource_type: ResourceType):
+        """Sync the changes of a resource type since its last sync."""
+        resp_metadata = self.api_client.get_service_metadata()
+        resp_metadata.raise_for_status()
+        service_id = resp_metadata.json()["service_id"]
+
+        self.write(f"Processing changes since {resource_type.sync_cursor} in windows of {self.window_size} sequentially.")
+        self.write()
+        try:
+            # Pages are read and deletes are processed between windows, so they are processed without asyncio
+            self._process_manifest_list(self._iter_changes(resource_type, service_id))
+        except ChangesNotFound as ex:
+            self.write(f"{ex} Syncing the manifest instead.")
+            self._sync_resource_type(resource_type.name)
+            return
+        self._handle_retries()
+
+    def _sync_resource_type(self, resource_type_name: str):
+        """Sync all the resources of a resource type from its manifest."""
+        unavailable_before = set(self.unavailable)
+        try:
+            # Read before the manifest, changes made while syncing are pulled again by the next delta sync
+            cursor = fetch_changes_cursor(resource_type_name, api_client=self.api_client)
+        except (ChangesNotFound, ResourceSyncHTTPError):
+            cursor = None
+
+        try:
+            manifest_batches = iter_manifest(resource_type_name, api_client=self.api_client, batch_size=self.window_size)
+        except ManifestNotFound as ex:
+            self.write(str(ex))
+            return
+
+        # Orphans are deleted before syncing, as they could conflict with the resources of the manifest.
+        # This needs the whole manifest, so it is requested a second time to be synced.
+        self._cleanup_orphans(find_orphan_resources(resource_type_name, manifest_batches, chunk_size=self.window_size))
+        self._dispatch_sync_process(iter_manifest(resource_type_name, api_client=self.api_client, batch_size=self.window_size))
+        self._handle_retries()
+
+        if cursor is not None and not self.unavailable - unavailable_before:
+            ResourceType.objects.filter(name=resource_type_name).update(sync_cursor=cursor)
 
     def run(self):
         """Run the sync workflow.
 
         1. Iterate enabled resource types.
-        2. Fetch RESOURCE_SERVER manifest.
-        3. Cleanup orphaned resources (deleted remotely).
-        4. Process the sync for each item in the manifest.
+        2. Stream RESOURCE_SERVER manifest to find orphaned resources (deleted remotely).
+        3. Cleanup orphaned resources.
+        4. Stream the manifest again and process the sync for each item, a window at a time.
         5. Handle retries.
+
+        With delta, types synced before only pull the changes since their last sync instead,
+        deleting the resources deleted remotely and syncing the others.
         """
         self.write("----- RESOURCE SYNC STARTED -----")
         self.write()
 
+        if self.workers > 1:
+            try:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="resource_sync") as self._pool:
+                    self._sync_resource_types()
+            finally:
+                self._pool = None
+        else:
+            self._sync_resource_types()
+
+        self.write("----- RESOURCE SYNC FINISHED -----")
+
+    def _sync_resource_types(self):
         for resource_type_name in get_resource_type_names():
             if self.resource_type_names and resource_type_name not in self.resource_type_names:
                 # Skip types that are filtered out
                 continue
 
             self.write(f">>> {resource_type_name}")
-            try:
-                manifest_list = fetch_manifest(resource_type_name, api_client=self.api_client)
-            except ManifestNotFound as ex:
-                self.write(str(ex))
-                continue
-
-            self._cleanup_orphans(resource_type_name, manifest_list)
-            self._dispatch_sync_process(manifest_list)
-            self._handle_retries()
+            self.deleted_count = 0
+            resource_type = ResourceType.objects.filter(name=resource_type_name).first() if self.delta else None
+            if resource_type is not None and resource_type.sync_cursor is not None:
+                self._sync_resource_type_changes(resource_type)
+            else:
+                # The first sync, or the changes are not known
+                self._sync_resource_type(resource_type_name)
 
             self.write()
-
-        self.write("----- RESOURCE SYNC FINISHED -----")
@@ -2,6 +2,7 @@ import hashlib
 import json
 from typing import Callable, Optional
 
+from django.core.exceptions import FieldDoesNotExist
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
@@ -44,17 +45,58 @@ class AnsibleResourceForeignKeyField(serializers.UUIDField):
 
         return resource.content_object
 
-    def get_attribute(self, instance):
+    def get_related_pk(self, instance):
+        "The pk of the related object, read from the foreign key column when the instance has one"
+        opts = getattr(instance, "_meta", None)
+        if opts is not None:
+            try:
+                field = opts.get_field(self.field_name)
+            except FieldDoesNotExist:
+                field = None
+            if field is not None and field.many_to_one:
+                return getattr(instance, field.attname)
+
         # If the model doesn't have an attribute with the given field name, return None. This is
         # mostly here to keep Hub from breaking, which doesn't have organizations yet.
         obj = getattr(instance, self.field_name, None)
-        if obj is None:
+        return None if obj is None else obj.pk
+
+    def get_attribute(self, instance):
+        pk = self.get_related_pk(instance)
+        if pk is None:
             return None
-        resource = Resource.objects.get(content_type__resource_type__name=self.resource_type, object_id=obj.pk)
+
+        # Serializers of many resources look the ansible_ids up in bulk, see get_related_ansible_ids
+        ansible_ids = self.context.get("related_ansible_ids", {}).get(self.resource_type, {})
+        if str(pk) in ansible_ids:
+            return ansible_ids[str(pk)]
+
+        resource = Resource.objects.get(content_type__resource_type__name=self.resource_type, object_id=pk)
 
         return resource.ansible_id
 
 
+def get_related_ansible_ids(serializer_class, instances) -> dict:
+    """
+    Looks up the ansible_ids of the objects related to the instances by the AnsibleResourceForeignKeyFields
+    of a shared resource type serializer, with one query per related resource type.
+    Returns {resource type name: {object_id: ansible_id}}, to pass as the related_ansible_ids serializer context.
+    """
+    pks_by_type = {}
+    for field in serializer_class().fields.values():
+        if isinstance(field, AnsibleResourceForeignKeyField):
+            pks = pks_by_type.setdefault(field.resource_type, set())
+            for instance in instances:
+                if (pk := field.get_related_pk(instance)) is not None:
+                    pks.add(str(pk))
+
+    related_ansible_ids = {}
+    for resource_type, pks in pks_by_type.items():
+        resources = Resource.objects.filter(content_type__resource_type__name=resource_type, object_id__in=pks)
+        related_ansible_ids[resource_type] = dict(resources.values_list("object_id", "ansible_id"))
+    return related_ansible_ids
+
+
 class SharedResourceTypeSerializer(serializers.Serializer):
     """
     This is the base class for resource type serializers. Serializers that extend this class are
@@ -82,6 +124,14 @@ class SharedResourceTypeSerializer(serializers.Serializer):
     # not be used to compute hashes for sync.
     ADDITIONAL_DATA_SERIALIZER = None
 
+    def serialize(self, instance):
+        """
+        Representation of an instance, like serializer_class(instance).data. A serializer made without an
+        instance can serialize many instances, without building its fields again for each of them.
+        """
+        processor = self.get_processor()
+        return self.to_representation(processor(instance).pre_serialize())
+
     def get_hash(self, field: Optional[str] = None, hasher: Callable = hashlib.sha256):
         """
         Takes an instance, serialize it and take the .data or the specified field
@@ -93,6 +143,11 @@ class SharedResourceTypeSerializer(serializers.Serializer):
         metadata_json = json.dumps(serialized_data, sort_keys=True).encode("utf-8")
         return hasher(metadata_json).hexdigest()
 
+    def hash_instance(self, instance, hasher: Callable = hashlib.sha256):
+        "Like get_hash, for an instance serialized with serialize()"
+        metadata_json = json.dumps(self.serialize(instance), sort_keys=True).encode("utf-8")
+        return hasher(metadata_json).hexdigest()
+
     @classmethod
     def get_processor(cls):
         return get_registry().api_config.get_processor(f"shared.{cls.RESOURCE_TYPE}")
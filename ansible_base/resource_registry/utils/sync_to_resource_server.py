@@ -6,13 +6,39 @@ from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import ValidationError
 
-from ansible_base.resource_registry.models import Resource, service_id
+from ansible_base.resource_registry.models import Resource, ReverseSyncEntry, service_id
+from ansible_base.resource_registry.models.resource import resource_type_cache
 from ansible_base.resource_registry.rest_client import ResourceRequestBody, get_resource_server_client
 
 logger = logging.getLogger('ansible_base.resource_registry.utils.sync_to_resource_server')
 
 
-def sync_to_resource_server(instance, action, ansible_id=None):
+def outbox_enabled() -> bool:
+    return getattr(settings, 'RESOURCE_SERVER_SYNC_OUTBOX', False)
+
+
+def sync_disabled_by_environment() -> bool:
+    return os.environ.get('ANSIBLE_REVERSE_RESOURCE_SYNC', 'true').lower() == 'false'
+
+
+def get_sync_user_ansible_id():
+    """
+    Returns the ansible_id of the current user, who changes are synced as.
+    If they don't have one some how, or if we don't have a user, returns None
+    to let the resource server decide what to do.
+    """
+    user = get_current_user()
+    if user:
+        try:
+            return Resource.get_resource_for_object(user).ansible_id
+        except (Resource.DoesNotExist, AttributeError):
+            logger.error(f"User {user} does not have a resource")
+    else:
+        logger.error("No user found, syncing to resource server with jwt_user_id=None")
+    return None
+
+
+def sync_to_resource_server(instance, action, ansible_id=None, resource=None):
     """
     Use the resource server API to sync the resource across.
 
@@ -23,11 +49,14 @@ def sync_to_resource_server(instance, action, ansible_id=None):
 
     For all other actions, ansible_id is ignored and retrieved from the resource
     object. (For create, the resource is expected to exist before calling this
-    function.)
+    function.) The caller may pass the resource if it has already looked it up.
+
+    If RESOURCE_SERVER_SYNC_OUTBOX is enabled, the change is written to the
+    ReverseSyncEntry outbox in the current transaction instead, and delivered
+    to the resource server later by tasks.reverse_sync.dispatch_outbox().
     """
 
-    sync_disabled = os.environ.get('ANSIBLE_REVERSE_RESOURCE_SYNC', 'true').lower() == 'false'
-    if sync_disabled:
+    if sync_disabled_by_environment():
         logger.info(f"Skipping sync of resource {instance} because $ANSIBLE_REVERSE_RESOURCE_SYNC is 'false'")
         return
 
@@ -44,43 +73,44 @@ def sync_to_resource_server(instance, action, ansible_id=None):
     elif action == "delete" and ansible_id is None:
         raise Exception("ansible_id should be provided for delete actions")
 
-    try:
-        resource = Resource.get_resource_for_object(instance)
-    except Resource.DoesNotExist:
-        logger.error(f"Resource {instance} does not have a resource")
-        return
+    if resource is None:
+        try:
+            resource = Resource.get_resource_for_object(instance)
+        except Resource.DoesNotExist:
+            logger.error(f"Resource {instance} does not have a resource")
+            return
 
+    use_outbox = outbox_enabled()
     if str(resource.service_id) == service_id() and action == "update":
         # Don't sync if we're updating a resource that isn't owned by the resource server yet.
-        logger.info(f"Skipping sync of resource {instance} because its service_id is local")
-        return
+        # Unless its create is still in the outbox, then the update is folded into the create when delivered.
+        if not (use_outbox and ReverseSyncEntry.objects.filter(ansible_id=resource.ansible_id).exists()):
+            logger.info(f"Skipping sync of resource {instance} because its service_id is local")
+            return
 
-    user_ansible_id = None
-    user = get_current_user()
-    if user:
-        # If we have a user, try to get their ansible_id and sync as them.
-        # If they don't have one some how, or if we don't have a user, sync with None and
-        # let the resource server decide what to do.
-        try:
-            user_resource = Resource.get_resource_for_object(user)
-            user_ansible_id = user_resource.ansible_id
-        except (Resource.DoesNotExist, AttributeError):
-            logger.error(f"User {user} does not have a resource")
-            pass
-    else:
-        logger.error("No user found, syncing to resource server with jwt_user_id=None")
+    user_ansible_id = get_sync_user_ansible_id()
+
+    if action != "delete":
+        ansible_id = resource.ansible_id
+
+    resource_type = resource_type_cache(resource.content_type_id)
+    data = resource_type.serializer_class(instance).data
+
+    if use_outbox:
+        ReverseSyncEntry.objects.create(
+            action=action,
+            resource_type=resource_type.name,
+            ansible_id=ansible_id,
+            resource_data=data,
+            jwt_user_id=user_ansible_id,
+        )
+        return
 
     client = get_resource_server_client(
         settings.RESOURCE_SERVICE_PATH,
         jwt_user_id=user_ansible_id,
         raise_if_bad_request=True,
     )
-
-    if action != "delete":
-        ansible_id = resource.ansible_id
-
-    resource_type = resource.content_type.resource_type
-    data = resource_type.serializer_class(instance).data
     body = ResourceRequestBody(
         resource_type=resource_type.name,
         ansible_id=ansible_id,
@@ -101,8 +131,7 @@ def sync_to_resource_server(instance, action, ansible_id=None):
                 #    Now resource C is out of sync. On the resource server and service B, the ID=2, but on service A the ID is now 1.
                 #    Fixing this problem is fairly easy. We just let the resource server set the ansible ID of the resource,
                 #        rather than let each service pick their own random UUID.
-                resource.service_id = json['service_id']
-                resource.ansible_id = json['ansible_id']
+                resource.assign_ids(ansible_id=json['ansible_id'], service_id=json['service_id'])
                 resource.save()
         elif action == "update":
             client.update_resource(ansible_id, body)
@@ -111,3 +140,51 @@ def sync_to_resource_server(instance, action, ansible_id=None):
     except Exception as e:
         logger.exception(f"Failed to sync {action} of resource {instance} ({ansible_id}) to resource server: {e}")
         raise ValidationError(_("Failed to sync resource to resource server")) from e
+
+
+def bulk_sync_to_resource_server(changes):
+    """
+    Reverse-sync the changes of a bulk operation, given as (instance, resource, action) tuples
+    where action is "create" or "update". Nothing is synced if reverse sync is not enabled.
+
+    With RESOURCE_SERVER_SYNC_OUTBOX enabled, the outbox entries are written with a constant
+    number of queries (serializing the instances may still query their related objects).
+    Otherwise each change is sent to the resource server by sync_to_resource_server().
+    """
+    from ansible_base.resource_registry.apps import _should_reverse_sync
+    from ansible_base.resource_registry.signals.handlers import reverse_sync_enabled
+
+    if not (_should_reverse_sync() and reverse_sync_enabled):
+        return
+    if sync_disabled_by_environment():
+        logger.info(f"Skipping sync of {len(changes)} resources because $ANSIBLE_REVERSE_RESOURCE_SYNC is 'false'")
+        return
+
+    if not outbox_enabled():
+        for instance, resource, action in changes:
+            sync_to_resource_server(instance, action, resource=resource)
+        return
+
+    user_ansible_id = get_sync_user_ansible_id()
+    local_service_id = service_id()
+    pending = set(
+        ReverseSyncEntry.objects.filter(ansible_id__in=[resource.ansible_id for instance, resource, action in changes]).values_list('ansible_id', flat=True)
+    )
+    entries = []
+    for instance, resource, action in changes:
+        if action == "update" and str(resource.service_id) == local_service_id and resource.ansible_id not in pending:
+            # Not owned by the resource server yet, like sync_to_resource_server()
+            continue
+        resource_type = resource_type_cache(resource.content_type_id)
+        if resource_type.serializer_class is None:
+            continue
+        entries.append(
+            ReverseSyncEntry(
+                action=action,
+                resource_type=resource_type.name,
+                ansible_id=resource.ansible_id,
+                resource_data=resource_type.serializer_class(instance).data,
+                jwt_user_id=user_ansible_id,
+            )
+        )
+    ReverseSyncEntry.objects.bulk_create(entries)
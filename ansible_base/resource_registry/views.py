@@ -13,9 +13,15 @@ from rest_framework.viewsets import GenericViewSet, mixins
 
 from ansible_base.lib.utils.response import CSVStreamResponse, get_relative_url
 from ansible_base.lib.utils.views.django_app_api import AnsibleBaseDjangoAppApiView
-from ansible_base.resource_registry.models import Resource, ResourceType, service_id
+from ansible_base.resource_registry.models import Resource, ResourceChange, ResourceType, listed_sequence_limit, service_id, settled_before
 from ansible_base.resource_registry.registry import get_registry
-from ansible_base.resource_registry.serializers import ResourceListSerializer, ResourceSerializer, ResourceTypeSerializer, UserAuthenticationSerializer
+from ansible_base.resource_registry.serializers import (
+    ResourceDataListSerializer,
+    ResourceListSerializer,
+    ResourceSerializer,
+    ResourceTypeSerializer,
+    UserAuthenticationSerializer,
+)
 from ansible_base.resource_registry.utils.auth_code import get_user_auth_code
 from ansible_base.rest_filters.rest_framework.field_lookup_backend import FieldLookupBackend
 from ansible_base.rest_filters.rest_framework.order_backend import OrderByBackend
@@ -49,6 +55,8 @@ class ResourcesPagination(PageNumberPagination):
     # PageNumberPagination by itself doesn't work in some apps because when api_settings.PAGE_SIZE
     # isn't set, the default is no pagination.
     page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 1000
 
 
 class ResourceAPIMixin:
@@ -89,9 +97,26 @@ class ResourceViewSet(
     queryset = Resource.objects.select_related("content_type__resource_type").all()
     serializer_class = ResourceSerializer
     lookup_field = "ansible_id"
+    rest_filters_reserved_names = ("include_resource_data",)
+
+    def include_resource_data(self) -> bool:
+        """
+        The list omits resource_data unless ?include_resource_data=true is passed, which lets
+        resource sync read a batch of resources with ?ansible_id__in=<ansible_id>,<ansible_id>...
+        """
+        request = getattr(self, "request", None)
+        return request is not None and request.query_params.get("include_resource_data", "").lower() in ("true", "1")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list" and self.include_resource_data():
+            queryset = queryset.prefetch_related("content_object")
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
+            if self.include_resource_data():
+                return ResourceDataListSerializer
             return ResourceListSerializer
 
         return super().get_serializer_class()
@@ -116,11 +141,55 @@ class ResourceTypeViewSet(
     lookup_field = "name"
     lookup_value_regex = "[^/]+"
 
-    def serialize_resources_hashes(self, resources_qs, serializer_class):
-        """A generator that yields str sequences for csv stream response"""
+    # Number of resources loaded at a time while streaming a manifest
+    manifest_chunk_size = 1000
+    # Maximum number of changes listed at a time
+    changes_page_size = 1000
+
+    def get_resource_hashes(self, rows, resource_type):
+        """
+        Yields (ansible_id, resource_hash) for a list of (object_id, ansible_id, resource_hash) rows
+
+        Resources without a stored hash (see the backfill_resource_hashes command) are serialized,
+        their content objects are loaded with one query.
+        """
+        serializer_class = resource_type.serializer_class
+        missing = [object_id for object_id, ansible_id, resource_hash in rows if resource_hash is None]
+        content_objects = {str(pk): obj for pk, obj in resource_type.content_type.model_class().objects.in_bulk(missing).items()} if missing else {}
+        for object_id, ansible_id, resource_hash in rows:
+            if resource_hash is None:
+                resource_hash = serializer_class(content_objects.get(object_id)).get_hash()
+            yield (ansible_id, resource_hash)
+
+    def serialize_resources_hashes(self, resources_qs, resource_type):
+        """
+        A generator that yields str sequences for csv stream response
+
+        Resources are read in chunks ordered by ansible_id, so memory use does not grow with the number of resources.
+        The order also lets resource_sync merge the manifest with its local resources.
+        """
         yield ("ansible_id", "resource_hash")
-        for resource in resources_qs:
-            yield (resource.ansible_id, serializer_class(resource.content_object).get_hash())
+        resources_qs = resources_qs.order_by("ansible_id").values_list("object_id", "ansible_id", "resource_hash")
+        last_ansible_id = None
+        while True:
+            chunk_qs = resources_qs if last_ansible_id is None else resources_qs.filter(ansible_id__gt=last_ansible_id)
+            chunk = list(chunk_qs[: self.manifest_chunk_size])
+            if not chunk:
+                return
+            last_ansible_id = chunk[-1][1]
+            yield from self.get_resource_hashes(chunk, resource_type)
+
+    def get_service_filter(self, request):
+        if 'service_id' in request.query_params:
+            if request.query_params['service_id'] == 'all':
+                return {}
+            return {'service_id': request.query_params['service_id']}
+        return {'service_id': service_id()}
+
+    def get_system_user_ansible_ids(self, resource_type):
+        if resource_type.name == "shared.user" and (system_user := getattr(settings, "SYSTEM_USERNAME", None)):
+            return Resource.objects.filter(content_type__resource_type=resource_type, name=system_user).values('ansible_id')
+        return None
 
     @action(detail=True, methods=["get"])
     def manifest(self, request, name, *args, **kwargs):
@@ -131,23 +200,69 @@ class ResourceTypeViewSet(
         if not resource_type.serializer_class:  # pragma: no cover
             return HttpResponseNotFound()
 
-        if 'service_id' in request.query_params:
-            if request.query_params['service_id'] == 'all':
-                service_filter = {}
-            else:
-                service_filter = {'service_id': request.query_params['service_id']}
-        else:
-            service_filter = {'service_id': service_id()}
-
-        resources = Resource.objects.filter(content_type__resource_type=resource_type, **service_filter).prefetch_related("content_object")
+        resources = Resource.objects.filter(content_type__resource_type=resource_type, **self.get_service_filter(request))
 
         if name == "shared.user" and (system_user := getattr(settings, "SYSTEM_USERNAME", None)):
             resources = resources.exclude(name=system_user)
 
-        if not resources:
+        if not resources.exists():
+            return HttpResponseNotFound()
+
+        return CSVStreamResponse(self.serialize_resources_hashes(resources, resource_type)).stream()
+
+    @action(detail=True, methods=["get"])
+    def changes(self, request, name, *args, **kwargs):
+        """
+        Returns the changes to resources of the given type after the `since` cursor, oldest first.
+
+        Deleted resources are listed as delete changes, other changes list the current resource_hash.
+        Without `since`, only the current cursor is returned, to start listing changes from.
+        Changes newer than RESOURCE_CHANGES_SETTLE_SECONDS are not listed yet, nor the changes after a hole in
+        the sequences, as changes of transactions that are still running could otherwise get an older sequence
+        than the cursor.
+        """
+        resource_type = get_object_or_404(ResourceType, name=name)
+        if not resource_type.serializer_class:  # pragma: no cover
             return HttpResponseNotFound()
 
-        return CSVStreamResponse(self.serialize_resources_hashes(resources, resource_type.serializer_class)).stream()
+        try:
+            since = int(request.query_params['since']) if 'since' in request.query_params else None
+            limit = min(int(request.query_params.get('limit', self.changes_page_size)), self.changes_page_size)
+        except ValueError:
+            return Response({"detail": "since and limit must be integers."}, status=400)
+
+        settled = ResourceChange.objects.filter(
+            content_type__resource_type=resource_type,
+            changed__lte=settled_before(),
+        )
+        if (sequence_limit := listed_sequence_limit()) is not None:
+            settled = settled.filter(id__lte=sequence_limit)
+        if since is None:
+            cursor = settled.order_by('-id').values_list('id', flat=True).first() or 0
+            return Response({"cursor": cursor, "has_more": False, "changes": []})
+
+        page = list(settled.filter(id__gt=since).order_by('id').values_list('id', 'action', 'ansible_id', 'service_id')[: limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        cursor = page[-1][0] if page else since
+
+        service_filter = self.get_service_filter(request)
+        if service_filter:
+            page = [change for change in page if str(change[3]) == str(service_filter['service_id'])]
+        if (system_user_ansible_ids := self.get_system_user_ansible_ids(resource_type)) is not None:
+            excluded = set(system_user_ansible_ids.values_list('ansible_id', flat=True))
+            page = [change for change in page if change[2] not in excluded]
+
+        # The current hashes of the resources, those deleted since are listed as deleted
+        rows = Resource.objects.filter(content_type__resource_type=resource_type, ansible_id__in={change[2] for change in page if change[1] != 'delete'})
+        hashes = dict(self.get_resource_hashes(list(rows.values_list("object_id", "ansible_id", "resource_hash")), resource_type))
+        changes = []
+        for sequence, change_action, ansible_id, _service_id in page:
+            resource_hash = hashes.get(ansible_id) if change_action != 'delete' else None
+            if resource_hash is None:
+                change_action = 'delete'
+            changes.append({"sequence": sequence, "action": change_action, "ansible_id": ansible_id, "resource_hash": resource_hash})
+        return Response({"cursor": cursor, "has_more": has_more, "changes": changes})
 
 
 class ServiceMetadataView(
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import jwt
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from ansible_base.jwt_consumer.common.auth import JWTAuthentication
+from ansible_base.jwt_consumer.common.cache import validated_token_cache
+
+
+def make_key_pair():
+    "Returns a new RS256 (private, public) key pair as PEM text"
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=4096, backend=default_backend())
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(encoding=serialization.Encoding.PEM, format=serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return private_pem, public_pem
+
+
+class Command(BaseCommand):
+    help = 'Measures JWT authenticated requests per second with and without the validated token cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Number of authentications to run for each case')
+
+    def make_token(self, private_pem):
+        username = f'benchmark-{uuid4().hex[:8]}'
+        body = {
+            "version": "1",
+            "iss": "ansible-issuer",
+            "exp": int((datetime.now() + timedelta(minutes=30)).timestamp()),
+            "aud": "ansible-services",
+            "sub": str(uuid4()),
+            "user_data": {"username": username, "first_name": "bench", "last_name": "mark", "email": f"{username}@example.invalid", "is_superuser": False},
+            "objects": {},
+            "object_roles": {},
+            "global_roles": [],
+        }
+        return jwt.encode(body, private_pem, algorithm="RS256")
+
+    def run_case(self, token, count):
+        request = RequestFactory().get('/hello/', HTTP_X_DAB_JW_TOKEN=token)
+        authentication = JWTAuthentication()
+        authentication.authenticate(request)  # first login creates the user, not part of the measurement
+        start = time.perf_counter()
+        for i in range(count):
+            authentication.authenticate(request)
+        return count / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        private_pem, public_pem = make_key_pair()
+        token = self.make_token(private_pem)
+
+        results = {}
+        for label, cache_size in (('without cache', 0), ('with cache', 1000)):
+            validated_token_cache.clear()
+            with override_settings(ANSIBLE_BASE_JWT_KEY=public_pem, ANSIBLE_BASE_JWT_VALIDATED_TOKEN_CACHE_SIZE=cache_size):
+                results[label] = self.run_case(token, count)
+            self.stdout.write(f'{label}: {results[label]:.1f} requests/second over {count} requests')
+
+        self.stdout.write(f'Speedup from validated token cache: {results["with cache"] / results["without cache"]:.2f}x')
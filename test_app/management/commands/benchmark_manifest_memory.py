@@ -0,0 +1,77 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from ansible_base.lib.utils.response import get_relative_url
+from ansible_base.resource_registry.models import Resource, ResourceType, init_resource_from_object
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the peak memory allocated while streaming the shared.user manifest for a growing number of users, '
+        'with and without stored resource hashes. All data is created in a transaction which is rolled back. '
+        'Python rarely returns freed memory to the OS, so the peak of traced allocations is reported rather than RSS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000], help='Numbers of users to measure the manifest with')
+
+    def create_users(self, count: int, resource_type: ResourceType, offset: int) -> None:
+        User = get_user_model()
+        users = User.objects.bulk_create([User(username=f'manifest-benchmark-{offset + i}') for i in range(count)])
+        resource_config = resource_type.get_resource_config()
+        Resource.objects.bulk_create(
+            [init_resource_from_object(user, resource_type=resource_type, resource_config=resource_config) for user in users], batch_size=1000
+        )
+
+    def stream_manifest(self, client: APIClient) -> tuple:
+        counter = QueryCounter()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = client.get(get_relative_url('resourcetype-manifest', kwargs={'name': 'shared.user'}))
+            rows = sum(chunk.count(b'\n') for chunk in response.streaming_content) - 1
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return rows, peak, elapsed, counter.count
+
+    def handle(self, *args, **options):
+        resource_type = ResourceType.objects.get(name='shared.user')
+        # The debug toolbar would render into the response, and DEBUG keeps a log of every query
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')]
+        self.stdout.write(f'{"resources":>10} {"hashes":>8} {"rows":>8} {"peak MB":>8} {"seconds":>8} {"queries":>8}')
+        with override_settings(DEBUG=False, MIDDLEWARE=middleware), transaction.atomic():
+            admin = get_user_model().objects.create(username='manifest-benchmark-admin', is_superuser=True)
+            client = APIClient()
+            client.force_authenticate(user=admin)
+
+            created = 0
+            for size in sorted(options['sizes']):
+                self.create_users(size - created, resource_type, created)
+                created = size
+                user_resources = Resource.objects.filter(content_type=resource_type.content_type)
+
+                user_resources.update(resource_hash=None)
+                for label in ('missing', 'stored'):
+                    rows, peak, elapsed, queries = self.stream_manifest(client)
+                    self.stdout.write(f'{size:>10} {label:>8} {rows:>8} {peak / 2**20:>8.1f} {elapsed:>8.2f} {queries:>8}')
+                    # Any hash will do, the manifest does not check it
+                    user_resources.update(resource_hash='0' * 64)
+
+            transaction.set_rollback(True)
@@ -9,6 +9,7 @@ from django.core.management.base import BaseCommand, CommandError
 from ansible_base.authentication.models import Authenticator, AuthenticatorUser
 from ansible_base.oauth2_provider.models import OAuth2Application
 from ansible_base.rbac.models import RoleDefinition
+from ansible_base.resource_registry.models import Resource
 from test_app.models import EncryptionModel, InstanceGroup, Inventory, Organization, Team, User
 
 
@@ -16,20 +17,28 @@ class Command(BaseCommand):
     help = 'Creates demo data for development.'
 
     def create_large(self, data_counts):
-        "Data is not made with bulk_create at the moment to work to the resource of dab_resource_registry"
+        "Resources of the bulk created data are registered with Resource.objects.bulk_register"
         start = time.time()
         self.stdout.write('')
         self.stdout.write('About to create large demo data set. This will take a while.')
+        organizations = []
         for cls in (Organization, Team, User):
             count = data_counts[cls._meta.model_name]
+            objs = []
             for i in range(count):
                 name = f'large_{cls._meta.model_name}_{i}'
-                data = {'name': name}
                 if cls is User:
-                    data = {'username': name}
+                    objs.append(User(username=name))
                 elif cls is Team:
-                    data['organization_id'] = i + 1  # fudged, teams fewer than orgs
-                cls.objects.create(**data)
+                    objs.append(Team(name=name, organization=organizations[i % len(organizations)]))
+                else:
+                    objs.append(Organization(name=name))
+            # The managers of organizations and teams register their resources, users are registered here
+            objs = cls.objects.bulk_create(objs, batch_size=1000)
+            if cls is User:
+                Resource.objects.bulk_register(objs)
+            elif cls is Organization:
+                organizations = objs
             self.stdout.write(f'Created {count} {cls._meta.model_name}')
         self.stdout.write(f'Finished creating large demo data in {time.time() - start:.2f} seconds')
 
@@ -0,0 +1,304 @@
+import queue
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from uuid import uuid4
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ansible_base.jwt_consumer.awx.auth import AwxJWTAuthentication
+from ansible_base.jwt_consumer.common.auth import JWTCommonAuth
+from ansible_base.jwt_consumer.common.cache import JWTCache, cache, cache_key, validated_token_cache
+from ansible_base.jwt_consumer.common.cert import jwt_key_holder
+from ansible_base.jwt_consumer.eda.auth import EDAJWTAuthentication
+from ansible_base.jwt_consumer.hub.auth import HubJWTAuth
+from test_app.management.commands.benchmark_jwt_auth import make_key_pair
+from test_app.models import Organization, Team
+
+
+class LoadTestHubJWTAuth(HubJWTAuth):
+    "galaxy_ng is not installed with test_app, its organizations and teams are used instead"
+
+    def get_galaxy_models(self):
+        return Organization, Team
+
+
+class WhoAmIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'username': request.user.username})
+
+
+AUTHENTICATION_CLASSES = {
+    'awx': AwxJWTAuthentication,
+    'eda': EDAJWTAuthentication,
+    'hub': LoadTestHubJWTAuth,
+}
+
+# This module is used as the ROOT_URLCONF while the load test runs
+urlpatterns = [path(f'{name}/', WhoAmIView.as_view(authentication_classes=[cls])) for name, cls in AUTHENTICATION_CLASSES.items()]
+
+
+class KeyServer:
+    "Local stand-in for the api/gateway/v1/jwt_key/ endpoint of the gateway"
+
+    def __init__(self, public_pem: str):
+        self.public_pem = public_pem
+        self.requests = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), partial(KeyRequestHandler, self))
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}/'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class KeyRequestHandler(BaseHTTPRequestHandler):
+    def __init__(self, key_server, *args, **kwargs):
+        self.key_server = key_server
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path != '/api/gateway/v1/jwt_key/':
+            self.send_error(404)
+            return
+        self.key_server.requests += 1
+        body = self.key_server.public_pem.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Stats:
+    "Per scenario measurements, shared by the client threads"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+        self.cache_lookups = {}
+
+    def record_request(self, latency: float, queries: int, ok: bool) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+            self.queries.append(queries)
+            if not ok:
+                self.errors += 1
+
+    def record_cache_lookup(self, name: str, hit: bool) -> None:
+        with self.lock:
+            hits, total = self.cache_lookups.get(name, (0, 0))
+            self.cache_lookups[name] = (hits + int(hit), total + 1)
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    def hit_rate(self, name: str) -> str:
+        hits, total = self.cache_lookups.get(name, (0, 0))
+        return f'{hits / total * 100:.0f}%' if total else '-'
+
+
+@contextmanager
+def count_cache_lookups(stats: Stats):
+    "Records the result of the JWT cache lookups while the scenario runs"
+
+    def counting(name, method, is_hit):
+        def wrapper(*args, **kwargs):
+            result = method(*args, **kwargs)
+            stats.record_cache_lookup(name, is_hit(result))
+            return result
+
+        return wrapper
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(validated_token_cache, 'get', counting('token', validated_token_cache.get, lambda result: result is not None)))
+        stack.enter_context(mock.patch.object(JWTCache, 'check_user_in_cache', counting('user', JWTCache.check_user_in_cache, lambda result: result[0])))
+        stack.enter_context(
+            mock.patch.object(JWTCache, 'check_rbac_claims_in_cache', counting('rbac claims', JWTCache.check_rbac_claims_in_cache, lambda result: result))
+        )
+        yield
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Load tests the JWT authentication classes through the Django test client, with the key served by a local stand-in of the gateway. '
+        'Reports latency percentiles, queries per request and cache hit rates for first login, steady state and claim change scenarios. '
+        'SQLite allows one writer at a time, so use PostgreSQL for results with concurrent clients.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authentication', nargs='+', choices=sorted(AUTHENTICATION_CLASSES), default=sorted(AUTHENTICATION_CLASSES))
+        parser.add_argument('--users', type=int, default=20, help='Number of distinct users sending tokens')
+        parser.add_argument('--clients', type=int, default=4, help='Number of concurrent client threads')
+        parser.add_argument('--requests', type=int, default=200, help='Number of requests for the steady state and claim change scenarios')
+        parser.add_argument('--organizations', type=int, default=3, help='Number of organizations listed in each token')
+        parser.add_argument('--teams', type=int, default=10, help='Number of teams listed in each token')
+        parser.add_argument('--global-roles', type=int, default=1, choices=[0, 1], help='Give the Platform Auditor global role in the tokens')
+
+    def make_objects(self, organization_count: int, team_count: int) -> dict:
+        """
+        Creates the organizations and teams referenced by the tokens
+
+        In a deployment these are synced from the gateway before users log in,
+        creating them here also keeps concurrent first logins from racing to create the same stubs.
+        """
+        run_id = uuid4().hex[:8]
+        organizations = [Organization.objects.create(name=f'load-test-{run_id}-org-{i}') for i in range(organization_count)]
+        teams = [Team.objects.create(name=f'load-test-{run_id}-team-{i}', organization=organizations[i % organization_count]) for i in range(team_count)]
+        return {
+            'organization': [{'ansible_id': str(org.resource.ansible_id), 'name': org.name} for org in organizations],
+            'team': [{'ansible_id': str(team.resource.ansible_id), 'name': team.name, 'org': i % organization_count} for i, team in enumerate(teams)],
+        }
+
+    def make_token(self, private_pem: str, user: dict, objects: dict, variant: int, global_roles: int) -> str:
+        "Mint a token for the user, variant selects which half of the teams the user is a member of"
+        team_indexes = list(range(len(objects['team'])))
+        body = {
+            "version": "1",
+            "iss": "ansible-issuer",
+            "exp": int((datetime.now() + timedelta(minutes=30)).timestamp()),
+            "aud": "ansible-services",
+            "sub": user['sub'],
+            "user_data": user['user_data'],
+            "objects": objects,
+            "object_roles": {
+                "Organization Member": {"content_type": "organization", "objects": list(range(len(objects['organization'])))},
+                "Team Member": {"content_type": "team", "objects": team_indexes[variant % 2 :: 2]},
+                "Team Admin": {"content_type": "team", "objects": team_indexes[:1]},
+            },
+            "global_roles": ["Platform Auditor"] if global_roles else [],
+        }
+        return jwt.encode(body, private_pem, algorithm="RS256")
+
+    def run_scenario(self, url: str, tokens: list, clients: int) -> Stats:
+        stats = Stats()
+        work = queue.Queue()
+        for token in tokens:
+            work.put(token)
+
+        def client_thread():
+            client = Client(raise_request_exception=False)
+            counter = QueryCounter()
+            try:
+                with connection.execute_wrapper(counter):
+                    while True:
+                        try:
+                            token = work.get_nowait()
+                        except queue.Empty:
+                            return
+                        queries_before = counter.count
+                        start = time.perf_counter()
+                        response = client.get(url, HTTP_X_DAB_JW_TOKEN=token)
+                        stats.record_request(time.perf_counter() - start, counter.count - queries_before, response.status_code == 200)
+            finally:
+                connection.close()
+
+        with count_cache_lookups(stats):
+            threads = [threading.Thread(target=client_thread) for i in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return stats
+
+    def report(self, name: str, scenario: str, stats: Stats, key_fetches: int) -> None:
+        self.stdout.write(
+            f'{name:<5} {scenario:<14} {len(stats.latencies):>8} {stats.errors:>6} {stats.percentile(0.5) * 1000:>8.1f} {stats.percentile(0.99) * 1000:>8.1f} '
+            f'{sum(stats.queries) / max(len(stats.queries), 1):>9.1f} {stats.hit_rate("token"):>7} {stats.hit_rate("user"):>7} '
+            f'{stats.hit_rate("rbac claims"):>7} {key_fetches:>6}'
+        )
+
+    def handle(self, *args, **options):
+        for role_name in ('Platform Auditor', 'Organization Member', 'Team Member', 'Team Admin'):
+            # Creates the managed role definitions the tokens use, if missing
+            JWTCommonAuth().get_role_definition(role_name)
+
+        private_pem, public_pem = make_key_pair()
+        objects = self.make_objects(options['organizations'], options['teams'])
+
+        self.stdout.write(
+            f'{"auth":<5} {"scenario":<14} {"requests":>8} {"errors":>6} {"p50 ms":>8} {"p99 ms":>8} {"queries":>9} '
+            f'{"token":>7} {"user":>7} {"rbac":>7} {"keys":>6}'
+        )
+        with KeyServer(public_pem) as key_server:
+            allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+            # The debug toolbar would render into every response and skew the measurements
+            middleware = [name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')]
+            with override_settings(ANSIBLE_BASE_JWT_KEY=key_server.url, ROOT_URLCONF=__name__, ALLOWED_HOSTS=allowed_hosts, MIDDLEWARE=middleware):
+                for name in options['authentication']:
+                    # Each authentication class starts like a new process, without a key or validated tokens
+                    jwt_key_holder.clear()
+                    validated_token_cache.clear()
+                    cache.delete(cache_key)
+                    key_requests_before = key_server.requests
+
+                    users = []
+                    for i in range(options['users']):
+                        username = f'load-test-{uuid4().hex[:8]}'
+                        user_data = {
+                            "username": username,
+                            "first_name": "load",
+                            "last_name": "test",
+                            "email": f"{username}@example.invalid",
+                            "is_superuser": False,
+                        }
+                        users.append({'sub': str(uuid4()), 'user_data': user_data})
+                    make_token = partial(self.make_token, private_pem, objects=objects, global_roles=options['global_roles'])
+                    steady_tokens = [make_token(user, variant=0) for user in users]
+                    changed_tokens = [make_token(user, variant=1) for user in users]
+
+                    url = f'/{name}/'
+                    scenarios = [
+                        ('first login', steady_tokens),
+                        ('steady state', [steady_tokens[i % len(users)] for i in range(options['requests'])]),
+                        # Every request of a user alternates between two sets of team memberships
+                        (
+                            'claim change',
+                            [(changed_tokens if (i // len(users)) % 2 == 0 else steady_tokens)[i % len(users)] for i in range(options['requests'])],
+                        ),
+                    ]
+                    for scenario, tokens in scenarios:
+                        key_requests = key_server.requests
+                        stats = self.run_scenario(url, tokens, options['clients'])
+                        self.report(name, scenario, stats, key_server.requests - key_requests)
+
+                    self.stdout.write(f'{name}: {key_server.requests - key_requests_before} key fetches from the key server')
@@ -19,6 +19,7 @@ from ansible_base.lib.abstract_models import (
 from ansible_base.lib.utils.models import prevent_search, user_summary_fields
 from ansible_base.rbac import permission_registry
 from ansible_base.resource_registry.fields import AnsibleResourceField
+from ansible_base.resource_registry.managers import ResourceRegistryManager
 from test_app.managers import UserUnmanagedManager
 
 
@@ -29,6 +30,8 @@ class Organization(AbstractOrganization):
 
     resource = AnsibleResourceField(primary_key_field="id")
 
+    objects = ResourceRegistryManager()
+
     users = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         related_name='member_of_organizations',
@@ -72,6 +75,9 @@ class ManagedUser(User):
 
 class Team(AbstractTeam):
     resource = AnsibleResourceField(primary_key_field="id")
+
+    objects = ResourceRegistryManager()
+
     team_parents = models.ManyToManyField('Team', related_name='team_children', blank=True)
 
     encryptioner = models.ForeignKey('test_app.EncryptionModel', on_delete=models.SET_NULL, null=True)
@@ -3,10 +3,13 @@ from datetime import timedelta
 import pytest
 from crum import impersonate
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.http import urlencode
 
 from ansible_base.activitystream.models import Entry
 from ansible_base.lib.utils.response import get_relative_url
+from test_app.models import Animal
 
 
 def test_activitystream_api_read(admin_api_client, user):
@@ -352,3 +355,39 @@ def test_activitystream_api_deleted_object(admin_api_client, animal, user):
     assert response.status_code == 200
     assert response.data["operation"] == "delete"
     assert response.data["changes"]["removed_fields"]["owner"] == user.id
+
+
+def test_activitystream_api_list_constant_queries(admin_api_client, animal, user, random_user):
+    """
+    A page of entries is serialized with the same number of queries, however many entries it has.
+    """
+    url = get_relative_url("activitystream-list") + '?' + urlencode({'page_size': 100})
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_api_client.get(url)
+        assert response.status_code == 200
+        return len(queries.captured_queries), response.data['results']
+
+    def create_animals(start, stop):
+        with impersonate(random_user):
+            for i in range(start, stop):
+                Animal.objects.create(name=f'animal-{i}', owner=user).people_friends.add(user)
+
+    ct = ContentType.objects.create(app_label="test_app", model="NonExistentModel")
+    Entry.objects.create(operation="update", content_type=ct, object_id=1337, changes=None)
+    create_animals(0, 1)
+    count_queries()  # warm up the caches of the request
+    few, _ = count_queries()
+    create_animals(1, 10)
+    many, results = count_queries()
+    assert few == many
+
+    # The summary fields are built from the loaded objects
+    association = next(entry for entry in results if entry['operation'] == 'associate')
+    assert association['summary_fields']['created_by']['username'] == random_user.username
+    assert association['summary_fields']['content_object']['name'] == 'animal-9'
+    assert association['summary_fields']['related_content_object']['username'] == user.username
+    assert association['related']['related_content_object'] == get_relative_url("user-detail", args=[user.id])
+    deleted_model = next(entry for entry in results if entry['content_type'] == ct.id)
+    assert 'content_object' not in deleted_model['summary_fields']
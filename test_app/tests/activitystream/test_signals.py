@@ -1,7 +1,10 @@
 import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 
 import ansible_base.activitystream.signals as signals
-from ansible_base.activitystream import no_activity_stream
+from ansible_base.activitystream import buffered_activity_stream, no_activity_stream
 from ansible_base.activitystream.models import Entry
 from ansible_base.lib.utils.encryption import ENCRYPTED_STRING
 from test_app.models import Animal, City, SecretColor
@@ -330,3 +333,118 @@ def test_activitystream_user_password_sanitized(user):
     user.set_password('new_password')
     user.save()
     assert entries.last().changes['changed_fields']['password'] == [ENCRYPTED_STRING, ENCRYPTED_STRING]
+
+
+def get_selects(captured, table):
+    return [q for q in captured.captured_queries if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql']]
+
+
+def test_activitystream_update_without_refetch(system_user, animal, random_user):
+    """
+    Ensure that updates diff against the values the instance was loaded with, instead of reading the row again.
+    """
+    for obj in (animal, Animal.objects.get(pk=animal.pk)):
+        original_name = obj.name
+        obj.name = f'{original_name} renamed'
+        obj.owner = random_user
+        with CaptureQueriesContext(connection) as captured:
+            obj.save()
+        assert get_selects(captured, 'test_app_animal') == []
+        # The old owner is not loaded either, only the system user who made the change
+        assert [q for q in get_selects(captured, 'test_app_user') if "username\" = '_system'" not in q['sql']] == []
+
+        changes = obj.activity_stream_entries.last().changes['changed_fields']
+        assert changes['name'] == [original_name, obj.name]
+        assert changes['owner'][1] == str(random_user.pk)
+        # Saving again diffs against the saved values, there are no changes to store
+        count = obj.activity_stream_entries.count()
+        obj.save()
+        assert obj.activity_stream_entries.count() == count
+
+
+def test_activitystream_update_refetch_fallback(system_user, animal):
+    """
+    Ensure that the row is read again for instances with unknown old values.
+    """
+    # Constructed with the pk of an existing row
+    constructed = Animal(pk=animal.pk, name='constructed', owner=animal.owner, kind=animal.kind, created=animal.created)
+    with CaptureQueriesContext(connection) as captured:
+        constructed.save()
+    assert len(get_selects(captured, 'test_app_animal')) == 1
+    assert constructed.activity_stream_entries.last().changes['changed_fields']['name'] == [animal.name, 'constructed']
+
+    # Deferred fields are recorded once they are loaded
+    deferred = Animal.objects.defer('kind').get(pk=animal.pk)
+    assert deferred.kind == 'dog'
+    deferred.name = 'deferred'
+    with CaptureQueriesContext(connection) as captured:
+        deferred.save()
+    assert get_selects(captured, 'test_app_animal') == []
+    assert deferred.activity_stream_entries.last().changes['changed_fields']['name'] == ['constructed', 'deferred']
+
+
+def test_activitystream_update_after_refresh(system_user, animal):
+    """
+    Ensure that refresh_from_db records the values to diff against.
+    """
+    Animal.objects.filter(pk=animal.pk).update(name='changed elsewhere')
+    animal.refresh_from_db()
+    animal.kind = 'cat'
+    animal.save()
+    changes = animal.activity_stream_entries.last().changes['changed_fields']
+    assert 'name' not in changes
+    assert changes['kind'] == ['dog', 'cat']
+
+
+def get_entry_inserts(captured):
+    return [q for q in captured.captured_queries if q['sql'].startswith('INSERT INTO "dab_activitystream_entry"')]
+
+
+@pytest.mark.django_db
+def test_buffered_activity_stream(system_user, user, django_capture_on_commit_callbacks):
+    """
+    Ensure that the entries of a buffered block are written with one insert once it commits.
+    """
+    with CaptureQueriesContext(connection) as captured:
+        with django_capture_on_commit_callbacks(execute=True):
+            with buffered_activity_stream():
+                cities = [City.objects.create(name=f'City {i}', country='USA') for i in range(3)]
+                cities[0].country = 'Canada'
+                cities[0].save()
+                animal = Animal.objects.create(name='Buffered', owner=user)
+                animal.people_friends.add(user)
+                deleted_pk = cities[2].pk
+                cities[2].delete()
+                assert get_entry_inserts(captured) == []
+                assert not Entry.objects.filter(object_id=str(deleted_pk)).exists()
+    assert len(get_entry_inserts(captured)) == 1
+
+    assert list(cities[0].activity_stream_entries.values_list('operation', flat=True)) == ['create', 'update']
+    assert list(animal.activity_stream_entries.values_list('operation', flat=True)) == ['create', 'associate']
+    deleted = Entry.objects.filter(object_id=str(deleted_pk), content_type=ContentType.objects.get_for_model(City))
+    assert list(deleted.values_list('operation', flat=True)) == ['create', 'delete']
+    assert all(entry.created_by == system_user for entry in Entry.objects.all())
+
+
+@pytest.mark.django_db
+def test_buffered_activity_stream_rollback(system_user, django_capture_on_commit_callbacks):
+    """
+    Ensure that the entries of changes which are rolled back are not written.
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(RuntimeError):
+            with buffered_activity_stream():
+                City.objects.create(name='Rolled back', country='USA')
+                raise RuntimeError
+
+        with buffered_activity_stream():
+            kept = City.objects.create(name='Kept', country='USA')
+            try:
+                with transaction.atomic():
+                    City.objects.create(name='Savepoint rolled back', country='USA')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+    city_entries = Entry.objects.filter(content_type=ContentType.objects.get_for_model(City))
+    assert list(city_entries.values_list('object_id', 'operation')) == [(str(kept.pk), 'create')]
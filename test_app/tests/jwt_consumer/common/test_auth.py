@@ -1,12 +1,15 @@
 import logging
 import re
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from functools import partial
 from unittest import mock
 from uuid import uuid4
 
 import pytest
-from django.test.utils import override_settings
+from asgiref.sync import SyncToAsync, sync_to_async
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from jwt.exceptions import DecodeError
 from rest_framework.exceptions import AuthenticationFailed
 
@@ -21,6 +24,20 @@ from test_app.models import Organization, Team
 default_logger = 'ansible_base.jwt_consumer.common.auth.logger'
 
 
+@contextmanager
+def thread_calls():
+    "Lists the functions run by sync_to_async, including the calls made by the async APIs of Django"
+    calls = []
+    original_call = SyncToAsync.__call__
+
+    async def call(self, *args, **kwargs):
+        calls.append(self)
+        return await original_call(self, *args, **kwargs)
+
+    with mock.patch.object(SyncToAsync, '__call__', call):
+        yield calls
+
+
 @pytest.fixture
 def organization_admin_role():
     from test_app.models import Organization
@@ -85,6 +102,41 @@ class TestJWTCommonAuth:
             assert my_auth.token is None
             assert 'Failed to get the setting ANSIBLE_BASE_JWT_KEY' in caplog.text
 
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_aparse_jwt_token_cached_path_single_thread_call(self, mocked_http, test_encryption_public_key, jwt_token):
+        with override_settings(ANSIBLE_BASE_JWT_KEY=test_encryption_public_key):
+            request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
+            common_auth = JWTCommonAuth()
+            # The first request creates the user, the second caches its pk, and both load the key and validate the token
+            for i in range(2):
+                await sync_to_async(common_auth.parse_jwt_token)(request)
+
+            async_auth = JWTCommonAuth()
+            with thread_calls() as calls:
+                await async_auth.aparse_jwt_token(request)
+            # The token is handled in the event loop, only loading the user goes to the thread shared with the ORM
+            assert [(call.func, call._thread_sensitive) for call in calls] == [(async_auth.load_user, True)]
+            assert async_auth.user == common_auth.user
+            assert async_auth.token == common_auth.token
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_aparse_jwt_token_uncached(self, mocked_http, test_encryption_public_key, jwt_token):
+        with override_settings(ANSIBLE_BASE_JWT_KEY=test_encryption_public_key):
+            request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
+            common_auth = JWTCommonAuth()
+            await common_auth.aparse_jwt_token(request)
+            assert common_auth.user.username == jwt_token.unencrypted_token['user_data']['username']
+            assert common_auth.token['sub'] == jwt_token.unencrypted_token['sub']
+
+    @pytest.mark.asyncio
+    async def test_aparse_jwt_token_no_header(self, mocked_http):
+        common_auth = JWTCommonAuth()
+        await common_auth.aparse_jwt_token(mocked_http.mocked_parse_jwt_token_get_request('without_headers'))
+        assert common_auth.user is None
+        assert common_auth.token is None
+
     @pytest.mark.django_db
     def test_log_exception_no_expansion(self, expected_log):
         common_auth = JWTCommonAuth()
@@ -137,6 +189,61 @@ class TestJWTCommonAuth:
                 assert f"Saving user {user.username}" in caplog.text
                 assert user.save.called
 
+    @pytest.mark.django_db
+    def test_map_user_fields_saves_changed_fields(self, random_user):
+        common_auth = JWTCommonAuth(['username', 'first_name', 'last_name'])
+        common_auth.user = random_user
+        common_auth.token = {'user_data': {'username': random_user.username, 'first_name': 'Cindy', 'last_name': random_user.last_name}}
+        with mock.patch.object(random_user, 'save') as save:
+            common_auth.map_user_fields()
+        save.assert_called_once_with(update_fields=['first_name', 'modified'])
+
+    @pytest.mark.django_db
+    def test_map_user_fields_skips_user_data_already_applied(self, random_user):
+        common_auth = JWTCommonAuth(['username', 'first_name'])
+        common_auth.user = random_user
+        common_auth.token = {'user_data': {'username': random_user.username, 'first_name': 'Cindy'}}
+        common_auth.map_user_fields()
+        random_user.refresh_from_db()
+        assert random_user.first_name == 'Cindy'
+
+        # The user was changed locally, but the token has the same user_data which was already applied
+        random_user.first_name = 'Lou'
+        with mock.patch.object(random_user, 'save') as save:
+            common_auth.map_user_fields()
+        save.assert_not_called()
+
+        common_auth.token['user_data']['first_name'] = 'Billy'
+        common_auth.map_user_fields()
+        random_user.refresh_from_db()
+        assert random_user.first_name == 'Billy'
+
+    @pytest.mark.django_db
+    def test_map_user_fields_last_login(self, random_user):
+        common_auth = JWTCommonAuth(['username'])
+        common_auth.user = random_user
+        common_auth.token = {'user_data': {'username': random_user.username}}
+        assert random_user.last_login is None
+
+        common_auth.map_user_fields()
+        assert random_user.last_login is None  # not updated by default
+
+        with override_settings(ANSIBLE_BASE_JWT_LAST_LOGIN_UPDATE_SECONDS=3600):
+            common_auth.map_user_fields()
+            random_user.refresh_from_db()
+            last_login = random_user.last_login
+            assert last_login is not None
+
+            # Within the interval, last_login is not written again
+            with mock.patch.object(random_user, 'save') as save:
+                common_auth.map_user_fields()
+            save.assert_not_called()
+
+            random_user.last_login = last_login - timedelta(hours=2)
+            with mock.patch.object(random_user, 'save') as save:
+                common_auth.map_user_fields()
+            save.assert_called_once_with(update_fields=['last_login'])
+
     @pytest.mark.django_db
     @pytest.mark.parametrize(
         "remove,is_user_data_entry",
@@ -233,7 +340,7 @@ class TestJWTCommonAuth:
         assert parsed_token == jwt_token.unencrypted_token
 
     @pytest.mark.django_db
-    @mock.patch('ansible_base.jwt_consumer.common.auth.JWTCert.get_decryption_key', side_effect=JWTCertException('testing'))
+    @mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key', side_effect=JWTCertException('testing'))
     def test_cert_exception_converts_to_AuthenticationFailed(self, get_decryption_key, mocked_http):
         with pytest.raises(AuthenticationFailed):
             common_auth = JWTCommonAuth()
@@ -369,10 +476,73 @@ class TestJWTCommonAuth:
 
         assert RoleUserAssignment.objects.filter(user=admin_user).count() == 0
 
+    def test_process_rbac_permissions_skipped_when_claims_unchanged(self, admin_user, organization, organization_admin_role, django_assert_num_queries):
+        authentication = JWTCommonAuth()
+        authentication.user = admin_user
+        authentication.token = {
+            'objects': {'organization': [{'ansible_id': organization.resource.ansible_id, 'name': organization.name}]},
+            'object_roles': {organization_admin_role.name: {'content_type': 'organization', 'objects': [0]}},
+        }
+        authentication.process_rbac_permissions()
+        assert admin_user.has_obj_perm(organization, 'change')
+
+        with mock.patch('ansible_base.rbac.models.RoleDefinition.give_permission') as give_permission:
+            with django_assert_num_queries(0):
+                authentication.process_rbac_permissions()
+            give_permission.assert_not_called()
+
+    def test_process_rbac_permissions_repairs_local_changes(self, random_user, organization, organization_admin_role):
+        authentication = JWTCommonAuth()
+        authentication.user = random_user
+        authentication.token = {
+            'objects': {'organization': [{'ansible_id': organization.resource.ansible_id, 'name': organization.name}]},
+            'object_roles': {organization_admin_role.name: {'content_type': 'organization', 'objects': [0]}},
+        }
+        fingerprint = authentication.get_rbac_claims_fingerprint()
+        authentication.process_rbac_permissions()
+
+        # The assignment removed locally is given again on the next request
+        organization_admin_role.remove_permission(random_user, organization)
+        assert not authentication.cache.check_rbac_claims_in_cache(random_user.pk, fingerprint)
+        authentication.process_rbac_permissions()
+        assert random_user.has_obj_perm(organization, 'change')
+
+        # Deleting the organization deletes the assignment too
+        assert authentication.cache.check_rbac_claims_in_cache(random_user.pk, fingerprint)
+        organization.delete()
+        assert not authentication.cache.check_rbac_claims_in_cache(random_user.pk, fingerprint)
+
+    def test_process_rbac_permissions_applies_only_the_difference(self, random_user, organization, organization_admin_role):
+        other_org = Organization.objects.create(name='other-org')
+        authentication = JWTCommonAuth()
+        authentication.user = random_user
+        authentication.token = {
+            'objects': {'organization': [{'ansible_id': org.resource.ansible_id, 'name': org.name} for org in (organization, other_org)]},
+            'object_roles': {organization_admin_role.name: {'content_type': 'organization', 'objects': [0]}},
+        }
+        authentication.process_rbac_permissions()
+        assert random_user.has_obj_perm(organization, 'change')
+
+        authentication.token['object_roles'] = {organization_admin_role.name: {'content_type': 'organization', 'objects': [0, 1]}}
+        with mock.patch('ansible_base.rbac.models.RoleDefinition.remove_permission') as remove_permission:
+            authentication.process_rbac_permissions()
+            remove_permission.assert_not_called()
+        assert random_user.has_obj_perm(organization, 'change')
+        assert random_user.has_obj_perm(other_org, 'change')
+
+        authentication.token['object_roles'] = {organization_admin_role.name: {'content_type': 'organization', 'objects': [1]}}
+        with mock.patch('ansible_base.rbac.models.RoleDefinition.give_permission') as give_permission:
+            authentication.process_rbac_permissions()
+            give_permission.assert_not_called()
+        assert not random_user.has_obj_perm(organization, 'change')
+        assert random_user.has_obj_perm(other_org, 'change')
+
     @pytest.mark.django_db
     def test_get_or_create_resource_invalid_content_type(self):
         authentication = JWTCommonAuth()
-        assert authentication.get_or_create_resource('junk', {'ansible_id': uuid4()}) == (None, None)
+        with mock.patch(default_logger) as logger:
+            assert authentication.get_or_create_resource('junk', {'ansible_id': uuid4()}) == (None, None)
+        logger.error.assert_called_once_with("build_resource_stub does not know how to build an object of type junk")
 
     @pytest.mark.django_db
     def test_get_or_create_resource_organization(self):
@@ -413,6 +583,50 @@ class TestJWTCommonAuth:
         assert Resource.objects.filter(ansible_id=data['ansible_id']).exists()
         assert Team.objects.filter(name=data['name']).exists()
 
+    @pytest.mark.django_db
+    def test_resolve_objects_existing(self, organization, django_assert_num_queries):
+        teams = [Team.objects.create(name=f'team-{i}', organization=organization) for i in range(5)]
+        authentication = JWTCommonAuth()
+        authentication.token = {
+            'objects': {
+                'organization': [{'ansible_id': str(organization.resource.ansible_id), 'name': organization.name}],
+                'team': [{'ansible_id': str(team.resource.ansible_id), 'name': team.name, 'org': 0} for team in teams],
+            },
+        }
+        # one query for the resources, one for each content type
+        with django_assert_num_queries(3):
+            resolved = authentication.resolve_objects()
+            assert [obj for resource, obj in resolved['team']] == teams
+            assert [resource.content_object for resource, obj in resolved['team']] == teams
+        assert resolved['organization'] == [(organization.resource, organization)]
+
+    @pytest.mark.django_db
+    def test_resolve_objects_creates_stubs(self, organization):
+        authentication = JWTCommonAuth()
+        new_org_ansible_id = str(uuid4())
+        authentication.token = {
+            'objects': {
+                # teams are listed first, their organization still has to be created before them
+                'team': [
+                    {'ansible_id': str(uuid4()), 'name': 'new-team', 'org': 1},
+                    {'ansible_id': str(uuid4()), 'name': 'other-new-team', 'org': 0},
+                ],
+                'organization': [
+                    {'ansible_id': str(organization.resource.ansible_id), 'name': organization.name},
+                    {'ansible_id': new_org_ansible_id, 'name': 'new-org'},
+                ],
+                'junk': [{'ansible_id': str(uuid4())}],
+            },
+        }
+        resolved = authentication.resolve_objects()
+
+        new_org = Organization.objects.get(name='new-org')
+        assert str(new_org.resource.ansible_id) == new_org_ansible_id
+        assert resolved['organization'][1] == (new_org.resource, new_org)
+        assert resolved['team'][0][1] == Team.objects.get(name='new-team', organization=new_org)
+        assert resolved['team'][1][1] == Team.objects.get(name='other-new-team', organization=organization)
+        assert resolved['junk'] == [(None, None)]
+
 
 class TestJWTAuthentication:
     def test_authenticate(self, jwt_token, django_user_model, mocked_http, test_encryption_public_key):
@@ -428,6 +642,39 @@ class TestJWTAuthentication:
             created_user, _ = jwt_auth.authenticate(request)
             assert user == created_user
 
+    @pytest.mark.django_db
+    def test_authenticate_steady_state_does_not_write(self, jwt_token, mocked_http, test_encryption_public_key):
+        class RBACJWTAuthentication(JWTAuthentication):
+            use_rbac_permissions = True
+
+        with override_settings(ANSIBLE_BASE_JWT_KEY=test_encryption_public_key, ANSIBLE_BASE_JWT_LAST_LOGIN_UPDATE_SECONDS=3600):
+            request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
+            RBACJWTAuthentication().authenticate(request)  # first login creates the user
+
+            with CaptureQueriesContext(connection) as captured:
+                user, _ = RBACJWTAuthentication().authenticate(request)
+            assert user.username == jwt_token.unencrypted_token['user_data']['username']
+            writes = [query['sql'] for query in captured.captured_queries if query['sql'].split(' ', 1)[0] in ('INSERT', 'UPDATE', 'DELETE')]
+            assert writes == []
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_aauthenticate_cached_path_single_thread_call(self, jwt_token, mocked_http, test_encryption_public_key):
+        class RBACJWTAuthentication(JWTAuthentication):
+            use_rbac_permissions = True
+
+        with override_settings(ANSIBLE_BASE_JWT_KEY=test_encryption_public_key):
+            request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
+            # The first request creates the user and applies the claims, the second caches its pk
+            for i in range(2):
+                await sync_to_async(RBACJWTAuthentication().authenticate)(request)
+
+            jwt_auth = RBACJWTAuthentication()
+            with thread_calls() as calls:
+                user, _ = await jwt_auth.aauthenticate(request)
+            assert [call.func for call in calls] == [jwt_auth.authenticate_token]
+            assert user.username == jwt_token.unencrypted_token['user_data']['username']
+
     @pytest.mark.django_db()
     @pytest.mark.parametrize(
         "original_is_superuser, token_is_superuser, expected_is_superuser",
@@ -479,7 +726,7 @@ class TestJWTAuthentication:
         # We are going to return a key which will not work with jwt_token provided by mocked_http
         # Because its not cached the call to parse_jwt_token should raise the exception
         with override_settings(ANSIBLE_BASE_JWT_KEY=random_public_key):
-            with mock.patch('ansible_base.jwt_consumer.common.auth.JWTCert.get_decryption_key', create_mock_method(mock_field_dicts)):
+            with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key', create_mock_method(mock_field_dicts)):
                 request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
                 jwt_auth = JWTAuthentication()
                 with pytest.raises(AuthenticationFailed) as af:
@@ -503,7 +750,7 @@ class TestJWTAuthentication:
         url = 'https://example.com'
         with override_settings(ANSIBLE_BASE_JWT_KEY=url):
             # 1. Make the get_decryption_key always return the random key (which is invalid) && 2. pretend the key is cached
-            with mock.patch('ansible_base.jwt_consumer.common.auth.JWTCert.get_decryption_key', create_mock_method(mock_field_dicts)):
+            with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key', create_mock_method(mock_field_dicts)):
                 # 3. Make the call.
                 # This will attempt to use the cached key, recognize that its invalid, load the key again (which will be the same) and then error out
                 request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
@@ -525,7 +772,7 @@ class TestJWTAuthentication:
                 {"key": test_encryption_public_key, "cached": False},
             ]
 
-            with mock.patch('ansible_base.jwt_consumer.common.auth.JWTCert.get_decryption_key', create_mock_method(jwt_cert_field_changes)):
+            with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key', create_mock_method(jwt_cert_field_changes)):
                 request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
                 jwt_auth = JWTAuthentication()
                 if not new_user:
@@ -566,7 +813,7 @@ class TestJWTAuthentication:
                 self.cached = not ignore_cache
                 return None
 
-            with mock.patch('ansible_base.jwt_consumer.common.auth.JWTCert.get_decryption_key', change_cert_key_value):
+            with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key', change_cert_key_value):
                 with pytest.raises(AuthenticationFailed):
                     request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
                     jwt_auth = JWTAuthentication()
@@ -1 +1,75 @@
-# The cache is tested by test_auth and test_cert
+# The user and key caches are tested by test_auth and test_cert
+import time
+from unittest import mock
+
+import pytest
+from django.test.utils import override_settings
+
+from ansible_base.jwt_consumer.common.auth import JWTCommonAuth
+from ansible_base.jwt_consumer.common.cache import JWTValidatedTokenCache, cache
+
+
+class TestJWTValidatedTokenCache:
+    def body(self, exp_offset=600, **kwargs):
+        return {'sub': 'abc', 'exp': int(time.time()) + exp_offset, 'user_data': {}, **kwargs}
+
+    def test_round_trip(self):
+        token_cache = JWTValidatedTokenCache()
+        body = self.body()
+        token_cache.set('raw-token', 'key', body)
+        cached_body = token_cache.get('raw-token', 'key')
+        assert cached_body == body
+        cached_body['sub'] = 'modified'
+        assert token_cache.get('raw-token', 'key')['sub'] == 'abc'  # callers get a copy
+        assert token_cache.get('other-token', 'key') is None
+
+    def test_expired_entry(self):
+        token_cache = JWTValidatedTokenCache()
+        token_cache.set('raw-token', 'key', self.body(exp_offset=-1))
+        assert token_cache.get('raw-token', 'key') is None
+
+    def test_key_rotation_flushes(self):
+        token_cache = JWTValidatedTokenCache()
+        token_cache.set('raw-token', 'key', self.body())
+        assert token_cache.get('raw-token', 'new-key') is None
+        assert token_cache.get('raw-token', 'key') is None  # was flushed, not just hidden
+
+    @override_settings(ANSIBLE_BASE_JWT_VALIDATED_TOKEN_CACHE_SIZE=2)
+    def test_lru_eviction(self):
+        token_cache = JWTValidatedTokenCache()
+        for raw_token in ('a', 'b'):
+            token_cache.set(raw_token, 'key', self.body())
+        assert token_cache.get('a', 'key') is not None  # a is now most recently used
+        token_cache.set('c', 'key', self.body())
+        assert token_cache.get('b', 'key') is None
+        assert token_cache.get('a', 'key') is not None
+        assert token_cache.get('c', 'key') is not None
+
+    @override_settings(ANSIBLE_BASE_JWT_VALIDATED_TOKEN_CACHE_SIZE=0)
+    def test_disabled(self):
+        token_cache = JWTValidatedTokenCache()
+        token_cache.set('raw-token', 'key', self.body())
+        assert token_cache.get('raw-token', 'key') is None
+
+    @override_settings(ANSIBLE_BASE_JWT_VALIDATED_TOKEN_USE_DJANGO_CACHE=True)
+    def test_django_cache_shared(self):
+        body = self.body()
+        JWTValidatedTokenCache().set('raw-token', 'key', body)
+        try:
+            assert JWTValidatedTokenCache().get('raw-token', 'key') == body
+            assert JWTValidatedTokenCache().get('raw-token', 'other-key') is None
+        finally:
+            cache.delete(f'{JWTValidatedTokenCache.django_cache_prefix}{JWTValidatedTokenCache.digest("raw-token")}')
+
+
+@pytest.mark.django_db
+def test_second_request_skips_decode(mocked_http, test_encryption_public_key, shut_up_logging, jwt_token):
+    with override_settings(ANSIBLE_BASE_JWT_KEY=test_encryption_public_key):
+        request = mocked_http.mocked_parse_jwt_token_get_request('with_headers')
+        JWTCommonAuth().parse_jwt_token(request)
+        with mock.patch('ansible_base.jwt_consumer.common.auth.jwt.decode') as mock_decode:
+            my_auth = JWTCommonAuth()
+            my_auth.parse_jwt_token(request)
+        mock_decode.assert_not_called()
+        assert my_auth.token == jwt_token.unencrypted_token
+        assert my_auth.user.username == jwt_token.unencrypted_token['user_data']['username']
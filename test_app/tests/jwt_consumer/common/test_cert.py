@@ -1,12 +1,15 @@
+import threading
+import time
 from unittest import mock
 from urllib.parse import urlparse
 
 import pytest
 import requests
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
 from django.conf import settings
 from django.test import override_settings
 
-from ansible_base.jwt_consumer.common.cert import JWTCert, JWTCertException
+from ansible_base.jwt_consumer.common.cert import JWTCert, JWTCertException, JWTKeyHolder
 
 
 class TestJWTCert:
@@ -175,3 +178,84 @@ class TestJWTCert:
                 cert.get_decryption_key()
                 assert cert.key == test_encryption_public_key
                 assert cert.cached is False
+
+
+class TestJWTKeyHolder:
+    @pytest.fixture(autouse=True)
+    def isolated_key_cache(self, request):
+        # Keys cached in the Django cache by other tests should not be loaded
+        with mock.patch('ansible_base.jwt_consumer.common.cache.cache_key', f'test_jwt_key_holder_{request.node.name}'):
+            yield
+
+    def test_no_setting(self):
+        assert JWTKeyHolder().get_keys() == ([], False)
+
+    def test_keys_are_parsed_and_reused(self, test_encryption_public_key):
+        holder = JWTKeyHolder()
+        with override_settings(ANSIBLE_BASE_JWT_KEY=test_encryption_public_key):
+            keys, loaded_from_source = holder.get_keys()
+            assert [key.pem for key in keys] == [test_encryption_public_key]
+            assert isinstance(keys[0].public_key, RSAPublicKey)
+
+            with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key') as mck:
+                assert holder.get_keys()[0][0] is keys[0]
+            mck.assert_not_called()
+
+    def test_reload_after_refresh_interval(self, test_encryption_public_key):
+        holder = JWTKeyHolder()
+        with override_settings(ANSIBLE_BASE_JWT_KEY=test_encryption_public_key, ANSIBLE_BASE_JWT_KEY_REFRESH_SECONDS=0):
+            holder.get_keys()
+            with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key') as mck:
+                holder.get_keys()
+            mck.assert_called_once_with()
+
+    def test_unparsable_key(self):
+        with override_settings(ANSIBLE_BASE_JWT_KEY='-----BEGIN PUBLIC KEY-----junk-----END PUBLIC KEY-----'):
+            with pytest.raises(JWTCertException, match='Unable to parse JWT decryption key'):
+                JWTKeyHolder().get_keys()
+
+    def test_single_flight_refresh(self, test_encryption_public_key, random_public_key):
+        holder = JWTKeyHolder()
+        with override_settings(ANSIBLE_BASE_JWT_KEY=random_public_key):
+            holder.get_keys()
+
+        calls = []
+
+        def slow_get_decryption_key(self, ignore_cache=False):
+            calls.append(ignore_cache)
+            time.sleep(0.1)
+            self.key = test_encryption_public_key
+            self.cached = False
+
+        with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key', slow_get_decryption_key):
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(holder.refresh(random_public_key))) for i in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert calls == [True]
+        assert [keys[0].pem for keys in results] == [test_encryption_public_key] * 5
+
+    @pytest.mark.parametrize('rotation_window, expected_count', [(0, 1), (300, 2)])
+    def test_rotation_window(self, test_encryption_public_key, random_public_key, rotation_window, expected_count):
+        holder = JWTKeyHolder()
+        with override_settings(ANSIBLE_BASE_JWT_KEY='https://example.com', ANSIBLE_BASE_JWT_KEY_ROTATION_WINDOW_SECONDS=rotation_window):
+
+            def set_key(key):
+                def _rf(self, ignore_cache=False):
+                    self.key = key
+                    self.cached = False
+
+                return _rf
+
+            with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key', set_key(random_public_key)):
+                holder.get_keys()
+            with mock.patch('ansible_base.jwt_consumer.common.cert.JWTCert.get_decryption_key', set_key(test_encryption_public_key)):
+                keys = holder.refresh(random_public_key)
+
+        assert keys[0].pem == test_encryption_public_key
+        assert len(keys) == expected_count
+        if expected_count == 2:
+            assert keys[1].pem == random_public_key
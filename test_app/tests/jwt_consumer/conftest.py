@@ -0,0 +1,15 @@
+import pytest
+
+from ansible_base.jwt_consumer.common.cache import cache, validated_token_cache
+from ansible_base.jwt_consumer.common.cert import jwt_key_holder
+
+
+@pytest.fixture(autouse=True)
+def clear_jwt_process_caches():
+    # The JWT cache holds fingerprints of RBAC claims by user pk, which are reused between tests
+    cache.clear()
+    validated_token_cache.clear()
+    jwt_key_holder.clear()
+    yield
+    validated_token_cache.clear()
+    jwt_key_holder.clear()
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 from uuid import uuid4
 
 import pytest
@@ -51,9 +51,8 @@ def test_hub_jwt_teams(user, token, num_roles):
 
 
 @pytest.mark.django_db
-@patch('ansible_base.jwt_consumer.hub.auth.Resource')
 @patch('ansible_base.jwt_consumer.hub.auth.ContentType')
-def test_hub_jwt_orgs_teams_groups_memberships(mock_contenttype, mock_resource):
+def test_hub_jwt_orgs_teams_groups_memberships(mock_contenttype):
 
     # make the _system user ...
     User.objects.get_or_create(username='_system')
@@ -81,24 +80,8 @@ def test_hub_jwt_orgs_teams_groups_memberships(mock_contenttype, mock_resource):
     def get_galaxy_models():
         return Organization, Team
 
-    def get_or_create_resource(*args, **kwargs):
-        raise Exception('not yet implemented')
-
-    # return a very limited set of resources for Resource...
-    def get_resource_content(*args, **kwargs):
-        for obj in [testuser, testorg, testteam]:
-            if str(obj.resource.ansible_id) == kwargs['ansible_id']:
-                resource = MagicMock()
-                resource.content_object = obj
-                return resource
-        raise Exception('not found')
-
-    # we don't want the resource queryset to return our unmodified team ...
-    mock_resource.objects.get.side_effect = get_resource_content
-
     auth = HubJWTAuth()
     auth.get_galaxy_models = get_galaxy_models
-    auth.common_auth.get_or_create_resource = get_or_create_resource
     auth.common_auth.user = testuser
 
     # Add the user to the org and the team. Galaxy doesn't have
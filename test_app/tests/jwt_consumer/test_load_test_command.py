@@ -0,0 +1,20 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_jwt_auth_command():
+    out = StringIO()
+    call_command('load_test_jwt_auth', authentication=['awx', 'hub'], users=2, requests=4, clients=1, organizations=1, teams=2, stdout=out)
+    lines = {tuple(line.split()[:3]): line.split() for line in out.getvalue().splitlines()}
+    for name in ('awx', 'hub'):
+        for scenario in (('first', 'login'), ('steady', 'state'), ('claim', 'change')):
+            requests, errors = lines[(name, *scenario)][3:5]
+            assert int(requests) > 0
+            assert errors == '0'
+        # The key is fetched from the key server stand-in once
+        assert f'{name}: 1 key fetches from the key server' in out.getvalue()
+        # Repeating the same token is served from the validated token cache
+        assert lines[(name, 'steady', 'state')][8] == '100%'
@@ -1,8 +1,12 @@
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
+from django.test.utils import override_settings
+from rest_framework.settings import api_settings
 
 import ansible_base.lib.channels.middleware as middleware
+from ansible_base.jwt_consumer.common.auth import JWTAuthentication
+from test_app.authentication.logged_basic_auth import LoggedBasicAuthentication
 
 
 @pytest.mark.django_db(transaction=True)
@@ -32,3 +36,19 @@ async def test_middleware_auth_denied(denier_class, system_user, local_authentic
     assert "user" not in scope
     inner.assert_not_awaited()
     denier.assert_awaited_once()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_middleware_auth_jwt(jwt_token, test_encryption_public_key):
+    inner = AsyncMock()
+    auth = middleware.DrfAuthMiddleware(inner)
+    scope = {"session": {}, "headers": [(b"X-DAB-JW-TOKEN", jwt_token.encrypt_token().encode())]}
+    with override_settings(ANSIBLE_BASE_JWT_KEY=test_encryption_public_key):
+        with patch.object(api_settings, 'DEFAULT_AUTHENTICATION_CLASSES', [LoggedBasicAuthentication, JWTAuthentication]):
+            with patch.object(JWTAuthentication, 'aauthenticate', autospec=True, side_effect=JWTAuthentication.aauthenticate) as aauthenticate:
+                await auth(scope, Mock(), Mock())
+
+    aauthenticate.assert_awaited_once()
+    assert scope["user"].username == jwt_token.unencrypted_token['user_data']['username']
+    inner.assert_awaited_once()
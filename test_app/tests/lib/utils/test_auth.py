@@ -1,10 +1,11 @@
 from unittest.mock import patch
-from uuid import UUID
+from uuid import UUID, uuid4
 
 import pytest
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 
-from ansible_base.lib.utils.auth import get_model_from_settings, get_object_by_ansible_id, get_user_by_ansible_id
+from ansible_base.lib.utils.auth import get_model_from_settings, get_object_by_ansible_id, get_user_by_ansible_id, user_id_cache_key
 from test_app.models import Organization, User
 
 
@@ -66,3 +67,55 @@ def test_get_by_ansible_id(organization, arg_type):
         uuid_obj = arg_type(resource.ansible_id)
     assert isinstance(uuid_obj, arg_type)
     assert get_object_by_ansible_id(Organization.objects.all(), organization.resource.ansible_id) == organization
+
+
+@pytest.mark.django_db
+def test_get_user_by_ansible_id_cached(django_assert_num_queries):
+    user = User.objects.create(username='cached-bob')
+    ansible_id = user.resource.ansible_id
+    with django_assert_num_queries(2):
+        assert get_user_by_ansible_id(ansible_id) == user
+    # The second lookup only fetches the user by primary key
+    with django_assert_num_queries(1):
+        found_user = get_user_by_ansible_id(str(ansible_id), annotate_as='a_id')
+    assert found_user == user
+    assert found_user.a_id == ansible_id
+
+
+@pytest.mark.django_db
+def test_get_user_by_ansible_id_cache_invalidated_by_resource_delete():
+    user = User.objects.create(username='cached-bob')
+    ansible_id = user.resource.ansible_id
+    assert get_user_by_ansible_id(ansible_id) == user
+    assert cache.get(user_id_cache_key(ansible_id)) == user.pk
+
+    user.resource.delete()
+    assert cache.get(user_id_cache_key(ansible_id)) is None
+    with pytest.raises(User.DoesNotExist):
+        get_user_by_ansible_id(ansible_id)
+
+
+@pytest.mark.django_db
+def test_get_user_by_ansible_id_cache_invalidated_by_ansible_id_change():
+    user = User.objects.create(username='cached-bob')
+    resource = user.resource
+    old_ansible_id = resource.ansible_id
+    assert get_user_by_ansible_id(old_ansible_id) == user
+
+    new_ansible_id = uuid4()
+    resource.update_resource({'username': user.username}, ansible_id=new_ansible_id, partial=True)
+    with pytest.raises(User.DoesNotExist):
+        get_user_by_ansible_id(old_ansible_id)
+    assert get_user_by_ansible_id(new_ansible_id) == user
+
+
+@pytest.mark.django_db
+def test_get_user_by_ansible_id_cached_user_deleted():
+    user = User.objects.create(username='cached-bob')
+    ansible_id = user.resource.ansible_id
+    assert get_user_by_ansible_id(ansible_id) == user
+    # Deleting without signals leaves a stale entry behind, which must not be trusted
+    User.objects.filter(pk=user.pk)._raw_delete(User.objects.db)
+    with pytest.raises(User.DoesNotExist):
+        get_user_by_ansible_id(ansible_id)
+    assert cache.get(user_id_cache_key(ansible_id)) is None
@@ -1,9 +1,21 @@
+from unittest import mock
+
 import pytest
+from django.db import connection
 
-from ansible_base.lib.utils.db import migrations_are_complete
+from ansible_base.lib.utils.db import buffered_atomic, migrations_are_complete
 
 
 @pytest.mark.django_db
 def test_migrations_are_complete():
     "If you are running tests, migrations (test database) should be complete"
     assert migrations_are_complete()
+
+
+@pytest.mark.django_db
+def test_buffered_atomic_without_activitystream():
+    with mock.patch('ansible_base.lib.utils.db.apps.is_installed', return_value=False):
+        with mock.patch('ansible_base.activitystream.buffered_activity_stream') as buffered_activity_stream:
+            with buffered_atomic():
+                assert connection.in_atomic_block
+    buffered_activity_stream.assert_not_called()
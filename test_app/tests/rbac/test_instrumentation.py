@@ -0,0 +1,54 @@
+import pytest
+from django.test.utils import override_settings
+
+from ansible_base.rbac.instrumentation import rbac_timing
+
+
+@pytest.fixture
+def timing_records():
+    records = []
+
+    def receiver(sender, record, **kwargs):
+        records.append(record)
+
+    rbac_timing.connect(receiver)
+    yield records
+    rbac_timing.disconnect(receiver)
+
+
+@pytest.mark.django_db
+def test_no_records_when_disabled(rando, inventory, inv_rd, timing_records):
+    inv_rd.give_permission(rando, inventory)
+    assert rando.has_obj_perm(inventory, 'change')
+    assert timing_records == []
+
+
+@pytest.mark.django_db
+@override_settings(ANSIBLE_BASE_RBAC_INSTRUMENTATION=True)
+def test_assignment_records(rando, inventory, inv_rd, timing_records):
+    inv_rd.give_permission(rando, inventory)
+    by_operation = {record.operation: record for record in timing_records}
+    assert set(by_operation) >= {'needed_updates_on_assignment', 'compute_object_role_permissions'}
+
+    compute_record = by_operation['compute_object_role_permissions']
+    assert compute_record.object_roles == 1
+    assert compute_record.evaluations_added == inv_rd.permissions.count()
+    assert compute_record.evaluations_removed == 0
+    assert compute_record.queries > 0
+    assert compute_record.duration > 0
+
+    timing_records.clear()
+    assert rando.has_obj_perm(inventory, 'change')
+    assert [record.operation for record in timing_records] == ['has_obj_perm']
+    assert timing_records[0].queries > 0
+
+
+@pytest.mark.django_db
+@override_settings(ANSIBLE_BASE_RBAC_INSTRUMENTATION=True)
+def test_removal_records(rando, inventory, inv_rd, timing_records):
+    inv_rd.give_permission(rando, inventory)
+    timing_records.clear()
+    inv_rd.permissions.remove(inv_rd.permissions.get(codename='change_inventory'))
+    compute_record = [record for record in timing_records if record.operation == 'compute_object_role_permissions'][0]
+    assert compute_record.evaluations_removed == 1
+    assert compute_record.evaluations_added == 0
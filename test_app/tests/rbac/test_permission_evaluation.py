@@ -1,9 +1,12 @@
+from unittest import mock
+
 import pytest
 from django.test.utils import override_settings
 
 from ansible_base.lib.utils.models import is_add_perm
-from ansible_base.rbac.models import ObjectRole, RoleDefinition, RoleEvaluation, RoleUserAssignment
+from ansible_base.rbac.models import ObjectRole, RoleDefinition, RoleEvaluation, RoleUserAssignment, _expansion_plans, get_expansion_plan
 from ansible_base.rbac.permission_registry import permission_registry
+from ansible_base.rbac.prefetch import TypesPrefetch
 from test_app.models import Inventory, Organization
 
 
@@ -219,3 +222,37 @@ class TestMultipleMemberRoles:
         assert not bob.has_obj_perm(inventory, 'change')
         assert not bob.has_obj_perm(team, 'member')
         assert not bob.has_obj_perm(organization, 'view')
+
+
+@pytest.mark.django_db
+class TestExpansionPlans:
+    def test_plan_reused_for_other_objects(self, rando, organization, org_inv_rd):
+        org_inv_rd.give_permission(rando, organization)
+        other_org = Organization.objects.create(name='other-org')
+        with mock.patch.object(permission_registry, 'get_child_models', wraps=permission_registry.get_child_models) as mck:
+            org_inv_rd.give_permission(rando, other_org)
+        mck.assert_not_called()
+
+    def test_plan_invalidated_by_permission_change(self, rando, inventory, org_inv_rd):
+        org_inv_rd.give_permission(rando, inventory.organization)
+        assert rando.has_obj_perm(inventory, 'delete_inventory')
+
+        delete_perm = permission_registry.permission_qs.get(codename='delete_inventory')
+        org_inv_rd.permissions.remove(delete_perm)
+        for perm_ids in [key[1] for key in _expansion_plans[org_inv_rd.id]]:
+            assert delete_perm.id not in perm_ids
+        assert not rando.has_obj_perm(inventory, 'delete_inventory')
+        assert rando.has_obj_perm(inventory, 'change_inventory')
+
+    def test_plan_groups_child_permissions(self, organization, org_inv_rd):
+        object_role = ObjectRole.objects.create(
+            role_definition=org_inv_rd, content_type=permission_registry.content_type_model.objects.get_for_model(organization), object_id=organization.id
+        )
+        plan = get_expansion_plan(object_role, TypesPrefetch())
+        assert plan.object_codenames == {'view_organization', 'add_inventory'}
+        inv_ct_id = permission_registry.content_type_model.objects.get_for_model(Inventory).id
+        assert set(plan.child_groups) == {inv_ct_id}
+        child_model, filter_path, codenames = plan.child_groups[inv_ct_id]
+        assert child_model is Inventory
+        assert filter_path == 'organization'
+        assert set(codenames) == {'change_inventory', 'delete_inventory', 'view_inventory'}
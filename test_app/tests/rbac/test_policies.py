@@ -1,6 +1,8 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
-from ansible_base.rbac.policies import can_change_user
+from ansible_base.rbac.policies import can_change_user, visible_org_ids, visible_users
 from test_app.models import User
 
 
@@ -32,3 +34,44 @@ def test_superuser_can_change_new_user(admin_user):
 def test_user_can_manage_themselves():
     alice = User.objects.create(username='alice')
     assert can_change_user(alice, alice)
+
+
+@pytest.mark.django_db
+def test_visible_users_query_has_no_distinct(user, organization, org_member_rd):
+    org_member_rd.give_permission(user, organization)
+    alice = User.objects.create(username='alice')
+    org_member_rd.give_permission(alice, organization)
+    qs = visible_users(user)
+    assert not qs.query.distinct
+    assert set(qs.values_list('username', flat=True)) >= {'alice', user.username}
+
+
+@pytest.mark.django_db
+def test_visible_org_ids_memo_invalidated(user, organization, org_member_rd):
+    assert visible_org_ids(user, 'view_organization') == set()
+    with CaptureQueriesContext(connection) as context:
+        visible_org_ids(user, 'view_organization')
+    assert len(context.captured_queries) == 0  # served from memo
+
+    org_member_rd.give_permission(user, organization)
+    assert visible_org_ids(user, 'view_organization') == {str(organization.pk)}
+
+
+@pytest.mark.django_db
+@override_settings(MANAGE_ORGANIZATION_AUTH=True)
+def test_org_admin_can_change_member(user, organization, org_member_rd, org_admin_rd):
+    alice = User.objects.create(username='alice')
+    org_member_rd.give_permission(alice, organization)
+    assert not can_change_user(user, alice)
+
+    org_admin_rd.give_permission(user, organization)
+    assert can_change_user(user, alice)
+
+
+@pytest.mark.django_db
+def test_visible_users_single_query(user, organization, org_member_rd):
+    org_member_rd.give_permission(user, organization)
+    list(visible_users(user))
+    with CaptureQueriesContext(connection) as context:
+        list(visible_users(user))
+    assert len(context.captured_queries) == 1  # organization lookups are served from memo
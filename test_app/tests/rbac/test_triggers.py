@@ -1,3 +1,4 @@
+from unittest import mock
 from unittest.mock import MagicMock
 
 import pytest
@@ -6,7 +7,7 @@ from django.test.utils import override_settings
 
 from ansible_base.rbac.models import ObjectRole, RoleEvaluation, RoleTeamAssignment, RoleUserAssignment
 from ansible_base.rbac.permission_registry import permission_registry
-from ansible_base.rbac.triggers import dab_post_migrate, post_migration_rbac_setup
+from ansible_base.rbac.triggers import dab_post_migrate, defer_recompute, post_migration_rbac_setup
 from test_app.models import Inventory, Organization
 
 
@@ -19,6 +20,42 @@ def test_post_migrate_signals():
     mck.ad_hoc_func.assert_called_once_with(sender=apps.get_app_config('dab_rbac'), signal=dab_post_migrate)
 
 
+@pytest.mark.django_db
+def test_defer_recompute_nested(rando, organization, inventory, org_inv_rd, inv_rd):
+    with mock.patch('ansible_base.rbac.triggers.compute_object_role_permissions') as compute:
+        with defer_recompute():
+            org_inv_rd.give_permission(rando, organization)
+            with defer_recompute():
+                inv_rd.give_permission(rando, inventory)
+            compute.assert_not_called()
+        compute.assert_called_once()
+        assert set(compute.call_args.kwargs['object_roles']) == set(ObjectRole.objects.filter(users=rando))
+
+
+@pytest.mark.django_db
+def test_defer_recompute_applies_on_exit(rando, inventory, org_inv_rd):
+    with defer_recompute():
+        org_inv_rd.give_permission(rando, inventory.organization)
+        assert not rando.has_obj_perm(inventory, 'change')
+    assert rando.has_obj_perm(inventory, 'change')
+
+
+@pytest.mark.django_db
+def test_defer_recompute_not_applied_on_error(rando, inventory, org_inv_rd, inv_rd):
+    with mock.patch('ansible_base.rbac.triggers.compute_object_role_permissions') as compute:
+        with pytest.raises(ValueError):
+            with defer_recompute():
+                org_inv_rd.give_permission(rando, inventory.organization)
+                raise ValueError('boom')
+        compute.assert_not_called()
+        # The assignment was rolled back with the context
+        assert not RoleUserAssignment.objects.filter(user=rando).exists()
+
+        # The state was reset, later assignments are recomputed immediately
+        inv_rd.give_permission(rando, inventory)
+        compute.assert_called_once()
+
+
 @pytest.mark.django_db
 def test_change_parent_field(team, rando, inventory, org_inv_rd, member_rd):
     member_rd.give_permission(rando, team)
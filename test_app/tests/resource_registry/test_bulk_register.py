@@ -0,0 +1,111 @@
+from unittest import mock
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ansible_base.resource_registry.models import Resource, ResourceChange, ReverseSyncEntry
+from test_app.models import Organization, Team, User
+
+
+def count_queries(func):
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    return len(queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_bulk_create_registers_resources():
+    orgs = Organization.objects.bulk_create([Organization(name=f'bulk-{i}') for i in range(5)])
+    resources = Resource.objects.filter(object_id__in=[str(org.pk) for org in orgs], content_type__model='organization')
+    assert sorted(resources.values_list('name', flat=True)) == [f'bulk-{i}' for i in range(5)]
+    assert Organization.objects.get(pk=orgs[0].pk).resource.name == 'bulk-0'
+    # The resources are created with their hash, like the ones of saved objects
+    for resource in resources:
+        assert resource.resource_hash == resource.compute_resource_hash()
+
+
+@pytest.mark.django_db
+def test_bulk_create_constant_queries(organization):
+    def create(count, prefix):
+        return lambda: Team.objects.bulk_create([Team(name=f'{prefix}-{i}', organization=organization) for i in range(count)])
+
+    create(1, 'warm up')()  # loads the resource type
+    assert count_queries(create(5, 'few')) == count_queries(create(50, 'many'))
+    assert Resource.objects.filter(content_type__model='team').count() == 56
+
+
+@pytest.mark.django_db
+def test_bulk_update_updates_resources(organization):
+    Resource.objects.filter(pk=organization.resource.pk).update(resource_hash='stale')
+    organization.name = 'renamed'
+    Organization.objects.bulk_update([organization], ['name'])
+    resource = Resource.objects.get(pk=organization.resource.pk)
+    assert resource.name == 'renamed'
+    assert resource.resource_hash == resource.compute_resource_hash()
+
+
+@pytest.mark.django_db
+def test_bulk_register_unchanged(organization):
+    teams = Team.objects.bulk_create([Team(name=f'bulk-{i}', organization=organization) for i in range(3)])
+    last_change = ResourceChange.objects.order_by('id').last()
+
+    assert Resource.objects.bulk_register(teams) == []
+    assert ResourceChange.objects.order_by('id').last() == last_change
+
+    teams[0].description = 'changed'
+    Team.objects.bulk_update(teams, ['description'])
+    assert ResourceChange.objects.filter(pk__gt=last_change.pk).count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_register(organization):
+    users = User.objects.bulk_create([User(username=f'bulk-user-{i}') for i in range(3)])
+    assert not Resource.objects.filter(content_type__model='user', object_id__in=[str(user.pk) for user in users]).exists()
+
+    # Resources of unchanged objects are left alone
+    Organization.objects.filter(pk=organization.pk).update(name='renamed')
+    organization.name = 'renamed'
+    resources = Resource.objects.bulk_register([*users, organization], batch_size=2)
+    assert len(resources) == 4
+    assert sorted(Resource.objects.filter(content_type__model='user', object_id__in=[str(user.pk) for user in users]).values_list('name', flat=True)) == [
+        f'bulk-user-{i}' for i in range(3)
+    ]
+
+    # Registering again updates the same resources
+    ansible_ids = {resource.ansible_id for resource in resources}
+    assert {resource.ansible_id for resource in Resource.objects.bulk_register(users)} <= ansible_ids
+
+
+@pytest.mark.django_db
+def test_bulk_register_reverse_sync_outbox(settings, enable_reverse_sync, system_user, organization):
+    settings.RESOURCE_SERVER_SYNC_OUTBOX = True
+    with enable_reverse_sync():
+        teams = Team.objects.bulk_create([Team(name=f'bulk-{i}', organization=organization) for i in range(3)], reverse_sync=True)
+        for team in teams:
+            team.description = 'changed'
+        # The resource server does not own the teams yet, but their creates are pending in the outbox
+        Team.objects.bulk_update(teams, ['description'], reverse_sync=True)
+
+    entries = list(ReverseSyncEntry.objects.values_list('action', 'resource_type', 'ansible_id'))
+    team_ansible_ids = [Resource.get_resource_for_object(team).ansible_id for team in teams]
+    assert entries == [('create', 'shared.team', ansible_id) for ansible_id in team_ansible_ids] + [
+        ('update', 'shared.team', ansible_id) for ansible_id in team_ansible_ids
+    ]
+    assert ReverseSyncEntry.objects.last().resource_data['description'] == 'changed'
+
+
+@pytest.mark.django_db
+def test_bulk_register_reverse_sync(enable_reverse_sync):
+    with enable_reverse_sync():
+        with mock.patch('ansible_base.resource_registry.utils.sync_to_resource_server.get_resource_server_client') as get_resource_server_client:
+            Organization.objects.bulk_create([Organization(name=f'bulk-{i}') for i in range(2)], reverse_sync=True)
+            Organization.objects.bulk_create([Organization(name='not-synced')])
+    assert get_resource_server_client.return_value.create_resource.call_count == 2
+
+
+@pytest.mark.django_db
+def test_bulk_register_reverse_sync_disabled():
+    with mock.patch('ansible_base.resource_registry.utils.sync_to_resource_server.sync_to_resource_server') as sync_to_resource_server:
+        Organization.objects.bulk_create([Organization(name='bulk')], reverse_sync=True)
+    sync_to_resource_server.assert_not_called()
@@ -1,10 +1,28 @@
+import json
+import threading
 from pathlib import Path
+from unittest import mock
+from uuid import uuid4
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from ansible_base.activitystream.models import Entry
 from ansible_base.lib.testing.util import StaticResourceAPIClient
 from ansible_base.lib.utils.response import get_relative_url
-from ansible_base.resource_registry.tasks.sync import ResourceSyncHTTPError, SyncExecutor
+from ansible_base.resource_registry.models import Resource, ResourceType
+from ansible_base.resource_registry.tasks.sync import (
+    ManifestItem,
+    ResourceSyncHTTPError,
+    SyncExecutor,
+    SyncResult,
+    SyncStatus,
+    find_orphan_resources,
+    iter_manifest,
+    prefetch_resources,
+)
+from test_app.models import Organization, User
 
 
 @pytest.fixture(scope="function")
@@ -14,10 +32,13 @@ def static_api_client():
     current_directory = current_file_path.parent
     service_url = current_directory.parent / "fixtures"
     service_path = "/static/resource_sync/"
-    return StaticResourceAPIClient(
+    client = StaticResourceAPIClient(
         service_url=str(service_url),
         service_path=str(service_path),
     )
+    # router is a class attribute, routes set by a test must not leak into the next ones
+    client.router = {}
+    return client
 
 
 @pytest.fixture
@@ -119,3 +140,211 @@ def test_noop_existing_resource(admin_api_client, static_api_client, stdout):
     assert len(executor.results["noop"]) == 1
     assert 'NOOP 97447387-8596-404f-b0d0-6429b04c8d22' in stdout.lines
     assert any('Skipped 1' in line for line in stdout.lines)
+
+
+def test_iter_manifest_batches(static_api_client):
+    rows = [f"{uuid4()},{i:064x}" for i in range(5)]
+    static_api_client.router["resource-types/shared.user/manifest/"] = {
+        "status_code": 200,
+        "content": "\r\n".join(["ansible_id,resource_hash", *rows, ""]).encode(),
+    }
+    batches = list(iter_manifest("shared.user", api_client=static_api_client, batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [f"{item.ansible_id},{item.resource_hash}" for batch in batches for item in batch] == rows
+    assert batches[0][0].service_id == "57592fbc-7ecb-405f-9f5f-ebad20932d38"  # from fixtures/static/metadata
+
+
+def test_iter_manifest_does_not_change_client(static_api_client):
+    static_api_client.raise_if_bad_request = True
+    assert len(list(iter_manifest("shared.user", api_client=static_api_client))) == 1
+    # Clients are shared, reverse sync expects this one to keep raising
+    assert static_api_client.raise_if_bad_request is True
+    assert SyncExecutor(api_client=static_api_client).api_client.raise_if_bad_request is False
+    assert static_api_client.raise_if_bad_request is True
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('manifest_order', ['sorted', 'unsorted'])
+def test_find_orphan_resources(manifest_order):
+    remote_service_id = str(uuid4())
+    orgs = [Organization.objects.create(name=f'orphan-{i}') for i in range(6)]
+    Resource.objects.filter(object_id__in=[str(org.pk) for org in orgs], content_type__resource_type__name='shared.organization').update(
+        service_id=remote_service_id
+    )
+    local_ansible_ids = sorted(str(org.resource.ansible_id) for org in orgs)
+
+    # The manifest has a resource which is not local yet, and misses three of the local ones
+    listed = [local_ansible_ids[1], local_ansible_ids[3], local_ansible_ids[4], str(uuid4())]
+    if manifest_order == 'sorted':
+        listed.sort()
+    else:
+        listed.sort(reverse=True)
+    manifest_batches = [
+        [ManifestItem(ansible_id=ansible_id, resource_hash='', service_id=remote_service_id) for ansible_id in listed[i : i + 2]] for i in (0, 2)
+    ]
+
+    orphans = find_orphan_resources('shared.organization', manifest_batches, chunk_size=2)
+    assert sorted(str(resource.ansible_id) for resource in orphans) == [local_ansible_ids[0], local_ansible_ids[2], local_ansible_ids[5]]
+
+
+@pytest.mark.django_db
+def test_resource_sync_without_keeping_results(static_api_client, stdout):
+    executor = SyncExecutor(api_client=static_api_client, stdout=stdout, window_size=1, keep_results=False)
+    executor.run()
+    assert 'CREATED 97447387-8596-404f-b0d0-6429b04c8d22 theceo' in stdout.lines
+    assert any('Created 1' in line for line in stdout.lines)
+    assert not executor.results["created"]
+
+
+@pytest.fixture
+def bulk_resources(static_api_client):
+    "Serves the fixture resources from the resource list, as a server with include_resource_data does"
+    resources_dir = Path(static_api_client.base_url) / "resources"
+    results = [json.loads((path / "response").read_text()) for path in sorted(resources_dir.iterdir())]
+    static_api_client.router["resources/"] = {"status_code": 200, "content": json.dumps({"count": len(results), "results": results}).encode()}
+    return results
+
+
+@pytest.mark.django_db
+def test_resource_sync_reads_resources_in_bulk(static_api_client, bulk_resources, stdout):
+    with mock.patch.object(static_api_client, 'get_resource') as get_resource:
+        executor = SyncExecutor(api_client=static_api_client, stdout=stdout)
+        executor.run()
+    get_resource.assert_not_called()
+    assert 'CREATED 3e3cc6a4-72fa-43ec-9e17-76ae5a3846ca Serious Company' in stdout.lines
+    assert 'CREATED 97447387-8596-404f-b0d0-6429b04c8d22 theceo' in stdout.lines
+
+
+@pytest.mark.django_db
+def test_resource_sync_buffers_activity_stream(system_user, static_api_client, bulk_resources, stdout, django_capture_on_commit_callbacks):
+    with CaptureQueriesContext(connection) as captured:
+        with django_capture_on_commit_callbacks(execute=True):
+            SyncExecutor(api_client=static_api_client, stdout=stdout).run()
+    created_users = [line for line in stdout.lines if line.startswith('CREATED') and 'theceo' in line]
+    assert created_users
+    # The entries of the window of users are written with one insert
+    inserts = [query for query in captured.captured_queries if query['sql'].startswith('INSERT INTO "dab_activitystream_entry"')]
+    assert len(inserts) == 1
+    assert Entry.objects.filter(content_type__model='user', object_id=str(User.objects.get(username='theceo').pk), operation='create').exists()
+
+
+@pytest.mark.django_db
+def test_prefetch_resources(static_api_client, bulk_resources, django_assert_num_queries):
+    items = [ManifestItem(ansible_id=resource["ansible_id"], resource_hash="", service_id=resource["service_id"]) for resource in bulk_resources]
+    with django_assert_num_queries(1):
+        prefetched = prefetch_resources(items, static_api_client)
+    assert prefetched.local == {}
+    assert set(prefetched.remote) == {resource["ansible_id"] for resource in bulk_resources}
+
+
+@pytest.mark.django_db
+def test_prefetch_resources_unsupported(static_api_client, stdout):
+    # Servers without include_resource_data reject it as an unknown filter
+    static_api_client.router["resources/"] = {"status_code": 400, "content": b'{"detail": "invalid filter"}'}
+    items = [ManifestItem(ansible_id="97447387-8596-404f-b0d0-6429b04c8d22", resource_hash="", service_id="57592fbc-7ecb-405f-9f5f-ebad20932d38")]
+    assert prefetch_resources(items, static_api_client).remote == {}
+
+    executor = SyncExecutor(api_client=static_api_client, stdout=stdout)
+    executor.run()
+    assert 'CREATED 97447387-8596-404f-b0d0-6429b04c8d22 theceo' in stdout.lines
+
+
+@pytest.mark.django_db(transaction=True)
+def test_resource_sync_with_workers(static_api_client, bulk_resources, stdout):
+    executor = SyncExecutor(api_client=static_api_client, stdout=stdout, workers=2)
+    executor.run()
+    assert 'Processing resources in windows of 1000 with 2 workers.' in stdout.lines
+    assert 'CREATED 3e3cc6a4-72fa-43ec-9e17-76ae5a3846ca Serious Company' in stdout.lines
+    assert 'CREATED 97447387-8596-404f-b0d0-6429b04c8d22 theceo' in stdout.lines
+    assert Resource.objects.filter(ansible_id='97447387-8596-404f-b0d0-6429b04c8d22').exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('use_asyncio', [False, True])
+def test_resource_sync_workers_split_windows(static_api_client, stdout, use_asyncio):
+    ansible_ids = [str(uuid4()) for i in range(6)]
+    static_api_client.router["resource-types/shared.user/manifest/"] = {
+        "status_code": 200,
+        "content": "\r\n".join(["ansible_id,resource_hash", *[f"{ansible_id},{'0' * 64}" for ansible_id in sorted(ansible_ids)], ""]).encode(),
+    }
+    threads = {}
+    # Windows of 4 then 2 items are split in two halves, which only pass the barrier if they run concurrently
+    barrier = threading.Barrier(2, timeout=10)
+
+    def fake_resource_sync(manifest_item, api_client=None, prefetched=None):
+        threads[manifest_item.ansible_id] = threading.current_thread().name
+        barrier.wait()
+        return SyncResult(SyncStatus.NOOP, manifest_item)
+
+    with mock.patch('ansible_base.resource_registry.tasks.sync.resource_sync', side_effect=fake_resource_sync):
+        executor = SyncExecutor(api_client=static_api_client, resource_type_names=["shared.user"], stdout=stdout, window_size=4, workers=2, asyncio=use_asyncio)
+        executor.run()
+
+    assert set(threads) == set(ansible_ids)
+    assert len(set(threads.values())) == 2
+    assert all(name.startswith('resource_sync') for name in threads.values())
+    assert any('Skipped 6' in line for line in stdout.lines)
+    if use_asyncio:
+        assert 'Processing resources in windows of 4 with asyncio executor and 2 workers.' in stdout.lines
+
+
+def serve_changes(static_api_client, cursor, changes=(), name="shared.user"):
+    static_api_client.router[f"resource-types/{name}/changes/"] = {
+        "status_code": 200,
+        "content": json.dumps({"cursor": cursor, "has_more": False, "changes": list(changes)}).encode(),
+    }
+
+
+@pytest.mark.django_db
+def test_resource_sync_saves_changes_cursor(static_api_client, bulk_resources, stdout):
+    serve_changes(static_api_client, 5)
+    executor = SyncExecutor(api_client=static_api_client, resource_type_names=["shared.user"], stdout=stdout)
+    executor.run()
+    assert ResourceType.objects.get(name="shared.user").sync_cursor == 5
+
+
+@pytest.mark.django_db
+def test_delta_resource_sync(admin_api_client, static_api_client, bulk_resources, stdout):
+    response = admin_api_client.post(
+        get_relative_url("resource-list"),
+        {
+            "service_id": "57592fbc-7ecb-405f-9f5f-ebad20932d38",  # from fixtures/static/metadata
+            "resource_type": "shared.user",
+            "resource_data": {"username": "Phi", "last_name": "Lips", "email": "phi@example.com"},
+        },
+        format="json",
+    )
+    assert response.status_code == 201
+    deleted_ansible_id = response.data["ansible_id"]
+    ResourceType.objects.filter(name="shared.user").update(sync_cursor=5)
+    serve_changes(
+        static_api_client,
+        8,
+        [
+            {"sequence": 6, "action": "create", "ansible_id": "97447387-8596-404f-b0d0-6429b04c8d22", "resource_hash": "x"},
+            {"sequence": 7, "action": "update", "ansible_id": deleted_ansible_id, "resource_hash": "y"},
+            {"sequence": 8, "action": "delete", "ansible_id": deleted_ansible_id, "resource_hash": None},
+        ],
+    )
+
+    with mock.patch.object(static_api_client, 'get_resource_type_manifest') as get_resource_type_manifest:
+        executor = SyncExecutor(api_client=static_api_client, resource_type_names=["shared.user"], stdout=stdout, delta=True)
+        executor.run()
+    get_resource_type_manifest.assert_not_called()
+
+    assert 'Processing changes since 5 in windows of 1000 sequentially.' in stdout.lines
+    assert 'CREATED 97447387-8596-404f-b0d0-6429b04c8d22 theceo' in stdout.lines
+    # Deleted on the resource server, even if it was created recently
+    assert 'Deleting 1 orphaned resources' in stdout.lines
+    assert not Resource.objects.filter(ansible_id=deleted_ansible_id).exists()
+    assert ResourceType.objects.get(name="shared.user").sync_cursor == 8
+
+
+@pytest.mark.django_db
+def test_delta_resource_sync_without_changes(static_api_client, stdout):
+    # Resource servers without the changes endpoint are synced from the manifest
+    ResourceType.objects.filter(name="shared.user").update(sync_cursor=5)
+    executor = SyncExecutor(api_client=static_api_client, resource_type_names=["shared.user"], stdout=stdout, delta=True)
+    executor.run()
+    assert 'changes for shared.user NOT FOUND. Syncing the manifest instead.' in stdout.lines
+    assert 'CREATED 97447387-8596-404f-b0d0-6429b04c8d22 theceo' in stdout.lines
@@ -1,7 +1,19 @@
 import csv
+import uuid
+from datetime import timedelta
 from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.utils.timezone import now
 
 from ansible_base.lib.utils.response import get_relative_url
+from ansible_base.resource_registry.models import Resource, ResourceChange, ResourceType
+from ansible_base.resource_registry.shared_types import UserType
+from ansible_base.resource_registry.utils.resource_type_serializers import SharedResourceTypeSerializer
+from ansible_base.resource_registry.views import ResourceTypeViewSet
+from test_app.models import Organization
 
 
 def test_resource_type_list(admin_api_client):
@@ -44,3 +56,181 @@ def test_resource_type_manifest_404(admin_api_client):
     url = get_relative_url("resourcetype-manifest", kwargs={"name": "doesnt.exist"})
     response = admin_api_client.get(url)
     assert response.status_code == 404
+
+
+def get_manifest_rows(client, name="shared.user"):
+    response = client.get(get_relative_url("resourcetype-manifest", kwargs={"name": name}))
+    assert response.status_code == 200
+    data = StringIO("".join(item.decode() for item in response.streaming_content))
+    return {row["ansible_id"]: row["resource_hash"] for row in csv.DictReader(data)}
+
+
+def test_resource_type_manifest_serves_stored_hash(admin_api_client, random_user):
+    with mock.patch.object(SharedResourceTypeSerializer, 'get_hash') as get_hash:
+        rows = get_manifest_rows(admin_api_client)
+    get_hash.assert_not_called()
+    assert rows[str(random_user.resource.ansible_id)] == random_user.resource.resource_hash == UserType(random_user).get_hash()
+
+
+def test_resource_type_manifest_without_stored_hash(admin_api_client, random_user):
+    Resource.objects.filter(pk=random_user.resource.pk).update(resource_hash=None)
+    rows = get_manifest_rows(admin_api_client)
+    assert rows[str(random_user.resource.ansible_id)] == UserType(random_user).get_hash()
+
+
+@pytest.mark.django_db
+def test_backfill_resource_hashes(random_user):
+    Resource.objects.filter(pk=random_user.resource.pk).update(resource_hash=None, hash_updated=None)
+    out = StringIO()
+    call_command('backfill_resource_hashes', 'shared.user', stdout=out)
+    assert 'shared.user: updated 1 resource hashes' in out.getvalue()
+    resource = Resource.objects.get(pk=random_user.resource.pk)
+    assert resource.resource_hash == UserType(random_user).get_hash()
+    assert resource.hash_updated is not None
+
+    # --all recomputes hashes which went stale without signals
+    Resource.objects.filter(pk=random_user.resource.pk).update(resource_hash='stale')
+    call_command('backfill_resource_hashes', '--all', '--batch-size', '1', stdout=out)
+    assert Resource.objects.get(pk=random_user.resource.pk).resource_hash == UserType(random_user).get_hash()
+
+
+def test_resource_type_manifest_chunks(admin_api_client, django_user_model):
+    users = [django_user_model.objects.create(username=f'chunked-{i}') for i in range(5)]
+    # Two of them have to be serialized, their content objects are loaded per chunk
+    Resource.objects.filter(object_id__in=[str(users[1].pk), str(users[2].pk)], content_type__resource_type__name='shared.user').update(resource_hash=None)
+    expected = get_manifest_rows(admin_api_client)
+
+    with mock.patch.object(ResourceTypeViewSet, 'manifest_chunk_size', 2):
+        rows = get_manifest_rows(admin_api_client)
+    assert rows == expected
+    for user in users:
+        assert rows[str(user.resource.ansible_id)] == UserType(user).get_hash()
+
+
+@pytest.mark.django_db
+def test_benchmark_manifest_memory_command():
+    out = StringIO()
+    call_command('benchmark_manifest_memory', sizes=[3, 6], stdout=out)
+    lines = [line.split() for line in out.getvalue().splitlines()[1:]]
+    assert [(line[0], line[1]) for line in lines] == [('3', 'missing'), ('3', 'stored'), ('6', 'missing'), ('6', 'stored')]
+    # Everything the benchmark created is rolled back
+    assert not Resource.objects.filter(name__startswith='manifest-benchmark-').exists()
+
+
+def get_changes(client, since=None, name="shared.organization", **params):
+    if since is not None:
+        params["since"] = since
+    response = client.get(get_relative_url("resourcetype-changes", kwargs={"name": name}), params)
+    assert response.status_code == 200
+    return response.data
+
+
+@pytest.fixture
+def settled(settings):
+    settings.RESOURCE_CHANGES_SETTLE_SECONDS = 0
+    # Rolled back tests leave holes in the sequences of some databases
+    settings.RESOURCE_CHANGES_GAP_SECONDS = 0
+
+
+@pytest.mark.django_db
+def test_resource_changes_recorded(organization):
+    resource = organization.resource
+    create = ResourceChange.objects.get(pk=resource.change_sequence)
+    assert (create.action, create.ansible_id) == ('create', resource.ansible_id)
+
+    # Saving without changing the shared data is not a change
+    organization.save()
+    assert Resource.objects.get(pk=resource.pk).change_sequence == create.pk
+
+    organization.name = 'renamed'
+    organization.save()
+    update = ResourceChange.objects.get(pk=Resource.objects.get(pk=resource.pk).change_sequence)
+    assert update.action == 'update'
+
+    organization.delete()
+    assert ResourceChange.objects.filter(ansible_id=resource.ansible_id).last().action == 'delete'
+
+
+def test_resource_type_changes(admin_api_client, settled, organization):
+    cursor = get_changes(admin_api_client)["cursor"]
+    assert cursor == organization.resource.change_sequence
+    assert get_changes(admin_api_client, since=cursor) == {"cursor": cursor, "has_more": False, "changes": []}
+
+    organization.name = 'renamed'
+    organization.save()
+    other = Organization.objects.create(name='other')
+    other_ansible_id = other.resource.ansible_id
+    other.delete()
+
+    data = get_changes(admin_api_client, since=cursor, limit=1)
+    assert data["has_more"] is True
+    (change,) = data["changes"]
+    assert (change["action"], change["ansible_id"]) == ('update', organization.resource.ansible_id)
+    assert change["resource_hash"] == Resource.objects.get(pk=organization.resource.pk).resource_hash
+
+    data = get_changes(admin_api_client, since=data["cursor"])
+    assert data["has_more"] is False
+    # The create of a resource deleted since is listed as deleted, followed by its tombstone
+    assert [(change["action"], change["ansible_id"], change["resource_hash"]) for change in data["changes"]] == [
+        ('delete', other_ansible_id, None),
+        ('delete', other_ansible_id, None),
+    ]
+    assert get_changes(admin_api_client, since=data["cursor"])["changes"] == []
+
+
+def test_resource_type_changes_settle(admin_api_client, organization):
+    # Changes are only listed once they are older than RESOURCE_CHANGES_SETTLE_SECONDS
+    cursor = get_changes(admin_api_client)["cursor"]
+    assert cursor < organization.resource.change_sequence
+    assert get_changes(admin_api_client, since=cursor)["changes"] == []
+
+
+def test_resource_type_changes_held_below_hole(admin_api_client, settled, settings, organization):
+    # The changes after a hole are not listed until the change following it is older than RESOURCE_CHANGES_GAP_SECONDS
+    settings.RESOURCE_CHANGES_GAP_SECONDS = 600
+    cursor = get_changes(admin_api_client)["cursor"]
+    pending = Organization.objects.create(name='pending')
+    Organization.objects.create(name='committed')
+    # As if the transaction creating the first organization was still running
+    ResourceChange.objects.filter(pk=pending.resource.change_sequence).delete()
+
+    assert get_changes(admin_api_client)["cursor"] == cursor
+    assert get_changes(admin_api_client, since=cursor) == {"cursor": cursor, "has_more": False, "changes": []}
+
+    ResourceChange.objects.update(changed=now() - timedelta(minutes=11))
+    data = get_changes(admin_api_client, since=cursor)
+    assert [change["action"] for change in data["changes"]] == ['create']
+    assert data["cursor"] == Resource.objects.get(name='committed').change_sequence
+
+
+def test_create_resource_changes_given_ansible_id(admin_api_client, settled):
+    # The create is listed with the ansible_id given, not the one generated before it
+    cursor = get_changes(admin_api_client)["cursor"]
+    ansible_id = str(uuid.uuid4())
+    Resource.create_resource(ResourceType.objects.get(name="shared.organization"), {"name": "given"}, ansible_id=ansible_id)
+    changes = get_changes(admin_api_client, since=cursor)["changes"]
+    assert [(change["action"], str(change["ansible_id"])) for change in changes] == [('create', ansible_id)]
+
+
+@pytest.mark.django_db
+def test_assign_ids_of_listed_resource(organization):
+    # Once the resource may have been listed, it is deleted under the old ansible_id and created under the new one
+    ResourceChange.objects.update(changed=now() - timedelta(minutes=5))
+    resource = organization.resource
+    old_ansible_id, new_ansible_id = resource.ansible_id, uuid.uuid4()
+    resource.assign_ids(ansible_id=new_ansible_id)
+    resource.save()
+    changes = ResourceChange.objects.filter(ansible_id__in=[old_ansible_id, new_ansible_id])
+    assert list(changes.values_list('action', 'ansible_id')) == [('create', old_ansible_id), ('delete', old_ansible_id), ('create', new_ansible_id)]
+    assert Resource.objects.get(pk=resource.pk).change_sequence == changes.last().pk
+
+
+@pytest.mark.django_db
+def test_prune_resource_changes(organization):
+    old = ResourceChange.objects.update(changed=now() - timedelta(days=31))
+    organization.name = 'renamed'
+    organization.save()
+    out = StringIO()
+    call_command('prune_resource_changes', stdout=out)
+    assert f'Deleted {old} resource changes' in out.getvalue()
+    assert list(ResourceChange.objects.values_list('action', flat=True)) == ['update']
@@ -3,12 +3,14 @@ from unittest.mock import patch
 
 import pytest
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from ansible_base.authentication.models import AuthenticatorUser
 from ansible_base.lib.utils.response import get_relative_url
 from ansible_base.resource_registry.models import Resource
 from ansible_base.resource_registry.utils.resource_type_processor import ResourceTypeProcessor
-from test_app.models import EncryptionModel, Organization
+from test_app.models import EncryptionModel, Organization, Team
 from test_app.resource_api import APIConfig
 
 
@@ -448,3 +450,31 @@ def test_user_social_auth_exception(admin_api_client, django_user_model, saml_au
         with expected_log('ansible_base.resource_registry.utils.sso_provider.logger', 'warning', "Failed to parse server url from"):
             resp = admin_api_client.get(url)
             assert resp.status_code == 200
+
+
+@pytest.mark.parametrize('include_resource_data', [False, True])
+def test_resource_list_constant_queries(admin_api_client, organization, include_resource_data):
+    url = get_relative_url("resource-list") + "?content_type__resource_type__name__in=shared.team,shared.organization&page_size=100"
+    if include_resource_data:
+        url += "&include_resource_data=true"
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as queries:
+            resp = admin_api_client.get(url)
+        assert resp.status_code == 200
+        return len(queries.captured_queries), resp.data['results']
+
+    Team.objects.create(name='team-0', organization=organization)
+    count_queries()  # warm up the caches of the request
+    few, _ = count_queries()
+    for i in range(1, 10):
+        Team.objects.create(name=f'team-{i}', organization=organization)
+    many, results = count_queries()
+    assert few == many
+
+    teams = [result for result in results if result['resource_type'] == 'shared.team']
+    assert len(teams) == 10
+    if include_resource_data:
+        assert {team['resource_data']['organization'] for team in teams} == {str(organization.resource.ansible_id)}
+    else:
+        assert 'resource_data' not in teams[0]
@@ -134,6 +134,20 @@ def test_list_resources(resource_client, organization):
     assert resp.json()["results"][0]["ansible_id"] == ansible_id
     assert resp.json()["results"][0]["is_partially_migrated"] is False
     assert "additional_data" not in resp.json()["results"][0]
+    assert "resource_data" not in resp.json()["results"][0]
+
+
+@pytest.mark.django_db
+def test_get_resources(resource_client, organization, admin_user):
+    ansible_ids = [str(organization.resource.ansible_id), str(admin_user.resource.ansible_id)]
+    resp = resource_client.get_resources(ansible_ids)
+
+    assert resp.status_code == 200
+    results = {resource["ansible_id"]: resource for resource in resp.json()["results"]}
+    assert set(results) == set(ansible_ids)
+    assert results[ansible_ids[0]]["resource_type"] == "shared.organization"
+    assert results[ansible_ids[0]]["resource_data"]["name"] == organization.name
+    assert results[ansible_ids[1]]["resource_data"]["username"] == admin_user.username
 
 
 @pytest.mark.django_db
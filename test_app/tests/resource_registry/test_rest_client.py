@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from ansible_base.resource_registry import rest_client
+from ansible_base.resource_registry.rest_client import ResourceAPIClient, clear_resource_server_clients, get_resource_server_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.fail_next > 0:
+            self.server.fail_next -= 1
+            status, body = 503, b'{"detail": "unavailable"}'
+        else:
+            status, body = 200, json.dumps({"service_id": "stub"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.connections = server.requests = server.fail_next = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub_client(stub_server, settings):
+    settings.RESOURCE_SERVER = {
+        "URL": f"http://127.0.0.1:{stub_server.server_address[1]}",
+        "SECRET_KEY": "stub-secret",
+        "VALIDATE_HTTPS": False,
+        "RETRY_BACKOFF": 0,
+    }
+    clear_resource_server_clients()
+    yield get_resource_server_client("/api/v1/service-index/", jwt_user_id=None)
+    clear_resource_server_clients()
+
+
+@pytest.mark.django_db
+def test_connection_reused(stub_server, stub_client):
+    for i in range(5):
+        assert stub_client.get_service_metadata().status_code == 200
+    assert stub_server.requests == 5
+    assert stub_server.connections == 1
+
+
+@pytest.mark.django_db
+def test_idempotent_request_retried(stub_server, stub_client):
+    stub_server.fail_next = 2
+    resp = stub_client.get_service_metadata()
+    assert resp.status_code == 200
+    assert stub_server.requests == 3
+
+
+@pytest.mark.django_db
+def test_retries_exhausted(stub_server, stub_client):
+    stub_server.fail_next = 10
+    resp = stub_client.get_service_metadata()
+    assert resp.status_code == 503
+    assert stub_server.requests == 4  # the request and 3 retries by default
+
+
+@pytest.mark.django_db
+def test_client_cache(stub_client, settings):
+    assert get_resource_server_client("/api/v1/service-index/", jwt_user_id=None) is stub_client
+    assert stub_client.timeout == 30
+
+    other_user = get_resource_server_client("/api/v1/service-index/", jwt_user_id="97447387-8596-404f-b0d0-6429b04c8d22")
+    assert other_user is not stub_client
+    assert other_user.jwt_user_id == "97447387-8596-404f-b0d0-6429b04c8d22"
+    # Clients share the session, and its connection pool
+    assert other_user.session is stub_client.session
+
+    settings.RESOURCE_SERVER = {**settings.RESOURCE_SERVER, "SECRET_KEY": "rotated"}
+    assert get_resource_server_client("/api/v1/service-index/", jwt_user_id=None) is not stub_client
+
+
+def test_client_session_per_thread(stub_client):
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(stub_client.session))
+    thread.start()
+    thread.join()
+    assert sessions[0] is not stub_client.session
+    assert stub_client.session is stub_client.session
+
+    # The session of the finished thread is dropped with the next new session
+    thread = threading.Thread(target=lambda: stub_client.session)
+    thread.start()
+    thread.join()
+    assert not any(session is sessions[0] for session in rest_client._sessions.values())
+
+
+@pytest.mark.django_db
+def test_client_cache_bounded(stub_client, monkeypatch):
+    monkeypatch.setattr(rest_client, "CLIENT_CACHE_SIZE", 2)
+    for user_id in ("a", "b", "c"):
+        get_resource_server_client("/api/v1/service-index/", jwt_user_id=user_id)
+    assert len(rest_client._clients) == 2
+
+
+def test_client_jwt_refreshed(settings):
+    settings.RESOURCE_SERVER = {"URL": "http://127.0.0.1", "SECRET_KEY": "stub-secret"}
+    client = ResourceAPIClient("http://127.0.0.1", "/api/v1/service-index/", jwt_expiration=60)
+    token = client.jwt
+    with mock.patch.object(client, 'refresh_jwt', wraps=client.refresh_jwt) as refresh_jwt:
+        assert client.jwt == token
+        refresh_jwt.assert_not_called()
+
+        # Cached clients keep refreshing the token once it expires
+        client._jwt_timeout = time.time() - 1
+        client.jwt
+        refresh_jwt.assert_called_once_with()
+    assert client._jwt_timeout > time.time()
@@ -0,0 +1,207 @@
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from crum import impersonate
+from django.core.management import call_command
+from django.utils import timezone
+from requests import HTTPError, Response
+
+from ansible_base.resource_registry.models import Resource, ResourceChange, ReverseSyncEntry, service_id
+from ansible_base.resource_registry.tasks.reverse_sync import coalesce_entries, dispatch_outbox, outbox_dispatch
+from test_app.models import Organization
+
+utils_path = 'ansible_base.resource_registry.utils.sync_to_resource_server'
+reverse_sync_path = 'ansible_base.resource_registry.tasks.reverse_sync'
+
+
+@pytest.fixture
+def outbox(settings, enable_reverse_sync, system_user):
+    "Enables the outbox, after the system user which would otherwise be created and synced by the first change"
+    settings.RESOURCE_SERVER_SYNC_OUTBOX = True
+    settings.RESOURCE_SERVER_OUTBOX_RETRY_BACKOFF = 60
+    with enable_reverse_sync():
+        with mock.patch(f'{utils_path}.get_resource_server_client') as sync_client:
+            yield
+    # Changes are never sent from the request
+    sync_client.assert_not_called()
+
+
+@pytest.fixture
+def resource_server():
+    "Client for the dispatcher, creates answer with a new service_id"
+    with mock.patch(f'{reverse_sync_path}.get_resource_server_client') as get_resource_server_client:
+        client = get_resource_server_client.return_value
+        client.create_resource.side_effect = lambda body: mock.Mock(json=lambda: {'service_id': str(uuid.uuid4()), 'ansible_id': body.ansible_id})
+        yield client
+
+
+def make_entry(action, ansible_id, name='org'):
+    return ReverseSyncEntry(action=action, ansible_id=ansible_id, resource_type='shared.organization', resource_data={'name': name})
+
+
+@pytest.mark.parametrize(
+    'actions, expected',
+    [
+        (['create', 'update', 'update'], 'create'),
+        (['update', 'update'], 'update'),
+        (['update', 'delete'], 'delete'),
+        (['create', 'update', 'delete'], None),
+        (['update', 'create'], 'create'),
+    ],
+)
+def test_coalesce_entries(actions, expected):
+    ansible_id = uuid.uuid4()
+    entries = [make_entry(action, ansible_id, name=str(i)) for i, action in enumerate(actions)]
+    (delivery,) = coalesce_entries(entries)
+    assert delivery.action == expected
+    assert delivery.entries == entries
+    assert delivery.latest.resource_data == {'name': str(len(actions) - 1)}
+
+
+def test_coalesce_entries_order():
+    first, second = uuid.uuid4(), uuid.uuid4()
+    entries = [
+        make_entry('create', first),
+        make_entry('create', second),
+        make_entry('update', first),
+        make_entry('delete', second),
+        make_entry('create', second),
+    ]
+    deliveries = coalesce_entries(entries)
+    assert [(d.first.ansible_id, d.action, len(d.entries)) for d in deliveries] == [(first, 'create', 2), (second, None, 2)]
+
+
+@pytest.mark.django_db
+def test_changes_written_to_outbox(user, outbox):
+    with impersonate(user):
+        org = Organization.objects.create(name='Hello')
+        org.name = 'World'
+        org.save()
+        ansible_id = org.resource.ansible_id
+        org.delete()
+
+    entries = list(ReverseSyncEntry.objects.values_list('action', 'ansible_id', 'jwt_user_id'))
+    assert entries == [(action, ansible_id, user.resource.ansible_id) for action in ('create', 'update', 'delete')]
+    assert ReverseSyncEntry.objects.first().resource_data['name'] == 'Hello'
+
+
+@pytest.mark.django_db
+def test_local_update_not_written_to_outbox(organization, outbox):
+    organization.name = 'World'
+    organization.save()
+    assert not ReverseSyncEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_dispatch_coalesces_create(outbox, resource_server):
+    org = Organization.objects.create(name='Hello')
+    org.name = 'World'
+    org.save()
+    server_ansible_id = str(uuid.uuid4())
+    resource_server.create_resource.side_effect = lambda body: mock.Mock(json=lambda: {'service_id': str(uuid.uuid4()), 'ansible_id': server_ansible_id})
+
+    record = dispatch_outbox()
+
+    resource_server.create_resource.assert_called_once()
+    assert resource_server.create_resource.call_args.args[0].resource_data['name'] == 'World'
+    assert (record.delivered, record.coalesced, record.queue_depth) == (1, 1, 0)
+    assert len(record.latencies) == 1
+    resource = Resource.get_resource_for_object(org)
+    assert str(resource.ansible_id) == server_ansible_id
+    assert str(resource.service_id) != service_id()
+    # The changes not listed yet are recorded under the ids of the resource server
+    changes = ResourceChange.objects.filter(content_type=resource.content_type)
+    assert {(str(change.ansible_id), change.service_id) for change in changes} == {(server_ansible_id, resource.service_id)}
+
+    # The resource is owned by the resource server now, and later changes are updates
+    org.refresh_from_db()
+    org.name = 'Again'
+    org.save()
+    assert ReverseSyncEntry.objects.get().action == 'update'
+    dispatch_outbox()
+    resource_server.update_resource.assert_called_once()
+    assert resource_server.update_resource.call_args.args[0] == server_ansible_id
+
+
+@pytest.mark.django_db
+def test_dispatch_create_and_delete(outbox, resource_server):
+    Organization.objects.create(name='Hello').delete()
+    record = dispatch_outbox()
+    resource_server.create_resource.assert_not_called()
+    resource_server.delete_resource.assert_not_called()
+    assert (record.delivered, record.coalesced, record.queue_depth) == (0, 2, 0)
+
+
+@pytest.mark.django_db
+def test_dispatch_in_order(outbox, resource_server):
+    orgs = [Organization.objects.create(name=f'org-{i}') for i in range(3)]
+    dispatch_outbox(batch_size=2)
+    sent = [call.args[0].resource_data['name'] for call in resource_server.create_resource.call_args_list]
+    assert sent == [org.name for org in orgs]
+
+
+@pytest.mark.django_db
+def test_dispatch_retry(outbox, resource_server):
+    failing = Organization.objects.create(name='failing')
+    other = Organization.objects.create(name='other')
+    resource_server.create_resource.side_effect = [HTTPError('gateway unavailable'), mock.Mock(json=lambda: None)]
+
+    record = dispatch_outbox()
+    assert (record.delivered, record.failed, record.queue_depth) == (1, 1, 1)
+    entry = ReverseSyncEntry.objects.get()
+    assert entry.ansible_id == failing.resource.ansible_id
+    assert entry.attempts == 1
+    assert entry.last_error == 'gateway unavailable'
+    assert entry.next_attempt > timezone.now()
+    assert not ReverseSyncEntry.objects.filter(ansible_id=other.resource.ansible_id).exists()
+
+    # Later changes of the resource wait for the failed entry
+    failing.name = 'still failing'
+    failing.save()
+    dispatch_outbox()
+    assert resource_server.create_resource.call_count == 2
+    assert ReverseSyncEntry.objects.count() == 2
+
+    ReverseSyncEntry.objects.update(next_attempt=timezone.now() - timedelta(seconds=1))
+    resource_server.create_resource.side_effect = None
+    resource_server.create_resource.return_value.json.return_value = None
+    record = dispatch_outbox()
+    assert resource_server.create_resource.call_args.args[0].resource_data['name'] == 'still failing'
+    assert (record.delivered, record.coalesced, record.queue_depth) == (1, 1, 0)
+
+
+@pytest.mark.django_db
+def test_dispatch_delete_already_gone(resource_server):
+    ReverseSyncEntry.objects.create(action='delete', ansible_id=uuid.uuid4(), resource_type='shared.organization')
+    response = Response()
+    response.status_code = 404
+    resource_server.delete_resource.side_effect = HTTPError(response=response)
+    record = dispatch_outbox()
+    assert (record.delivered, record.failed, record.queue_depth) == (1, 0, 0)
+
+
+@pytest.mark.django_db
+def test_dispatch_signal(resource_server):
+    receiver = mock.Mock()
+    outbox_dispatch.connect(receiver)
+    try:
+        ReverseSyncEntry.objects.create(
+            action='update', ansible_id=uuid.uuid4(), resource_type='shared.organization', created=timezone.now() - timedelta(seconds=30)
+        )
+        dispatch_outbox()
+    finally:
+        outbox_dispatch.disconnect(receiver)
+    record = receiver.call_args.kwargs['record']
+    assert record.delivered == 1
+    assert record.latencies[0] >= 30
+
+
+@pytest.mark.django_db
+def test_dispatch_command(resource_server):
+    ReverseSyncEntry.objects.create(action='update', ansible_id=uuid.uuid4(), resource_type='shared.organization')
+    out = StringIO()
+    call_command('dispatch_reverse_sync', stdout=out)
+    assert 'Delivered 1 | Failed 0 | Coalesced 0 | Queue depth 0' in out.getvalue()
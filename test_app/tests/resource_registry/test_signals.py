@@ -1,9 +1,13 @@
 from unittest import mock
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from ansible_base.resource_registry.models import Resource
+from ansible_base.resource_registry.shared_types import OrganizationType, UserType
 from ansible_base.resource_registry.signals import handlers
-from test_app.models import EncryptionModel, Organization, Original1, Original2, Proxy1, Proxy2
+from test_app.models import EncryptionModel, Organization, Original1, Original2, Proxy1, Proxy2, Team
 
 
 @pytest.mark.django_db
@@ -32,13 +36,40 @@ def test_registered_model_triggers_signals(model, system_user):
     with mock.patch('ansible_base.resource_registry.models.Resource.update_from_content_object') as mck:
         obj.description = 'foobar'
         obj.save()
-    mck.assert_called_once_with()
+    mck.assert_called_once_with(obj)
 
     with mock.patch('ansible_base.resource_registry.models.Resource.delete') as mck:
         obj.delete()
     mck.assert_called_once_with()
 
 
+@pytest.mark.django_db
+def test_resource_hash_maintained_on_save():
+    org = Organization.objects.create(name='Hashed')
+    resource = org.resource
+    assert resource.resource_hash == OrganizationType(org).get_hash()
+    first_updated = resource.hash_updated
+    assert first_updated is not None
+
+    # only modified changes, which is not a field of the shared resource type
+    org.save()
+    resource.refresh_from_db()
+    assert resource.hash_updated == first_updated
+
+    org.description = 'changed'
+    org.save()
+    resource.refresh_from_db()
+    assert resource.resource_hash == OrganizationType(org).get_hash()
+    assert resource.hash_updated > first_updated
+
+
+@pytest.mark.django_db
+def test_resource_hash_updated_on_m2m_change(random_user):
+    Resource.objects.filter(pk=random_user.resource.pk).update(resource_hash='stale')
+    handlers.update_resource_hash_m2m(sender=None, instance=random_user, action='post_add', reverse=False, model=None, pk_set={1})
+    assert Resource.objects.get(pk=random_user.resource.pk).resource_hash == UserType(random_user).get_hash()
+
+
 @pytest.mark.django_db
 def test_decide_to_sync_update_with_create(enable_reverse_sync):
     with enable_reverse_sync(mock_away_sync=True):
@@ -66,3 +97,51 @@ def test_decide_to_sync_update_save(organization, enable_reverse_sync, fields, u
         organization.save(update_fields=update_fields)
 
     assert hasattr(organization, '_skip_reverse_resource_sync') == should_skip
+
+
+def test_synced_fields():
+    synced_fields = handlers.get_synced_fields()
+    assert synced_fields[Team] == {'name': 'name', 'organization': 'organization_id', 'description': 'description'}
+    assert synced_fields[Organization] == {'name': 'name', 'description': 'description'}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('field, should_skip', [('name', False), ('extra_field', True)])
+def test_decide_to_sync_update_from_snapshot(organization, enable_reverse_sync, field, should_skip):
+    with enable_reverse_sync(mock_away_sync=True):
+        org = Organization.objects.get(pk=organization.pk)
+        setattr(org, field, 'newvalue')
+        with CaptureQueriesContext(connection) as queries:
+            org.save()
+
+    assert hasattr(org, '_skip_reverse_resource_sync') == should_skip
+    # No query to get the original values, and the resource is looked up once
+    assert not [q for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'test_app_organization' in q['sql']]
+    assert len([q for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'FROM "dab_resource_registry_resource"' in q['sql']]) == 1
+
+
+@pytest.mark.django_db
+def test_decide_to_sync_update_snapshot_after_save(enable_reverse_sync):
+    with enable_reverse_sync(mock_away_sync=True):
+        org = Organization.objects.create(name='Hello')
+        org.name = 'World'
+        org.save()
+        assert not hasattr(org, '_skip_reverse_resource_sync')
+
+        # Compared with the values of the last save
+        org.save()
+        assert org._skip_reverse_resource_sync
+
+
+@pytest.mark.django_db
+def test_decide_to_sync_update_deferred_field(organization, enable_reverse_sync):
+    with enable_reverse_sync(mock_away_sync=True):
+        org = Organization.objects.defer('name').get(pk=organization.pk)
+        # Loading the deferred field after the snapshot was taken
+        assert org.name == organization.name
+        org.name = 'newvalue'
+        with CaptureQueriesContext(connection) as queries:
+            org.save()
+
+    assert not hasattr(org, '_skip_reverse_resource_sync')
+    assert [q for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'test_app_organization' in q['sql']]